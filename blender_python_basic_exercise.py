@@ -1,17 +1,14 @@
-import bpy
 import math
 import random
 
+import bpy
+
+from scene_reset import reset_scene
+
 
 def clear_scene():
-    # オブジェクトの削除
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
-
-    # すべての孤立したデータの削除
-    bpy.ops.outliner.orphans_purge(
-        do_local_ids=True, do_linked_ids=True, do_recursive=True
-    )
+    # オブジェクトとデータをまとめて削除
+    reset_scene()
 
 
 clear_scene()
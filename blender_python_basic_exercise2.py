@@ -2,16 +2,12 @@ import bpy
 import random
 import math
 
+from scene_reset import reset_scene
 
-def clear_scene():
-    # オブジェクトの削除
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
 
-    # すべての孤立したデータの削除
-    bpy.ops.outliner.orphans_purge(
-        do_local_ids=True, do_linked_ids=True, do_recursive=True
-    )
+def clear_scene():
+    # オブジェクトとデータをまとめて削除
+    reset_scene()
 
 
 clear_scene()
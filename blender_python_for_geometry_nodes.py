@@ -3,11 +3,14 @@ import time
 
 import bpy
 
+from node_tree_builder import apply_node_spec, new_geometry_node_group
+from scene_reset import reset_scene
+
 ####################
 # ヘルパー関数
 
 
-def purge_orphans():
+def purge_orphans(max_iterations=10):
     """
     すべの孤立したデータブロックの削除
     参照:https://youtu.be/3rNqVPtbhzc?t=149
@@ -21,10 +24,11 @@ def purge_orphans():
     else:
         # Blender バージョン3.0未満でのみ実行
         # 削除する孤立したデータブロックがなくなるまで、
-        # purge_orphans()を再帰的に呼び出す
-        result = bpy.ops.outliner.orphans_purge()
-        if result.pop() != "CANCELLED":
-            purge_orphans()
+        # orphans_purge()を繰り返し呼び出す(最大 max_iterations 回)
+        for _ in range(max_iterations):
+            result = bpy.ops.outliner.orphans_purge()
+            if result.pop() == "CANCELLED":
+                break
 
 
 def clean_scene():
@@ -35,34 +39,11 @@ def clean_scene():
     参照:https://youtu.be/3rNqVPtbhzc
     """
 
-    # アクティブなオブジェクトが編集モードになっていないことを確認する
-    if bpy.context.active_object and bpy.context.active_object.mode == "EDIT":
-        bpy.ops.object.editmode_toggle()
-
-    # オブジェクトがビューポート非表示、選択無効化されていないかの確認
-    for obj in bpy.data.objects:
-        obj.hide_set(False)
-        obj.hide_select = False
-        obj.hide_viewport = False
-
-    # すべてのオブジェクトを選択して削除
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
-
-    # すべてのコレクションを見つけて削除
-    collection_names = [col.name for col in bpy.data.collections]
-    for name in collection_names:
-        bpy.data.collections.remove(bpy.data.collections[name])
-
-    # ワールドシェーダーを変更する場合
-    # ワールドオブジェクトを削除して再作成する
-    world_names = [world.name for world in bpy.data.worlds]
-    for name in world_names:
-        bpy.data.worlds.remove(bpy.data.worlds[name])
-    # 新しいワールドデータブロックを作成
-    bpy.ops.world.new()
-    bpy.context.scene.world = bpy.data.worlds["World"]
+    # オブジェクト、コレクション、メッシュ、マテリアル、アクション、ノード、
+    # ワールドはまとめて削除し、新しいワールドを割り当てる
+    reset_scene()
 
+    # 残りの孤立したデータブロック(パーティクル、テクスチャ、イメージなど)を削除
     purge_orphans()
 
 
@@ -90,50 +71,6 @@ def time_seed():
     return seed
 
 
-# アニメーションを線形補間に設定する関数
-def set_fcurve_extrapolation_to_linear():
-    for fc in bpy.context.active_object.animation_data.action.fcurves:
-        fc.extrapolation = "LINEAR"
-
-
-# ループアニメーションを作成する関数
-def create_data_animation_loop(
-    obj,
-    data_path,
-    start_value,
-    mid_value,
-    start_frame,
-    loop_length,
-    linear_extrapolation=True,
-):
-    """
-    データ プロパティ ループを作成するには、次の操作が必要
-    1. プロパティを初期値に設定し、ループの先頭にキーフレームを追加
-    2. プロパティを中間値に設定し、ループの途中にキーフレームを追加
-    3. プロパティを初期値に設定し、ループの最後にキーフレームを追加
-    """
-
-    # 開始値を設定する
-    setattr(obj, data_path, start_value)
-    # 開始時にキーフレームを追加
-    obj.keyframe_insert(data_path, frame=start_frame)
-
-    # 中間の値を設定する
-    setattr(obj, data_path, mid_value)
-    # 中間地点にキーフレームを追加
-    mid_frame = start_frame + (loop_length) / 2
-    obj.keyframe_insert(data_path, frame=mid_frame)
-
-    # 終了値を設定する
-    setattr(obj, data_path, start_value)
-    # 最終キーフレームを追加
-    end_frame = start_frame + loop_length
-    obj.keyframe_insert(data_path, frame=end_frame)
-
-    if linear_extrapolation:
-        set_fcurve_extrapolation_to_linear()
-
-
 def set_scene_props(fps, frame_count):
     """
     シーンのプロパティを設定する
@@ -173,264 +110,205 @@ def scene_setup():
 ####################
 
 
-# ジオメトリノードを接続する関数
-def link_nodes_by_mesh_socket(node_tree, from_node, to_node):
-    node_tree.links.new(from_node.outputs["Mesh"], to_node.inputs["Mesh"])
+# ジオメトリノードのリンクを作成する関数
+def mesh_socket_link(from_node, to_node):
+    return [from_node, "Mesh", to_node, "Mesh"]
 
 
-def create_node(
-    node_tree, type_name, node_x_location, node_location_step_x=0, node_y_location=0
-):
+def node_spec(type_name, node_x_location, node_y_location=0, **settings):
     """
-    指定されたタイプのノードを作成し、X 軸上のノードの位置を設定、更新
-    ノード オブジェクトと、次のノードの X 軸上の次の位置を返す
+    指定されたタイプのノードの spec を作成
+    settings には properties / inputs / keyframes を指定する
     """
-    node_obj = node_tree.nodes.new(type=type_name)
-    node_obj.location.x = node_x_location
-    node_obj.location.y = node_y_location
-    node_x_location += node_location_step_x
-
-    return node_obj, node_x_location
-
-
-# ランダム値ノード作成関数
-def create_random_bool_value_node(node_tree, node_x_location, node_y_location):
-
-    # ランダム値ノード作成
-    separate_geo_random_value_node, node_x_location = create_node(
-        node_tree,
-        "FunctionNodeRandomValue",
-        node_x_location,
-        node_y_location=node_y_location,
-    )
-    target_output_type = "BOOLEAN"
-    separate_geo_random_value_node.data_type = target_output_type
-
-    # ランダム値ノードのアウトプットソケットのタイプを確認する（簡潔コード）
-    random_value_node_output_lookup = {
-        socket.type: socket
-        for socket in separate_geo_random_value_node.outputs.values()
+    return {
+        "type": type_name,
+        "location": [node_x_location, node_y_location],
+        **settings,
     }
 
-    # 複数行で確認するコード
-    # sockets = dict()
-    # for socket in separate_geo_random_value_node.outputs.values():
-    #     sockets[socket.type] = socket
-
-    import pprint
-
-    pprint.pprint(random_value_node_output_lookup)
-
-    # ランダム値ノードのアウトプットソケットを指定
-    target_output_socket = random_value_node_output_lookup[target_output_type]
-
-    return target_output_socket
 
+def data_animation_loop_points(start_value, mid_value, start_frame, loop_length):
+    """
+    ループアニメーションのキーフレーム
+    開始値 → 中間値 → 開始値 の [フレーム, 値] のリストを返す
+    """
+    mid_frame = start_frame + (loop_length) / 2
+    end_frame = start_frame + loop_length
 
-# ジオメトリ分離ノード作成関数
-def create_separate_geo_node(node_tree, node_x_location, node_location_step_x):
+    return [
+        [start_frame, start_value],
+        [mid_frame, mid_value],
+        [end_frame, start_value],
+    ]
 
-    # ランダム値ノードの作成
-    random_value_node_output_socket = create_random_bool_value_node(
-        node_tree, node_x_location, node_y_location=-200
-    )
 
-    # ジオメトリ分離ノードの作成
-    separate_geometry_node, node_x_location = create_node(
-        node_tree,
-        "GeometryNodeSeparateGeometry",
+# ランダム値ノードの spec を作成する関数
+def random_bool_value_node_spec(node_x_location, node_y_location):
+    # 出力タイプをブール値にすると、有効な「Value」ソケットはブール値のものだけになる
+    return node_spec(
+        "FunctionNodeRandomValue",
         node_x_location,
-        node_location_step_x,
+        node_y_location,
+        properties={"data_type": "BOOLEAN"},
     )
-    separate_geometry_node.domain = "FACE"
 
-    # ランダム値ノードをジオメトリ分離ノードに接続
-    to_node = separate_geometry_node
-    node_tree.links.new(random_value_node_output_socket, to_node.inputs["Selection"])
 
-    return separate_geometry_node, node_x_location
-
-
-# 要素スケールノード作成関数
-def create_scale_element_geo_node(
-    node_tree, geo_selection_node_output, node_x_location, node_y_location
+# 要素スケールノードの spec を作成する関数
+def scale_element_geo_node_specs(
+    name, geo_selection_link, node_x_location, node_y_location, start_frame
 ):
-    # ランダム値ノード呼び出し
-    random_value_node_output_socket = create_random_bool_value_node(
-        node_tree,
-        node_x_location,
-        node_y_location=node_y_location - 200,
-    )
-
-    # 要素スケールノードの作成
-    scale_elements_node, node_x_location = create_node(
-        node_tree,
-        "GeometryNodeScaleElements",
-        node_x_location,
-        node_y_location=node_y_location,
-    )
-    scale_elements_node.inputs["Scale"].default_value = 0.8
-
-    start_frame = random.randint(0, 150)
-
-    # アニメーション作成
-    create_data_animation_loop(
-        scale_elements_node.inputs["Scale"],
-        "default_value",
-        start_value=0.0,
-        mid_value=0.8,
-        start_frame=start_frame,
-        loop_length=90,
-        linear_extrapolation=False,
-    )
-
-    # ランダム値ノードを要素スケールノードの選択へ接続
-    to_node = scale_elements_node
-    node_tree.links.new(random_value_node_output_socket, to_node.inputs["Selection"])
-
-    # ランダム値ノードを要素スケールノードのジオメトリへ接続
-    to_node = scale_elements_node
-    node_tree.links.new(geo_selection_node_output, to_node.inputs["Geometry"])
-
-    return scale_elements_node
+    random_value_name = f"{name} Random Value"
+    nodes = {
+        # ランダム値ノード
+        random_value_name: random_bool_value_node_spec(
+            node_x_location, node_y_location - 200
+        ),
+        # 要素スケールノード(アニメーションのループはサイクルモディファイアで作成)
+        name: node_spec(
+            "GeometryNodeScaleElements",
+            node_x_location,
+            node_y_location,
+            inputs={"Scale": 0.8},
+            keyframes={
+                "Scale": {
+                    "points": data_animation_loop_points(
+                        start_value=0.0,
+                        mid_value=0.8,
+                        start_frame=start_frame,
+                        loop_length=90,
+                    ),
+                    "cycles": True,
+                }
+            },
+        ),
+    }
+    links = [
+        # ランダム値ノードを要素スケールノードの選択へ接続
+        [random_value_name, "Value", name, "Selection"],
+        # ジオメトリ分離ノードを要素スケールノードのジオメトリへ接続
+        [*geo_selection_link, name, "Geometry"],
+    ]
 
+    return nodes, links
 
-# 面を分離し、大きさのアニメーション化を行なう関数
-def separate_faces_and_animate_scale(node_tree, node_x_location, node_location_step_x):
 
-    # ジオメトリ分離ノードの作成
-    separate_geometry_node, node_x_location = create_separate_geo_node(
-        node_tree,
+def geo_node_tree_spec(subdivide_level, start_frames):
+    """
+    立方体メッシュ、細分化、三角化、辺分離、要素スケール
+    ジオメトリノードのツリーの spec を作成
+    start_frames には2つの要素スケールのアニメーション開始フレームを指定する
+    ノード参照:https://docs.blender.org/api/current/bpy.types.GeometryNode.html
+    """
+    node_location_step_x = 300
+    nodes = {}
+    links = []
+
+    nodes["Group Input"] = node_spec("NodeGroupInput", -node_location_step_x)
+
+    # 立方体メッシュ、細分化、三角化、辺分離ノード
+    chain = [
+        ("Mesh Cube", "GeometryNodeMeshCube", {}),
+        ("Subdivide Mesh", "GeometryNodeSubdivideMesh", {"Level": subdivide_level}),
+        ("Triangulate", "GeometryNodeTriangulate", {}),
+        ("Split Edges", "GeometryNodeSplitEdges", {}),
+    ]
+    node_x_location = 0
+    for name, type_name, inputs in chain:
+        nodes[name] = node_spec(type_name, node_x_location, inputs=inputs)
+        node_x_location += node_location_step_x
+    for (from_name, _, _), (to_name, _, _) in zip(chain, chain[1:]):
+        links.append(mesh_socket_link(from_name, to_name))
+
+    # ジオメトリ分離ノードとランダム値ノード
+    nodes["Separate Geometry"] = node_spec(
+        "GeometryNodeSeparateGeometry",
         node_x_location,
-        node_location_step_x,
+        properties={"domain": "FACE"},
     )
+    nodes["Separate Random Value"] = random_bool_value_node_spec(node_x_location, -200)
+    links.append(["Split Edges", "Mesh", "Separate Geometry", "Geometry"])
+    links.append(["Separate Random Value", "Value", "Separate Geometry", "Selection"])
+    node_x_location += node_location_step_x
 
     # ジオメトリ分離ノードから要素スケールノードへ選択経由と反転経由で接続
-    scale_elements_geo_nodes = []
-    top_scale_elements_node = create_scale_element_geo_node(
-        node_tree,
-        separate_geometry_node.outputs["Selection"],
-        node_x_location,
-        node_y_location=200,
-    )
-    scale_elements_geo_nodes.append(top_scale_elements_node)
-
-    bottom_scale_elements_node = create_scale_element_geo_node(
-        node_tree,
-        separate_geometry_node.outputs["Inverted"],
-        node_x_location,
-        node_y_location=-200,
-    )
-    scale_elements_geo_nodes.append(bottom_scale_elements_node)
-
-    # Fカーブにサイクルモディファイアを追加
-    for fcurve in node_tree.animation_data.action.fcurves:
-        fcurve.modifiers.new(type="CYCLES")
-
+    scale_element_names = ["Scale Elements Top", "Scale Elements Bottom"]
+    for name, output_name, node_y_location, start_frame in zip(
+        scale_element_names, ["Selection", "Inverted"], [200, -200], start_frames
+    ):
+        scale_nodes, scale_links = scale_element_geo_node_specs(
+            name,
+            ["Separate Geometry", output_name],
+            node_x_location,
+            node_y_location,
+            start_frame,
+        )
+        nodes.update(scale_nodes)
+        links.extend(scale_links)
     node_x_location += node_location_step_x
 
-    # ジオメトリ結合ノードの作成
-    join_geometry_node, node_x_location = create_node(
-        node_tree, "GeometryNodeJoinGeometry", node_x_location, node_location_step_x
-    )
-
     # 2つの要素スケールノードをジオメトリ結合ノードへ接続
-    for node in scale_elements_geo_nodes:
-        from_node = node
-        to_node = join_geometry_node
-        node_tree.links.new(from_node.outputs["Geometry"], to_node.inputs["Geometry"])
-
-    return separate_geometry_node, join_geometry_node, node_x_location
-
-
-def update_geo_node_tree(node_tree):
-    """
-    立方体メッシュ、細分化、三角化、辺分離、要素スケール
-    ジオメトリノードをノードツリーに追加
-    ノード参照:https://docs.blender.org/api/current/bpy.types.GeometryNode.html
-    """
+    nodes["Join Geometry"] = node_spec("GeometryNodeJoinGeometry", node_x_location)
+    for name in scale_element_names:
+        links.append([name, "Geometry", "Join Geometry", "Geometry"])
+    node_x_location += node_location_step_x
 
-    out_node = node_tree.nodes["Group Output"]
+    # ジオメトリ結合ノードからグループ出力までのリンク接続
+    nodes["Group Output"] = node_spec("NodeGroupOutput", node_x_location)
+    links.append(["Join Geometry", "Geometry", "Group Output", "Geometry"])
 
-    node_x_location = 0
-    node_location_step_x = 300
+    return {"nodes": nodes, "links": links}
 
-    # 立方体メッシュノードの作成
-    mesh_cube_node, node_x_location = create_node(
-        node_tree,
-        "GeometryNodeMeshCube",
-        node_x_location,
-        node_location_step_x,
-    )
 
-    # 細分化ノードの作成
-    subdivide_mesh_node, node_x_location = create_node(
-        node_tree,
-        "GeometryNodeSubdivideMesh",
-        node_x_location,
-        node_location_step_x,
-    )
-    subdivide_mesh_node.inputs["Level"].default_value = 3
+# 要素スケールのアニメーション開始フレームを保存するカスタムプロパティ名
+START_FRAMES_PROPERTY = "start_frames"
 
-    # 三角化ノードの作成
-    triangulate_node, node_x_location = create_node(
-        node_tree,
-        "GeometryNodeTriangulate",
-        node_x_location,
-        node_location_step_x,
-    )
 
-    # 辺分離ノードの作成
-    split_edges_node, node_x_location = create_node(
-        node_tree,
-        "GeometryNodeSplitEdges",
-        node_x_location,
-        node_location_step_x,
-    )
+def update_geo_node_tree(node_tree, subdivide_level=3, start_frames=None):
+    """
+    ノードツリーを spec と比較し、変わったノード・値・リンクだけを更新する
+    同じツリーに対して何度実行してもノードは増えない
+    start_frames を省略した場合、ランダムな開始フレームを最初の1回だけ決めて
+    ノードツリーのカスタムプロパティに保存し、以降の実行ではキーフレームを作り直さない
+    """
+    if start_frames is None:
+        start_frames = node_tree.get(START_FRAMES_PROPERTY)
+    if start_frames is None:
+        start_frames = (random.randint(0, 150), random.randint(0, 150))
+    node_tree[START_FRAMES_PROPERTY] = list(start_frames)
 
-    # 要素スケールノード、ジオメトリ結合ノードの配置
-    separate_geometry_node, join_geometry_node, node_x_location = (
-        separate_faces_and_animate_scale(
-            node_tree, node_x_location, node_location_step_x
-        )
-    )
+    spec = geo_node_tree_spec(subdivide_level, start_frames)
+    stats = apply_node_spec(node_tree, spec)
+    print(f"update_geo_node_tree: {stats}")
 
-    # 各ノードからグループ出力までのリンク接続
-    out_node.location.x = node_x_location
+    return stats
 
-    link_nodes_by_mesh_socket(
-        node_tree, from_node=mesh_cube_node, to_node=subdivide_mesh_node
-    )
-    link_nodes_by_mesh_socket(
-        node_tree, from_node=subdivide_mesh_node, to_node=triangulate_node
-    )
-    link_nodes_by_mesh_socket(
-        node_tree, from_node=triangulate_node, to_node=split_edges_node
-    )
 
-    from_node = split_edges_node
-    to_node = separate_geometry_node
-    node_tree.links.new(from_node.outputs["Mesh"], to_node.inputs["Geometry"])
+def get_geo_node_tree(name="Geometry Nodes"):
+    """ノードツリーがあれば再利用し、なければ作成する"""
+    node_tree = bpy.data.node_groups.get(name)
+    if node_tree is None:
+        node_tree = new_geometry_node_group(name)
 
-    from_node = join_geometry_node
-    to_node = out_node
-    node_tree.links.new(from_node.outputs["Geometry"], to_node.inputs["Geometry"])
+    return node_tree
 
 
 # ジオメトリノードを作成する関数
-def create_centerpiece():
+def create_centerpiece(subdivide_level=3, start_frames=None):
     bpy.ops.mesh.primitive_plane_add()
+    obj = bpy.context.active_object
 
-    bpy.ops.node.new_geometry_nodes_modifier()
+    node_tree = get_geo_node_tree()
+    update_geo_node_tree(node_tree, subdivide_level, start_frames)
 
-    node_tree = bpy.data.node_groups["Geometry Nodes"]
+    modifier = obj.modifiers.new(name="GeometryNodes", type="NODES")
+    modifier.node_group = node_tree
 
-    update_geo_node_tree(node_tree)
-
-    bpy.ops.object.modifier_add(type="SOLIDIFY")
+    obj.modifiers.new(name="Solidify", type="SOLIDIFY")
 
     # 最後にジオメトリノード モディファイアをアクティブ モードにする
-    bpy.context.active_object.modifiers["GeometryNodes"].is_active = True
+    modifier.is_active = True
+
+    return obj
 
 
 def main():
@@ -3,10 +3,11 @@ import math
 
 import bpy
 
+from scene_reset import reset_scene
+
 
 def scene_clear():
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
+    reset_scene()
 
 
 def add_cube(name,bevel=False):
@@ -1,10 +1,11 @@
 import bpy
 import random
 
+from scene_reset import reset_scene
+
 
 def clear_scene():
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
+    reset_scene()
 
 
 clear_scene()
@@ -7,119 +7,217 @@ import math
 # 乱数を生成するための Python 機能を拡張する
 import random
 
+# 同じ内容のマテリアルを再利用するためのレジストリ
+from material_registry import HASH_PROPERTY, get_material
+
+# オペレーターを使わずにシーンをリセットする
+from scene_reset import reset_scene
+
 
 # シーンのすべてのオブジェクトを削除する関数
 def partially_clean_the_scene():
 
-    # シーン内のすべてのオブジェクトを選択
-    bpy.ops.object.select_all(action="SELECT")
+    # シーン内のすべてのオブジェクトと関連付けられていたデータをまとめて削除する
+    reset_scene()
 
-    # シーン内の選択されたオブジェクトをすべて削除する
-    bpy.ops.object.delete()
 
-    # 削除したオブジェクトに関連付けられていたデータを確実に削除する
-    bpy.ops.outliner.orphans_purge(
-        do_local_ids=True, do_linked_ids=True, do_recursive=True
-    )
+# マテリアルごとに変わるノイズのパラメーターを決める関数
+def random_noise_parameters(scale=None, rotation=None):
+    """
+    ノイズテクスチャの Scale とマッピングの Rotation のうち、
+    省略したものだけをランダムに決める(指定した値のために乱数を消費しない)
+    """
+    if scale is None:
+        scale = random.uniform(1.0, 20.0)
+    if rotation is None:
+        rotation = [math.radians(random.uniform(0.0, 360.0)) for _ in range(3)]
+
+    return scale, rotation
 
 
 # ノイズ マスクを作成する関数
-def create_noise_mask(material):
-    """次のノードを使用して、ノイズ マスクを作成するためのノード セットを追加する
+def create_noise_mask_spec(node_location_x_step=300, scale=None, rotation=None):
+    """次のノードを使用して、ノイズ マスクを作成するためのノード セットの spec を返す
     * テクスチャ座標ノード
     * マッピングノード
     * ノイズテクスチャノード
     * カラーランプノード
+    scale と rotation を省略した場合はランダムな値にする
     """
+    scale, rotation = random_noise_parameters(scale, rotation)
 
-    node_location_x_step = 300
     node_location_x = -node_location_x_step
 
+    nodes = {}
+
     # カラーランプノードの作成
     # https://docs.blender.org/api/current/bpy.types.ShaderNodeValToRGB.html
-    color_ramp_node = material.node_tree.nodes.new(type="ShaderNodeValToRGB")
-    color_ramp_node.color_ramp.elements[0].position = 0.45
-    color_ramp_node.color_ramp.elements[1].position = 0.5
-    color_ramp_node.location.x = node_location_x
+    nodes["Color Ramp"] = {
+        "type": "ShaderNodeValToRGB",
+        "location": [node_location_x, 0],
+        "color_ramp": [[0.45, [0, 0, 0, 1]], [0.5, [1, 1, 1, 1]]],
+    }
     node_location_x -= node_location_x_step
 
     # ノイズテクスチャノードの作成
     # https://docs.blender.org/api/current/bpy.types.ShaderNodeTexNoise.html#bpy.types.ShaderNodeTexNoise
-    noise_texture_node = material.node_tree.nodes.new(type="ShaderNodeTexNoise")
-    noise_texture_node.inputs["Scale"].default_value = random.uniform(1.0, 20.0)
-    noise_texture_node.location.x = node_location_x
+    nodes["Noise Texture"] = {
+        "type": "ShaderNodeTexNoise",
+        "location": [node_location_x, 0],
+        "inputs": {"Scale": scale},
+    }
     node_location_x -= node_location_x_step
 
     # マッピングノードの作成
     # https://docs.blender.org/api/current/bpy.types.ShaderNodeMapping.html#bpy.types.ShaderNodeMapping
-    mapping_node = material.node_tree.nodes.new(type="ShaderNodeMapping")
-    mapping_node.inputs["Rotation"].default_value.x = math.radians(
-        random.uniform(0.0, 360.0)
-    )
-    mapping_node.inputs["Rotation"].default_value.y = math.radians(
-        random.uniform(0.0, 360.0)
-    )
-    mapping_node.inputs["Rotation"].default_value.z = math.radians(
-        random.uniform(0.0, 360.0)
-    )
-    mapping_node.location.x = node_location_x
+    nodes["Mapping"] = {
+        "type": "ShaderNodeMapping",
+        "location": [node_location_x, 0],
+        "inputs": {"Rotation": list(rotation)},
+    }
     node_location_x -= node_location_x_step
 
     # テクスチャ座標ノードの作成
-    texture_coordinate_node = material.node_tree.nodes.new(type="ShaderNodeTexCoord")
-    texture_coordinate_node.location.x = node_location_x
-    node_location_x -= node_location_x_step
+    nodes["Texture Coordinate"] = {
+        "type": "ShaderNodeTexCoord",
+        "location": [node_location_x, 0],
+    }
 
     # ノードを接続
     # https://docs.blender.org/api/current/bpy.types.NodeTree.html#bpy.types.NodeTree
     # https://docs.blender.org/api/current/bpy.types.NodeLinks.html#bpy.types.NodeLinks
+    links = [
+        # ノイズテクスチャノードからカラーランプノードへの接続
+        ["Noise Texture", "Color", "Color Ramp", "Fac"],
+        # マッピングノードからノイズテクスチャノードへの接続
+        ["Mapping", "Vector", "Noise Texture", "Vector"],
+        # テクスチャ座標ノードからマッピングノードへの接続
+        ["Texture Coordinate", "Generated", "Mapping", "Vector"],
+    ]
 
-    # ノイズテクスチャノードからカラーランプノードへの接続
-    material.node_tree.links.new(
-        noise_texture_node.outputs["Color"], color_ramp_node.inputs["Fac"]
-    )
-    # マッピングノードからノイズテクスチャノードへの接続
-    material.node_tree.links.new(
-        mapping_node.outputs["Vector"], noise_texture_node.inputs["Vector"]
-    )
-    # テクスチャ座標ノードからマッピングノードへの接続
-    material.node_tree.links.new(
-        texture_coordinate_node.outputs["Generated"], mapping_node.inputs["Vector"]
-    )
+    return nodes, links
 
-    return color_ramp_node
 
+# マテリアルの spec を作成する関数
+def create_material_spec(scale=None, rotation=None):
 
-# マテリアルを作成する関数
-def create_material(name):
+    noise_mask_nodes, noise_mask_links = create_noise_mask_spec(
+        scale=scale, rotation=rotation
+    )
 
-    # 新しいマテリアルを作成する
-    material = bpy.data.materials.new(name=name)
+    spec = {
+        "nodes": {
+            "Material Output": {
+                "type": "ShaderNodeOutputMaterial",
+                "location": [300, 300],
+            },
+            # Principled BSDFシェーダーノード
+            "Principled BSDF": {
+                "type": "ShaderNodeBsdfPrincipled",
+                "location": [10, 300],
+                "inputs": {
+                    # マテリアルの基本色を設定する
+                    "Base Color": [0.8, 0.12, 0.0075, 1],
+                    # マテリアルのメタリック値を設定する
+                    "Metallic": 1.0,
+                    # マテリアルの粗さの値を設定する
+                    # "Roughness": random.uniform(0.1, 1.0),
+                },
+            },
+            **noise_mask_nodes,
+        },
+        "links": [
+            ["Principled BSDF", "BSDF", "Material Output", "Surface"],
+            *noise_mask_links,
+            # カラーランプノードからプリンシプルBSDFの粗さへの接続
+            ["Color Ramp", "Color", "Principled BSDF", "Roughness"],
+        ],
+    }
+
+    return spec
+
+
+# ====================
+# テンプレートの複製でマテリアルを作成する
+# ====================
+
+# テンプレートのマテリアル名(「.」で始まる名前は UI の一覧に表示されない)
+TEMPLATE_MATERIAL_NAME = ".Noise_Mask_Template"
+
+# 共有のマテリアルがノイズのパラメーターを読むオブジェクトのカスタムプロパティ名
+NOISE_SCALE_PROPERTY = "noise_scale"
+NOISE_ROTATION_PROPERTY = "noise_rotation"
+
+
+def get_template_material():
+    """ノードを組み立てたテンプレートのマテリアルを1回だけ作成する"""
+    template = get_material(
+        TEMPLATE_MATERIAL_NAME, create_material_spec(5.0, [0, 0, 0])
+    )
+    # 使用されていなくても保存・保持する
+    template.use_fake_user = True
 
-    # ノード経由でマテリアルを作成できるようにする
-    # materialはbpy.context.object.active_materialを参照しているため省略できる
-    material.use_nodes = True
+    return template
 
-    # Principled BSDFシェーダーノードへの参照を取得する
-    principled_bsdf_node = material.node_tree.nodes["Principled BSDF"]
 
-    # マテリアルの基本色を設定する
-    # bpy.data.materials["My_Generated_"].node_tree.nodes["Principled BSDF"]
-    # .inputs[0].default_value = (R,G,B,A)で取得する（上記の変数で一部を定義し、省略）
-    principled_bsdf_node.inputs["Base Color"].default_value = (0.8, 0.12, 0.0075, 1)
+def create_material(name, scale=None, rotation=None):
+    """
+    テンプレートを複製し、変わる値(ノイズの Scale とマッピングの Rotation)だけを設定する
+    ノードやリンクは作成しない
+    """
+    material = get_template_material().copy()
+    material.name = name
+    material.use_fake_user = False
+    # 複製したマテリアルはテンプレートと内容が異なるため、レジストリのハッシュを削除する
+    del material[HASH_PROPERTY]
 
-    # マテリアルのメタリック値を設定する
-    principled_bsdf_node.inputs["Metallic"].default_value = 1.0
+    scale, rotation = random_noise_parameters(scale, rotation)
+    nodes = material.node_tree.nodes
+    nodes["Noise Texture"].inputs["Scale"].default_value = scale
+    nodes["Mapping"].inputs["Rotation"].default_value = rotation
 
-    # マテリアルの粗さの値を設定する
-    # principled_bsdf_node.inputs["Roughness"].default_value = random.uniform(0.1, 1.0)
+    return material
 
-    color_ramp_node = create_noise_mask(material)
 
-    # カラーランプノードからプリンシプルBSDFの粗さへの接続
-    material.node_tree.links.new(
-        color_ramp_node.outputs["Color"], principled_bsdf_node.inputs["Roughness"]
-    )
+def get_shared_material(name="Noise_Mask_Shared"):
+    """
+    すべてのオブジェクトで共有するマテリアル
+    ノイズの Scale と Rotation をオブジェクトのカスタムプロパティから読む
+    """
+    spec = create_material_spec(5.0, [0, 0, 0])
+    spec["nodes"]["Noise Scale"] = {
+        "type": "ShaderNodeAttribute",
+        "location": [-900, -200],
+        "properties": {
+            "attribute_type": "OBJECT",
+            "attribute_name": NOISE_SCALE_PROPERTY,
+        },
+    }
+    spec["nodes"]["Noise Rotation"] = {
+        "type": "ShaderNodeAttribute",
+        "location": [-1200, -200],
+        "properties": {
+            "attribute_type": "OBJECT",
+            "attribute_name": NOISE_ROTATION_PROPERTY,
+        },
+    }
+    spec["links"] += [
+        ["Noise Scale", "Fac", "Noise Texture", "Scale"],
+        ["Noise Rotation", "Vector", "Mapping", "Rotation"],
+    ]
+
+    return get_material(name, spec)
+
+
+def assign_shared_material(obj, scale=None, rotation=None):
+    """共有のマテリアルを割り当て、オブジェクトごとのノイズの値をカスタムプロパティに設定する"""
+    scale, rotation = random_noise_parameters(scale, rotation)
+    obj[NOISE_SCALE_PROPERTY] = scale
+    obj[NOISE_ROTATION_PROPERTY] = list(rotation)
+
+    material = get_shared_material()
+    if material.name not in obj.data.materials:
+        obj.data.materials.append(material)
 
     return material
 
@@ -140,17 +238,23 @@ def add_mesh():
 
 
 # メイン関数
-def main():
+def main(use_shared_material=False):
 
     partially_clean_the_scene()
 
+    mesh_obj = add_mesh()
+
+    if use_shared_material:
+        # 1つのマテリアルを共有し、値はオブジェクトのカスタムプロパティで変える
+        assign_shared_material(mesh_obj)
+        return
+
     name = "My_Generated_Material"
     material = create_material(name)
 
-    mesh_obj = add_mesh()
-
     # メッシュオブジェクトにマテリアルを適用する
     mesh_obj.data.materials.append(material)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+同じ状態のフレームを検出し、1回だけレンダリングする
+フレームごとに depsgraph を評価して、オブジェクトの変換・アニメーションされた
+プロパティ(ノードソケットの値など)・カメラの状態・ジオメトリノードの結果を
+ハッシュ化し、同じハッシュのフレームは最初のフレームの画像をリンク(またはコピー)する
+"""
+
+import hashlib
+
+import bpy
+import numpy as np
+
+from render_farm import group_duplicate_frames, link_frame
+from shard_cache import cached_frame_matrices
+
+# 浮動小数点の誤差を無視するための丸め桁数
+HASH_DECIMALS = 6
+
+
+def _float_bytes(values, decimals=HASH_DECIMALS):
+    """数値の並びを丸めてバイト列に変換"""
+    array = np.round(np.asarray(values, dtype=np.float64).ravel(), decimals)
+    # -0.0 と 0.0 を同じ値として扱う
+    return (array + 0.0).tobytes()
+
+
+def _animated_ids():
+    """アニメーションを持つデータブロック(埋め込みノードツリーを含む)を返す"""
+    id_collections = (
+        bpy.data.objects,
+        bpy.data.materials,
+        bpy.data.node_groups,
+        bpy.data.worlds,
+        bpy.data.cameras,
+        bpy.data.lights,
+        bpy.data.shape_keys,
+        bpy.data.scenes,
+    )
+    for collection in id_collections:
+        for id_data in collection:
+            for data in (id_data, getattr(id_data, "node_tree", None)):
+                animation_data = getattr(data, "animation_data", None)
+                if animation_data and animation_data.action:
+                    yield data
+
+
+def _uses_geometry_nodes(obj):
+    return obj.type == "MESH" and any(mod.type == "NODES" for mod in obj.modifiers)
+
+
+def frame_state_hash(scene, depsgraph):
+    """現在のフレームの評価済みの状態からハッシュ値を求める"""
+    hasher = hashlib.sha1()
+    frame = scene.frame_current
+
+    # モーションブラーは前後のフレームに依存するため重複とみなさない
+    if scene.render.use_motion_blur:
+        hasher.update(str(frame).encode())
+
+    # 評価済みオブジェクトの変換と表示状態
+    for obj in sorted(depsgraph.objects, key=lambda obj: obj.name):
+        hasher.update(obj.name.encode())
+        hasher.update(_float_bytes(obj.matrix_world))
+        hasher.update(bytes([obj.hide_render]))
+
+        # ジオメトリノードはフレームから直接変形するため評価結果を含める
+        if _uses_geometry_nodes(obj):
+            mesh = obj.to_mesh()
+            co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", co)
+            obj.to_mesh_clear()
+            hasher.update(_float_bytes(co))
+
+        # ハンドラーがキャッシュから頂点位置を書き換えるオブジェクトはキャッシュの行列
+        shard_matrices = cached_frame_matrices(obj.name, frame)
+        if shard_matrices is not None:
+            hasher.update(_float_bytes(shard_matrices))
+
+    # アニメーションされたプロパティ(ノードソケットの値など)
+    for id_data in _animated_ids():
+        for fcurve in id_data.animation_data.action.fcurves:
+            hasher.update(f"{id_data.name}:{fcurve.data_path}".encode())
+            hasher.update(_float_bytes([fcurve.evaluate(frame)]))
+
+    # カメラの状態
+    camera = scene.camera
+    if camera:
+        camera_eval = camera.evaluated_get(depsgraph)
+        camera_data = camera_eval.data
+        hasher.update(_float_bytes(camera_eval.matrix_world))
+        hasher.update(
+            _float_bytes(
+                [
+                    camera_data.lens,
+                    camera_data.ortho_scale,
+                    camera_data.shift_x,
+                    camera_data.shift_y,
+                    camera_data.clip_start,
+                    camera_data.clip_end,
+                    camera_data.dof.focus_distance,
+                    camera_data.dof.aperture_fstop,
+                ]
+            )
+        )
+
+    return hasher.hexdigest()
+
+
+def compute_frame_hashes(scene, frames):
+    """フレームごとの状態のハッシュを {フレーム: ハッシュ} で返す"""
+    original_frame = scene.frame_current
+    hashes = {}
+    for frame in frames:
+        scene.frame_set(frame)
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        hashes[frame] = frame_state_hash(scene, depsgraph)
+    scene.frame_set(original_frame)
+
+    return hashes
+
+
+def render_animation_without_duplicates(scene=None):
+    """
+    シーンのフレーム範囲をレンダリングし、同じ状態のフレームは
+    最初のフレームの画像をリンクする
+    レンダリングしたフレーム数と省略したフレーム数を返す
+    """
+    scene = scene or bpy.context.scene
+    frames = range(scene.frame_start, scene.frame_end + 1, scene.frame_step)
+    groups = group_duplicate_frames(compute_frame_hashes(scene, frames))
+
+    skipped = 0
+    for frame, duplicates in groups.items():
+        scene.frame_set(frame)
+        path = scene.render.frame_path(frame=frame)
+        bpy.ops.render.render(write_still=True)
+
+        for duplicate in duplicates:
+            link_frame(path, scene.render.frame_path(frame=duplicate))
+        skipped += len(duplicates)
+
+    print(f"rendered {len(groups)} frames, skipped {skipped} duplicate frames")
+
+    return len(groups), skipped
+
+
+if __name__ == "__main__":
+    render_animation_without_duplicates()
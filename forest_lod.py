@@ -0,0 +1,263 @@
+"""
+カメラからの距離による森の LOD (詳細度) の切り替え
+木の種類ごとに 高・中・ビルボード(交差した板) の3つのメッシュを用意し、
+すべての木のカメラからの距離を配列計算でまとめて求めて、木ごとのメッシュを切り替える
+frame_change_post ハンドラーで、カメラが動くアニメーションでもフレームごとに更新する
+
+    オブジェクトの森 (build_forest)       : LOD が変わった木だけ obj.data を差し替える
+    インスタンスの森 (build_lod_forest)   : 頂点の lod 属性を書き換え、ジオメトリノードで選ぶ
+"""
+
+import math
+
+import bmesh
+import bpy
+import numpy as np
+
+from node_tree_builder import apply_node_spec, new_geometry_node_group
+from tree_checkered_pattern import (
+    append_tree_materials,
+    create_point_mesh,
+    create_tree_mesh,
+    get_tree_mesh,
+    scattered_forest_node_tree_spec,
+)
+
+# LOD の名前(番号の順)
+LOD_LEVELS = ("High", "Medium", "Billboard")
+
+# この距離より近ければ高、次の距離より近ければ中、それより遠ければビルボード
+DEFAULT_LOD_DISTANCES = (30.0, 120.0)
+
+# インスタンスの LOD の番号を保存する頂点の属性名
+LOD_ATTRIBUTE = "lod"
+
+
+# ====================
+# LOD のメッシュ
+# ====================
+
+
+def _add_crossed_quads(bm, half_width, z_bottom, z_top, material_index):
+    """十字に交差した2枚の板を追加する"""
+    for angle in (0, math.pi / 2):
+        x = math.cos(angle) * half_width
+        y = math.sin(angle) * half_width
+        verts = [
+            bm.verts.new((-x, -y, z_bottom)),
+            bm.verts.new((x, y, z_bottom)),
+            bm.verts.new((x, y, z_top)),
+            bm.verts.new((-x, -y, z_top)),
+        ]
+        bm.faces.new(verts).material_index = material_index
+
+
+def create_billboard_mesh(name, is_pine=False):
+    """幹と葉を交差した板で表した、遠くの木のためのメッシュを作成する"""
+    bm = bmesh.new()
+    _add_crossed_quads(bm, 0.2, 0, 1, 0)
+    if is_pine:
+        _add_crossed_quads(bm, 0.5, 0.3, 2.3, 1)
+    else:
+        _add_crossed_quads(bm, 0.8, 0.2, 1.8, 1)
+
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    append_tree_materials(mesh, is_pine)
+
+    return mesh
+
+
+def get_lod_meshes(is_pine=False):
+    """木の種類の 高・中・ビルボード のメッシュを返す(なければ作成する)"""
+    prefix = "Pine" if is_pine else "Tree"
+    medium_name = f"{prefix}_Prototype_Medium"
+    billboard_name = f"{prefix}_Prototype_Billboard"
+
+    return (
+        get_tree_mesh(is_pine),
+        bpy.data.meshes.get(medium_name)
+        or create_tree_mesh(medium_name, is_pine, segments=12, subdivisions=1),
+        bpy.data.meshes.get(billboard_name)
+        or create_billboard_mesh(billboard_name, is_pine),
+    )
+
+
+def lod_levels(positions, camera_location, distances=DEFAULT_LOD_DISTANCES):
+    """すべての木のカメラからの距離を求め、LOD の番号(0 が高)の配列を返す"""
+    offsets = np.asarray(positions, dtype=np.float32) - np.asarray(
+        camera_location, dtype=np.float32
+    )
+    distance = np.sqrt(np.einsum("ij,ij->i", offsets, offsets))
+
+    return np.searchsorted(distances, distance, side="right").astype(np.int32)
+
+
+# ====================
+# 切り替え
+# ====================
+
+# LOD を切り替える森(オブジェクト名またはコレクション名 → 状態)
+_lod_forests = {}
+
+
+def enable_forest_lod(collection, distances=DEFAULT_LOD_DISTANCES):
+    """
+    build_forest() で作成した木ごとのオブジェクトのコレクションで LOD を切り替える
+    木は動かないため、位置と種類は登録時に一度だけ読み込む
+    """
+    objects = list(collection.objects)
+    positions = np.empty(len(objects) * 3, dtype=np.float32)
+    collection.objects.foreach_get("location", positions)
+    pine_meshes = set(get_lod_meshes(True))
+
+    _lod_forests[collection.name] = {
+        "type": "OBJECTS",
+        "distances": distances,
+        "positions": positions.reshape(-1, 3),
+        "prototype_ids": np.array(
+            [obj.data in pine_meshes for obj in objects], dtype=np.int32
+        ),
+        "levels": np.zeros(len(objects), dtype=np.int32),
+        "meshes": (get_lod_meshes(False), get_lod_meshes(True)),
+    }
+    _register_handler()
+    update_forest_lod(bpy.context.scene)
+
+
+def _update_object_lod(collection, state, levels):
+    """LOD が変わった木だけメッシュを差し替える"""
+    changed = np.flatnonzero(levels != state["levels"])
+    if len(changed) == 0:
+        return 0
+
+    objects = list(collection.objects)
+    meshes = state["meshes"]
+    prototype_ids = state["prototype_ids"]
+    for i in changed.tolist():
+        objects[i].data = meshes[prototype_ids[i]][levels[i]]
+    state["levels"] = levels
+
+    return len(changed)
+
+
+def create_lod_prototype_collection(name="Tree_LOD_Prototypes"):
+    """
+    すべての木の種類と LOD のオブジェクトをまとめたコレクションを作成する
+    コレクション情報ノードは名前の順に並べるため、番号は 種類 * 3 + LOD になる
+    """
+    collection = bpy.data.collections.get(name)
+    if collection is None:
+        collection = bpy.data.collections.new(name)
+        bpy.context.scene.collection.children.link(collection)
+        for prototype_id, is_pine in enumerate((False, True)):
+            for level, mesh in enumerate(get_lod_meshes(is_pine)):
+                obj = bpy.data.objects.new(
+                    f"Prototype_{prototype_id}_{level}_{LOD_LEVELS[level]}", mesh
+                )
+                collection.objects.link(obj)
+
+    # 元のオブジェクトは表示・レンダリングしない
+    layer_collection = bpy.context.view_layer.layer_collection.children.get(name)
+    if layer_collection:
+        layer_collection.exclude = True
+
+    return collection
+
+
+def lod_forest_node_tree_spec():
+    """prototype_id * 3 + lod 番目のオブジェクトをインスタンスとして置く spec"""
+    spec = scattered_forest_node_tree_spec()
+    spec["nodes"]["LOD"] = {
+        "type": "GeometryNodeInputNamedAttribute",
+        "location": [-300, -500],
+        "properties": {"data_type": "INT"},
+        "inputs": {"Name": LOD_ATTRIBUTE},
+    }
+    spec["nodes"]["Instance Index"] = {
+        "type": "ShaderNodeMath",
+        "location": [-150, -300],
+        "properties": {"operation": "MULTIPLY_ADD"},
+        "inputs": {1: float(len(LOD_LEVELS))},
+    }
+    spec["links"] = [link for link in spec["links"] if link[0] != "Prototype ID"] + [
+        ["Prototype ID", "Attribute", "Instance Index", 0],
+        ["LOD", "Attribute", "Instance Index", 2],
+        ["Instance Index", 0, "Instance on Points", "Instance Index"],
+    ]
+
+    return spec
+
+
+def build_lod_forest(positions, prototype_ids, distances=DEFAULT_LOD_DISTANCES):
+    """
+    scatter.py で作成した位置と種類の番号で、LOD を切り替えるインスタンスの森を作成する
+    LOD の切り替えは頂点の lod 属性の書き込み1回だけで、木ごとの Python の処理はない
+    """
+    prototypes = create_lod_prototype_collection()
+    node_tree = bpy.data.node_groups.get("LOD Forest")
+    if node_tree is None:
+        node_tree = new_geometry_node_group("LOD Forest")
+    apply_node_spec(node_tree, lod_forest_node_tree_spec())
+    node_tree.nodes["Collection Info"].inputs["Collection"].default_value = prototypes
+
+    mesh = create_point_mesh("LOD Forest", positions, prototype_ids)
+    mesh.attributes.new(LOD_ATTRIBUTE, "INT", "POINT")
+    obj = bpy.data.objects.new("LOD Forest", mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    modifier = obj.modifiers.new(name="LOD Forest", type="NODES")
+    modifier.node_group = node_tree
+
+    _lod_forests[obj.name] = {
+        "type": "INSTANCES",
+        "distances": distances,
+        "positions": np.asarray(positions, dtype=np.float32),
+        "levels": np.zeros(len(positions), dtype=np.int32),
+    }
+    _register_handler()
+    update_forest_lod(bpy.context.scene)
+
+    return obj
+
+
+def _update_instance_lod(obj, state, levels):
+    """LOD が変わった木があれば lod 属性をまとめて書き換える"""
+    changed = np.count_nonzero(levels != state["levels"])
+    if changed == 0:
+        return 0
+
+    obj.data.attributes[LOD_ATTRIBUTE].data.foreach_set("value", levels)
+    obj.data.update()
+    state["levels"] = levels
+
+    return changed
+
+
+def update_forest_lod(scene, depsgraph=None):
+    """
+    シーンのカメラの位置で、登録したすべての森の LOD を更新する
+    カメラの位置は新しいフレームで評価した結果を使う
+    """
+    camera = scene.camera
+    if camera is None:
+        return
+
+    depsgraph = depsgraph or bpy.context.evaluated_depsgraph_get()
+    camera_location = camera.evaluated_get(depsgraph).matrix_world.translation
+    for name, state in _lod_forests.items():
+        levels = lod_levels(state["positions"], camera_location, state["distances"])
+        if state["type"] == "OBJECTS":
+            collection = bpy.data.collections.get(name)
+            if collection:
+                _update_object_lod(collection, state, levels)
+        else:
+            obj = bpy.data.objects.get(name)
+            if obj:
+                _update_instance_lod(obj, state, levels)
+
+
+def _register_handler():
+    # frame_change_pre ではカメラがまだ新しいフレームで評価されていない
+    if update_forest_lod not in bpy.app.handlers.frame_change_post:
+        bpy.app.handlers.frame_change_post.append(update_forest_lod)
@@ -0,0 +1,193 @@
+"""
+create_centerpiece() のジオメトリノードの評価時間を計測する
+細分化のレベルごとにフレームを進めて評価済みのメッシュを取得し、
+評価時間・頂点数・面数・メモリをフレームごとに記録する
+
+実行例:
+    blender -b --python geometry_nodes_benchmark.py -- --levels 1-6 --frames 1-90 \\
+        --json bench.json --csv bench.csv --baseline previous_bench.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import blender_python_for_geometry_nodes as centerpiece
+from render_settings import parse_frames
+
+try:
+    import resource
+except ImportError:
+    # Windows では resource モジュールが使えない
+    resource = None
+
+# 基準より何割遅くなったら劣化とみなすか
+DEFAULT_TOLERANCE = 0.1
+
+
+def peak_memory_mb():
+    """プロセスの最大メモリ使用量(MB)を返す"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux は KB 単位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def mesh_memory_mb(mesh):
+    """評価済みメッシュの主要な配列のメモリ量を概算(MB)"""
+    size = (
+        len(mesh.vertices) * 12
+        + len(mesh.edges) * 8
+        + len(mesh.loops) * 8
+        + len(mesh.polygons) * 8
+    )
+    return size / (1024 * 1024)
+
+
+def benchmark_level(level, frames):
+    """指定したレベルでフレームを進め、フレームごとの計測結果を返す"""
+    centerpiece.clean_scene()
+    centerpiece.set_scene_props(fps=30, frame_count=max(frames))
+    # アニメーションを毎回同じにするため開始フレームを固定する
+    obj = centerpiece.create_centerpiece(subdivide_level=level, start_frames=(0, 75))
+    scene = bpy.context.scene
+
+    records = []
+    for frame in frames:
+        start_time = time.perf_counter()
+        scene.frame_set(frame)
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        obj_eval = obj.evaluated_get(depsgraph)
+        evaluate_time = time.perf_counter() - start_time
+
+        mesh = obj_eval.to_mesh()
+        face_count = len(mesh.polygons)
+        records.append(
+            {
+                "level": level,
+                "frame": frame,
+                "evaluate_seconds": evaluate_time,
+                "vertices": len(mesh.vertices),
+                "faces": face_count,
+                "mesh_mb": mesh_memory_mb(mesh),
+                "peak_process_mb": peak_memory_mb(),
+            }
+        )
+        obj_eval.to_mesh_clear()
+
+    return records
+
+
+def summarize(records):
+    """レベルごとに平均評価時間と100万面あたりの評価時間をまとめる"""
+    summary = {}
+    for level in sorted({record["level"] for record in records}):
+        level_records = [record for record in records if record["level"] == level]
+        mean_seconds = sum(r["evaluate_seconds"] for r in level_records) / len(
+            level_records
+        )
+        faces = max(record["faces"] for record in level_records)
+        summary[str(level)] = {
+            "frames": len(level_records),
+            "faces": faces,
+            "mean_evaluate_seconds": mean_seconds,
+            "seconds_per_million_faces": mean_seconds / faces * 1e6 if faces else 0.0,
+        }
+
+    return summary
+
+
+def find_regressions(summary, baseline, tolerance=DEFAULT_TOLERANCE):
+    """基準の結果と比べて、100万面あたりの評価時間が悪化したレベルを返す"""
+    regressions = []
+    for level, result in summary.items():
+        base = baseline.get(level)
+        if not base:
+            continue
+        limit = base["seconds_per_million_faces"] * (1 + tolerance)
+        if result["seconds_per_million_faces"] > limit:
+            regressions.append(
+                {
+                    "level": level,
+                    "baseline": base["seconds_per_million_faces"],
+                    "current": result["seconds_per_million_faces"],
+                }
+            )
+
+    return regressions
+
+
+def write_csv(path, records):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="ジオメトリノードの評価ベンチマーク")
+    parser.add_argument("--levels", default="1-6", help="細分化のレベル 例: 1-6")
+    parser.add_argument("--frames", default="1-90", help="例: 1-90 / 1,45,90")
+    parser.add_argument("--json", default="geometry_nodes_benchmark.json")
+    parser.add_argument("--csv", help="フレームごとの結果を書き出す CSV")
+    parser.add_argument("--baseline", help="比較する以前の JSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+
+    return parser.parse_args(argv)
+
+
+def main():
+    # Blender から起動された場合は「--」以降が引数
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    args = parse_args(argv)
+
+    frames = parse_frames(args.frames)
+    records = []
+    for level in parse_frames(args.levels):
+        records.extend(benchmark_level(level, frames))
+
+    summary = summarize(records)
+    for level, result in summary.items():
+        print(
+            f"level {level}: {result['faces']} faces, "
+            f"{result['mean_evaluate_seconds'] * 1000:.2f} ms/frame, "
+            f"{result['seconds_per_million_faces']:.4f} s per million faces"
+        )
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+        regressions = find_regressions(summary, baseline, args.tolerance)
+        for regression in regressions:
+            print(
+                f"REGRESSION level {regression['level']}: "
+                f"{regression['baseline']:.4f} -> {regression['current']:.4f} "
+                "s per million faces"
+            )
+
+    result = {
+        "blender_version": bpy.app.version_string,
+        "summary": summary,
+        "regressions": regressions,
+        "records": records,
+    }
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    if args.csv:
+        write_csv(args.csv, records)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
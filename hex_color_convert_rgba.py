@@ -4,6 +4,9 @@ import bpy
 # Pythonの数学機能の拡張
 import math
 
+# 多数の色をまとめて変換するための配列計算ライブラリ
+import numpy as np
+
 
 # 16進数カラーコードをRGBAに変換する関数
 def hex_color_to_rgba(hex_color):
@@ -45,16 +48,160 @@ def convert_srgb_to_linear_rgb(srgb_color_component: float) -> float:
     return linear_color_component
 
 
-hex_color = "#FFD43B"
-rgba_color = hex_color_to_rgba(hex_color)
+# ====================
+# 多数の色をまとめて変換する
+# ====================
+
+
+def srgb_to_linear(srgb):
+    """sRGB の値(0.0 から 1.0)の配列をリニアRGBに変換する"""
+    srgb = np.asarray(srgb, dtype=np.float64)
+    linear = np.where(
+        srgb <= 0.04045,
+        srgb / 12.92,
+        ((np.maximum(srgb, 0.04045) + 0.055) / 1.055) ** 2.4,
+    )
+
+    return linear.astype(np.float32)
+
+
+def linear_to_srgb(linear):
+    """リニアRGBの値の配列を sRGB(0.0 から 1.0)に変換する"""
+    linear = np.asarray(linear, dtype=np.float64)
+    srgb = np.where(
+        linear <= 0.0031308,
+        linear * 12.92,
+        1.055 * np.maximum(linear, 0.0031308) ** (1 / 2.4) - 0.055,
+    )
+
+    return srgb.astype(np.float32)
+
+
+# 8ビットの sRGB の値(0 から 255)に対応するリニアRGBの値
+SRGB_TO_LINEAR_LUT = srgb_to_linear(np.arange(256) / 255)
+
+# 8ビットの値の境目(隣り合う値の中間)をリニアRGBに変換した値
+# リニアRGBから8ビットに戻すときに、LUT の値が必ず元の値に戻るようにする
+LINEAR_TO_SRGB_BOUNDARIES = srgb_to_linear((np.arange(255) + 0.5) / 255)
+
+
+def hex_colors_to_uint8(hex_colors):
+    """
+    16進数カラーコード("#RRGGBB" か "#RRGGBBAA")の配列を
+    (色の数, 4) の uint8 の配列に変換する(アルファがない場合は 255)
+    """
+    hex_colors = np.char.lstrip(np.asarray(hex_colors, dtype=str), "#")
+    lengths = np.char.str_len(hex_colors)
+    if not np.isin(lengths, (6, 8)).all():
+        raise ValueError("hex colors must have 6 or 8 digits")
+
+    # アルファがない色に "ff" を付けて、すべて8桁にしてから一度に変換する
+    hex_colors = np.where(lengths == 6, np.char.add(hex_colors, "ff"), hex_colors)
+    data = bytes.fromhex("".join(hex_colors.tolist()))
+
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, 4)
+
+
+def _color_rows(colors):
+    """
+    色の配列を (色の数, 3) か (色の数, 4) にする
+    空の配列は (0, 4) にする
+    """
+    if colors.size == 0:
+        return colors.reshape(0, 4)
+    colors = colors.reshape(len(colors), -1)
+    if colors.shape[1] not in (3, 4):
+        raise ValueError("colors must have 3 or 4 channels")
+
+    return colors
+
+
+def uint8_to_linear_rgba(colors):
+    """
+    (色の数, 3) か (色の数, 4) の uint8 の sRGB の配列を
+    (色の数, 4) の float32 のリニアRGBAの配列に変換する
+    """
+    colors = _color_rows(np.asarray(colors, dtype=np.uint8))
+    rgba = np.ones((len(colors), 4), dtype=np.float32)
+    # 色は LUT で変換し、アルファは 255 で割るだけ
+    rgba[:, :3] = SRGB_TO_LINEAR_LUT[colors[:, :3]]
+    if colors.shape[1] == 4:
+        rgba[:, 3] = colors[:, 3] / 255
+
+    return rgba
+
+
+def hex_colors_to_linear_rgba(hex_colors):
+    """16進数カラーコードの配列を (色の数, 4) のリニアRGBAの配列に変換する"""
+    return uint8_to_linear_rgba(hex_colors_to_uint8(hex_colors))
+
+
+def to_linear_rgba(colors):
+    """
+    16進数カラーコード・整数 (0 から 255)・float (0 から 1) の sRGB の色の配列を
+    (色の数, 4) の float32 のリニアRGBAの配列に変換する
+    """
+    colors = np.asarray(colors)
+    if colors.dtype.kind in "US":
+        return hex_colors_to_linear_rgba(colors.astype(str))
+    if colors.dtype.kind in "iu":
+        # [[255, 128, 0]] のような整数のリストは8ビットの値として扱う
+        if colors.size and (colors.min() < 0 or colors.max() > 255):
+            raise ValueError("integer colors must be in the range 0-255")
+        return uint8_to_linear_rgba(colors)
+
+    colors = _color_rows(colors)
+    rgba = np.ones((len(colors), 4), dtype=np.float32)
+    rgba[:, :3] = srgb_to_linear(colors[:, :3])
+    if colors.shape[1] == 4:
+        rgba[:, 3] = colors[:, 3]
+
+    return rgba
+
+
+def linear_rgba_to_uint8(linear_rgba):
+    """
+    (色の数, 3) か (色の数, 4) のリニアRGB(A)の配列を (色の数, 4) の uint8 の sRGB に変換する
+    uint8_to_linear_rgba() で変換した値は元の値に戻る
+    """
+    linear_rgba = _color_rows(np.asarray(linear_rgba, dtype=np.float32))
+    colors = np.full((len(linear_rgba), 4), 255, dtype=np.uint8)
+    colors[:, :3] = np.searchsorted(
+        LINEAR_TO_SRGB_BOUNDARIES, linear_rgba[:, :3], side="right"
+    )
+    if linear_rgba.shape[1] == 4:
+        colors[:, 3] = np.clip(np.rint(linear_rgba[:, 3] * 255), 0, 255)
+
+    return colors
+
+
+def linear_rgba_to_hex_colors(linear_rgba, include_alpha=False):
+    """リニアRGB(A)の配列を16進数カラーコード("#RRGGBB")の配列に変換する"""
+    colors = linear_rgba_to_uint8(linear_rgba)
+    if not include_alpha:
+        colors = colors[:, :3]
+
+    digits = colors.shape[1] * 2
+    hex_text = colors.tobytes().hex().upper().encode("ascii")
+    hex_colors = np.frombuffer(hex_text, dtype=f"S{digits}").astype(str)
+
+    return np.char.add("#", hex_colors)
+
+
+def main():
+    hex_color = "#FFD43B"
+    rgba_color = hex_color_to_rgba(hex_color)
+
+    # シーンに平面を追加
+    bpy.ops.mesh.primitive_plane_add()
 
+    # 新しいマテリアルの作成
+    material = bpy.data.materials.new(name=f"hex_color_{hex_color}")
+    material.diffuse_color = rgba_color
 
-# シーンに平面を追加
-bpy.ops.mesh.primitive_plane_add()
+    # オブジェクトにマテリアルを追加
+    bpy.context.active_object.data.materials.append(material)
 
-# 新しいマテリアルの作成
-material = bpy.data.materials.new(name=f"hex_color_{hex_color}")
-material.diffuse_color = rgba_color
 
-# オブジェクトにマテリアルを追加
-bpy.context.active_object.data.materials.append(material)
+if __name__ == "__main__":
+    main()
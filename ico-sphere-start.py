@@ -1,23 +1,33 @@
 import bpy
+import numpy as np
+
+from icosphere import create_icosphere_mesh, create_icosphere_object
+from scene_reset import reset_scene
 
 
 def clear_scene():
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
+    reset_scene()
 
 
 clear_scene()
 
 
 class BaseMesh:
+    __slots__ = ("mesh_object", "wireframe_name", "modifier_stack")
+
     def __init__(self, mesh_object=None):
         if mesh_object and mesh_object.type == "MESH":
             self.mesh_object = mesh_object
         else:
-            bpy.ops.mesh.primitive_ico_sphere_add()
-            self.mesh_object = bpy.context.object
+            self.mesh_object = self.default_mesh_object()
 
         self.wireframe_name = None
+        # commit() まで Blender に作成しないモディファイア (名前, タイプ, 設定)
+        self.modifier_stack = []
+
+    def default_mesh_object(self):
+        """mesh_object を渡さなかった場合に使うオブジェクト"""
+        return create_icosphere_object()
 
     def create_mesh(self):
         pass
@@ -40,14 +50,260 @@ class BaseMesh:
             return
         self.mesh_object.modifiers[self.wireframe_name].thickness = thickness
 
+    def members(self):
+        """モディファイアを追加するオブジェクト"""
+        return (self.mesh_object,) if self.mesh_object else ()
+
+    def add_modifier(self, name, modifier_type, **settings):
+        """
+        モディファイアを記録する(Blender のデータはまだ変更しない)
+        例: mesh.add_modifier("wireframe", "WIREFRAME", thickness=0.05).commit()
+        """
+        self.modifier_stack.append((name, modifier_type, settings))
+        return self
+
+    def commit(self, apply=False):
+        """記録したモディファイアを作成する。apply=True なら適用したメッシュにする"""
+        commit_meshes([self], apply)
+
 
 class IcoSphereMesh(BaseMesh):
+    __slots__ = ()
+
     def __init__(self, mesh_object=None):
         super().__init__(mesh_object)
 
     def create_mesh(self):
-        bpy.ops.mesh.primitive_ico_sphere_add()
-        return bpy.context.object
+        return create_icosphere_object()
+
+
+class MeshBatch(BaseMesh):
+    """
+    多数のメッシュオブジェクトをまとめて操作する
+    オブジェクトはシーンにリンクしたコレクションで持ち、
+    変換は foreach_get / foreach_set で全オブジェクトの行列を一度に読み書きする
+    Python 側にはオブジェクトごとのラッパーを作らない
+    """
+
+    __slots__ = ("collection",)
+
+    def __init__(self, mesh_objects=(), name="MeshBatch"):
+        super().__init__()
+        # ユーザーのいないコレクションは保存時や孤立データの削除で消えるため、シーンにリンクする
+        self.collection = bpy.data.collections.new(name)
+        bpy.context.scene.collection.children.link(self.collection)
+        for mesh_object in mesh_objects:
+            if isinstance(mesh_object, BaseMesh):
+                mesh_object = mesh_object.mesh_object
+            if mesh_object and mesh_object.type == "MESH":
+                self.collection.objects.link(mesh_object)
+
+    @classmethod
+    def icospheres(cls, locations, subdivisions=2, radius=1.0, name="MeshBatch"):
+        """同じメッシュを共有する ICO 球を locations の位置にまとめて作成する"""
+        locations = np.asarray(locations, dtype=np.float32).reshape(-1, 3)
+        mesh = create_icosphere_mesh("Icosphere", subdivisions, radius)
+
+        batch = cls(name=name)
+        for _ in range(len(locations)):
+            obj = bpy.data.objects.new("Icosphere", mesh)
+            batch.collection.objects.link(obj)
+        batch.collection.objects.foreach_set("location", locations.ravel())
+
+        return batch
+
+    def __len__(self):
+        return len(self.collection.objects)
+
+    def members(self):
+        return self.collection.objects
+
+    def default_mesh_object(self):
+        # 1つのオブジェクトは持たず、コレクションのオブジェクトを操作する
+        return None
+
+    def create_mesh(self):
+        return create_icosphere_object(collection=self.collection)
+
+    def get_matrices(self):
+        """全オブジェクトのローカル行列 (オブジェクトの数, 4, 4) を返す"""
+        matrices = np.empty(len(self) * 16, dtype=np.float32)
+        self.collection.objects.foreach_get("matrix_basis", matrices)
+        # foreach_get の行列は列優先で並ぶため、転置して行優先にする
+        return matrices.reshape(-1, 4, 4).transpose(0, 2, 1)
+
+    def set_matrices(self, matrices):
+        matrices = np.ascontiguousarray(
+            np.asarray(matrices, dtype=np.float32).transpose(0, 2, 1)
+        )
+        self.collection.objects.foreach_set("matrix_basis", matrices.ravel())
+
+    def transform(self, matrix):
+        """全オブジェクトに同じ変換行列 (4, 4) を左から掛ける"""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        self.set_matrices(matrix @ self.get_matrices())
+
+    def scale(self, factor):
+        """全オブジェクトをそれぞれの原点を中心に拡大する"""
+        matrices = self.get_matrices()
+        matrices[:, :3, :3] *= factor
+        self.set_matrices(matrices)
+
+    def double_scale(self):
+        self.scale(2)
+
+    def add_wireframe_mod(self, thickness=None):
+        if self.wireframe_name:
+            print("error: can't have more than one wireframe mod")
+            return
+        self.wireframe_name = "wireframe"
+        for obj in self.collection.objects:
+            modifier = obj.modifiers.new(name=self.wireframe_name, type="WIREFRAME")
+            if thickness is not None:
+                modifier.thickness = thickness
+
+    def set_wireframe_thickness(self, thickness):
+        if not self.wireframe_name:
+            print("error: no wireframe mod found")
+            return
+        for obj in self.collection.objects:
+            obj.modifiers[self.wireframe_name].thickness = thickness
+
+
+# 結果がメッシュと設定だけで決まり、オブジェクトの変換や他のオブジェクトを使わない
+# モディファイア (オブジェクトを指定する設定は _modifier_signature() で確認する)
+SHAREABLE_MODIFIER_TYPES = {
+    "ARRAY",
+    "BEVEL",
+    "DECIMATE",
+    "DISPLACE",
+    "EDGE_SPLIT",
+    "MIRROR",
+    "REMESH",
+    "SCREW",
+    "SIMPLE_DEFORM",
+    "SKIN",
+    "SMOOTH",
+    "SOLIDIFY",
+    "SUBSURF",
+    "TRIANGULATE",
+    "WELD",
+    "WIREFRAME",
+}
+
+# 比較しないモディファイアの設定(評価結果に影響せず、オブジェクトごとに異なるもの)
+_IGNORED_MODIFIER_SETTINGS = {
+    "rna_type",
+    "name",
+    "show_expanded",
+    "is_active",
+    "persistent_uid",
+    "execution_time",
+}
+
+
+def _modifier_signature(modifier):
+    """
+    モディファイアの設定をすべて並べたタプルを返す
+    他のオブジェクトを指定している場合や、ワールド座標・オブジェクトの座標を使う場合は
+    オブジェクトごとに結果が変わるため None を返す
+    """
+    if modifier.type not in SHAREABLE_MODIFIER_TYPES:
+        return None
+
+    values = [modifier.type]
+    for prop in modifier.bl_rna.properties:
+        if prop.identifier in _IGNORED_MODIFIER_SETTINGS or prop.type == "COLLECTION":
+            continue
+        value = getattr(modifier, prop.identifier)
+        if prop.type == "POINTER":
+            # Array のオフセットやキャップ、Mirror の中心などのオブジェクト
+            if isinstance(value, bpy.types.Object):
+                return None
+        elif prop.type == "ENUM":
+            # Displace のテクスチャ座標 (OBJECT / GLOBAL) や方向の座標系 (GLOBAL)
+            if value in ("OBJECT", "GLOBAL"):
+                return None
+            if isinstance(value, set):
+                value = tuple(sorted(value))
+        elif getattr(prop, "is_array", False):
+            value = tuple(value)
+        values.append(value)
+
+    return tuple(values)
+
+
+def _shared_bake_key(obj):
+    """
+    評価結果が同じになるオブジェクトに共通のキーを返す(共有できない場合は None)
+    同じメッシュ・同じ頂点グループ名(モディファイアは名前で頂点グループを指定する)・
+    同じ設定のモディファイアを同じ順に持つオブジェクトは、評価結果が同じになる
+    """
+    signatures = []
+    for modifier in obj.modifiers:
+        signature = _modifier_signature(modifier)
+        if signature is None:
+            return None
+        signatures.append(signature)
+
+    vertex_groups = tuple(group.name for group in obj.vertex_groups)
+    return obj.data, vertex_groups, tuple(signatures)
+
+
+def commit_meshes(meshes, apply=False):
+    """
+    複数の BaseMesh に記録したモディファイアをまとめて作成する
+    apply=True の場合は、依存グラフを1回だけ評価して全オブジェクトの評価結果を
+    新しいメッシュにし、モディファイアをすべて取り除く(ApplyModifier と違い
+    オペレーターとアクティブなオブジェクトを使わない)
+    同じメッシュと同じモディファイアを持つオブジェクト (MeshBatch.icospheres() など)
+    は1回だけ評価して新しいメッシュを共有する(_shared_bake_key() を参照)
+    """
+    objects = []
+    for mesh in meshes:
+        for obj in mesh.members():
+            for name, modifier_type, settings in mesh.modifier_stack:
+                modifier = obj.modifiers.new(name=name, type=modifier_type)
+                for setting, value in settings.items():
+                    setattr(modifier, setting, value)
+            objects.append(obj)
+
+        for name, modifier_type, _ in mesh.modifier_stack:
+            if modifier_type == "WIREFRAME":
+                mesh.wireframe_name = name
+        mesh.modifier_stack.clear()
+
+    if not apply:
+        return
+
+    objects = [(obj, _shared_bake_key(obj)) for obj in objects]
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    # 元のデータを変更すると評価結果が無効になるため、先にすべてのメッシュを作成する
+    shared_meshes = {}
+    baked_meshes = []
+    for obj, key in objects:
+        baked_mesh = shared_meshes.get(key) if key else None
+        if baked_mesh is None:
+            baked_mesh = bpy.data.meshes.new_from_object(
+                obj.evaluated_get(depsgraph), depsgraph=depsgraph
+            )
+            if key:
+                shared_meshes[key] = baked_mesh
+        baked_meshes.append(baked_mesh)
+
+    replaced_meshes = set()
+    for (obj, _), baked_mesh in zip(objects, baked_meshes):
+        obj.modifiers.clear()
+        replaced_meshes.add(obj.data)
+        obj.data = baked_mesh
+    # 置き換えたメッシュは、ほかに使われていなければ削除する
+    for replaced_mesh in replaced_meshes:
+        if replaced_mesh.users == 0:
+            bpy.data.meshes.remove(replaced_mesh)
+
+    for mesh in meshes:
+        mesh.wireframe_name = None
 
 
 i = IcoSphereMesh()
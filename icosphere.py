@@ -0,0 +1,139 @@
+"""
+NumPy による ICO 球の生成
+bpy.ops.mesh.primitive_ico_sphere_add() を使わずに、頂点と面を配列計算で作成する
+細分化のレベルごとのトポロジー(単位球の頂点と面)は一度だけ計算してキャッシュし、
+メッシュの作成では半径を掛けて foreach_set で書き込むだけにする
+3D ビューポートのコンテキストがなくても(バックグラウンドでも)使える
+"""
+
+import functools
+
+import bpy
+import numpy as np
+
+
+def _icosahedron():
+    """極が z 軸上にある正二十面体の単位球上の頂点と面"""
+    angles = np.radians(np.arange(5) * 72.0)
+    ring_z = 1 / np.sqrt(5)
+    ring_radius = 2 / np.sqrt(5)
+
+    vertices = np.zeros((12, 3))
+    vertices[0] = (0, 0, 1)
+    vertices[1:6, 0] = np.cos(angles) * ring_radius
+    vertices[1:6, 1] = np.sin(angles) * ring_radius
+    vertices[1:6, 2] = ring_z
+    # 下のリングは上のリングから 36 度ずらす
+    vertices[6:11, 0] = np.cos(angles + np.radians(36)) * ring_radius
+    vertices[6:11, 1] = np.sin(angles + np.radians(36)) * ring_radius
+    vertices[6:11, 2] = -ring_z
+    vertices[11] = (0, 0, -1)
+
+    i = np.arange(5)
+    upper = 1 + i
+    upper_next = 1 + (i + 1) % 5
+    lower = 6 + i
+    lower_next = 6 + (i + 1) % 5
+    faces = np.concatenate(
+        [
+            np.stack([np.zeros(5, int), upper, upper_next], axis=1),
+            np.stack([upper, lower, upper_next], axis=1),
+            np.stack([upper_next, lower, lower_next], axis=1),
+            np.stack([np.full(5, 11), lower_next, lower], axis=1),
+        ]
+    )
+
+    return vertices, faces
+
+
+def _subdivide(vertices, faces):
+    """すべての辺の中点を追加し、1つの三角形を4つに分割する"""
+    # 面の3つの辺を、頂点の番号の小さい順に並べて重複を取り除く
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    unique_edges, edge_indices = np.unique(edges, axis=0, return_inverse=True)
+
+    midpoints = vertices[unique_edges[:, 0]] + vertices[unique_edges[:, 1]]
+    midpoints /= np.linalg.norm(midpoints, axis=1, keepdims=True)
+    vertices = np.concatenate([vertices, midpoints])
+
+    # 中点の頂点の番号 (面の数, 3): a-b, b-c, c-a
+    mid = (len(vertices) - len(midpoints) + edge_indices).reshape(-1, 3)
+    a, b, c = faces.T
+    ab, bc, ca = mid.T
+    faces = np.concatenate(
+        [
+            np.stack([a, ab, ca], axis=1),
+            np.stack([ab, b, bc], axis=1),
+            np.stack([ca, bc, c], axis=1),
+            np.stack([ab, bc, ca], axis=1),
+        ]
+    )
+
+    return vertices, faces
+
+
+@functools.lru_cache(maxsize=None)
+def icosphere_topology(subdivisions=2):
+    """
+    細分化のレベル(primitive_ico_sphere_add と同じく 1 が正二十面体)ごとの
+    単位球の頂点 (頂点数, 3) と面 (面の数, 3) を返す
+    結果はキャッシュされるため、配列は読み取り専用
+    """
+    vertices, faces = _icosahedron()
+    for _ in range(subdivisions - 1):
+        vertices, faces = _subdivide(vertices, faces)
+
+    vertices = vertices.astype(np.float32)
+    faces = faces.astype(np.int32)
+    vertices.flags.writeable = False
+    faces.flags.writeable = False
+
+    return vertices, faces
+
+
+def create_icosphere_mesh(name="Icosphere", subdivisions=2, radius=1.0):
+    """キャッシュしたトポロジーに半径を掛けて ICO 球のメッシュを作成する"""
+    vertices, faces = icosphere_topology(subdivisions)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.loops.add(faces.size)
+    mesh.polygons.add(len(faces))
+    mesh.vertices.foreach_set("co", (vertices * radius).ravel())
+    mesh.loops.foreach_set("vertex_index", faces.ravel())
+    mesh.polygons.foreach_set("loop_start", np.arange(0, faces.size, 3, dtype=np.int32))
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set("loop_total", np.full(len(faces), 3, np.int32))
+    mesh.update(calc_edges=True)
+
+    return mesh
+
+
+def create_icosphere_object(
+    name="Icosphere",
+    subdivisions=2,
+    radius=1.0,
+    location=None,
+    collection=None,
+    select=True,
+):
+    """
+    ICO 球のオブジェクトを作成してシーンに追加する(オペレーターは使わない)
+    primitive_ico_sphere_add と同じく、location を省略すると 3D カーソルの位置に置き、
+    select=True なら他の選択を解除して新しいオブジェクトを選択・アクティブにする
+    """
+    scene = bpy.context.scene
+    obj = bpy.data.objects.new(name, create_icosphere_mesh(name, subdivisions, radius))
+    obj.location = scene.cursor.location if location is None else location
+
+    collection = collection or scene.collection
+    collection.objects.link(obj)
+
+    view_layer = bpy.context.view_layer
+    if select and obj.name in view_layer.objects:
+        for selected in view_layer.objects.selected:
+            selected.select_set(False)
+        obj.select_set(True)
+        view_layer.objects.active = obj
+
+    return obj
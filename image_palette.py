@@ -0,0 +1,127 @@
+"""
+画像からのパレットの抽出
+bpy.data.images のピクセルを foreach_get で読み込み、間引いたピクセルを
+リニアRGBで k-means 法によって K 色に分類する
+返す色は random_color_faces.py のマテリアルやカラー属性の生成にそのまま使える
+"""
+
+import bpy
+import numpy as np
+
+from hex_color_convert_rgba import srgb_to_linear
+
+# k-means 法に使うピクセルの数(4K の画像でも一定の時間で終わるように間引く)
+DEFAULT_SAMPLE_COUNT = 65536
+
+
+def read_image_pixels(image):
+    """画像のすべてのピクセルを (ピクセル数, 4) の配列として読み込む"""
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+
+    return pixels.reshape(-1, image.channels)
+
+
+def sample_pixels(pixels, sample_count=DEFAULT_SAMPLE_COUNT, seed=None):
+    """透明なピクセルを除き、ランダムに sample_count 個のピクセルを選ぶ"""
+    if pixels.shape[1] == 4:
+        pixels = pixels[pixels[:, 3] > 0]
+    if len(pixels) > sample_count:
+        rng = np.random.default_rng(seed)
+        pixels = pixels[rng.choice(len(pixels), sample_count, replace=False)]
+
+    return pixels
+
+
+def _squared_distances(points, centers):
+    """すべての点とすべての中心の距離の2乗を (点の数, 中心の数) の配列で返す"""
+    return (
+        np.einsum("ij,ij->i", points, points)[:, None]
+        - 2 * points @ centers.T
+        + np.einsum("ij,ij->i", centers, centers)[None, :]
+    )
+
+
+def kmeans(points, k, iterations=30, tolerance=1e-6, seed=None):
+    """
+    k-means 法で点を k 個のグループに分ける(初期値は k-means++)
+    (中心の配列, 各点のグループ番号) を返す
+    """
+    rng = np.random.default_rng(seed)
+    points = np.asarray(points, dtype=np.float64)
+    k = min(k, len(points))
+
+    # k-means++: すでに選んだ中心から遠い点ほど選ばれやすくする
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[rng.integers(len(points))]
+    nearest = _squared_distances(points, centers[:1]).ravel()
+    for i in range(1, k):
+        weights = np.maximum(nearest, 0)
+        total = weights.sum()
+        index = (
+            rng.choice(len(points), p=weights / total)
+            if total > 0
+            else rng.integers(len(points))
+        )
+        centers[i] = points[index]
+        nearest = np.minimum(
+            nearest, _squared_distances(points, centers[i : i + 1])[:, 0]
+        )
+
+    for _ in range(iterations):
+        labels = _squared_distances(points, centers).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        new_centers = np.stack(
+            [
+                np.bincount(labels, weights=points[:, axis], minlength=k)
+                for axis in range(points.shape[1])
+            ],
+            axis=1,
+        )
+        # 空になったグループは元の中心のままにする
+        filled = counts > 0
+        new_centers[filled] /= counts[filled, None]
+        new_centers[~filled] = centers[~filled]
+
+        shift = np.abs(new_centers - centers).max()
+        centers = new_centers
+        if shift < tolerance:
+            break
+
+    labels = _squared_distances(points, centers).argmin(axis=1)
+
+    return centers, labels
+
+
+def extract_palette(image, k=8, sample_count=DEFAULT_SAMPLE_COUNT, seed=None):
+    """
+    画像から K 色のパレットを取り出す
+    (K, 4) の float32 のリニアRGBAの配列を、多く使われている色の順に返す
+    """
+    pixels = sample_pixels(read_image_pixels(image), sample_count, seed)
+    colors = pixels[:, :3]
+
+    if len(colors) == 0:
+        raise ValueError(f"no opaque pixels in image: {image.name}")
+    # ピクセルの数より多くの色には分けられない
+    k = min(k, len(colors))
+
+    # 8ビットの画像のピクセルは sRGB のまま読み込まれるため、リニアRGBにしてから分類する
+    if not image.is_float and image.colorspace_settings.name == "sRGB":
+        colors = srgb_to_linear(colors)
+
+    centers, labels = kmeans(colors, k, seed=seed)
+    order = np.argsort(-np.bincount(labels, minlength=len(centers)), kind="stable")
+
+    palette = np.ones((len(centers), 4), dtype=np.float32)
+    palette[:, :3] = centers[order]
+
+    return palette
+
+
+def load_image_palette(path, k=8, sample_count=DEFAULT_SAMPLE_COUNT, seed=None):
+    """画像ファイルを読み込んでパレットを取り出す"""
+    image = bpy.data.images.load(path, check_existing=True)
+
+    return extract_palette(image, k, sample_count, seed)
@@ -0,0 +1,169 @@
+"""
+マテリアルの登録・再利用
+ノードの構成(ノードタイプ・入力値・リンク)のハッシュをキーにして、
+同じ内容のマテリアルがすでにあれば新しく作らずにそれを返す
+
+マテリアルの内容は次のような辞書(spec)で表す(ノードの形式は node_tree_builder.py を参照)
+{
+    "properties": {"diffuse_color": [1, 0, 0, 1]},
+    "nodes": {
+        "output": {"type": "ShaderNodeOutputMaterial", "location": [200, 0]},
+        "emission": {
+            "type": "ShaderNodeEmission",
+            "inputs": {"Color": [1, 1, 1, 1], "Strength": 10},
+        },
+    },
+    "links": [["emission", "Emission", "output", "Surface"]],
+}
+"""
+
+import hashlib
+import json
+import weakref
+
+import bpy
+
+from node_tree_builder import apply_node_spec
+
+# マテリアルに保存するハッシュのカスタムプロパティ名
+HASH_PROPERTY = "material_registry_hash"
+
+
+def material_hash(spec):
+    """マテリアルの内容からハッシュ値を求める"""
+    text = json.dumps(spec, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def build_material(name, spec):
+    """spec の内容でマテリアルを新しく作成"""
+    mat = bpy.data.materials.new(name)
+
+    for prop_name, value in spec.get("properties", {}).items():
+        setattr(mat, prop_name, value)
+
+    if "nodes" not in spec:
+        return mat
+
+    # ノードベースのマテリアルにし、spec にないノードは削除される
+    mat.use_nodes = True
+    apply_node_spec(mat.node_tree, spec)
+
+    return mat
+
+
+class MaterialRegistry:
+    """
+    ハッシュをキーにしたマテリアルのキャッシュ
+    ハッシュはマテリアルのカスタムプロパティに保存するため、
+    マテリアルの名前を変更しても再利用できる
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # ハッシュ → マテリアル名
+        self._names = {}
+        # 最後に探し直したときのマテリアル名(以降に get() で作成したものを含む)
+        self._scanned_names = None
+        # ファイルの読み込みやマテリアルの変更があり、探し直す必要がある
+        self._dirty = True
+        _registries.add(self)
+
+    def find(self, key):
+        """ハッシュが一致するマテリアルを探す"""
+        name = self._names.get(key)
+        mat = bpy.data.materials.get(name) if name else None
+        if mat and mat.get(HASH_PROPERTY) == key:
+            return mat
+
+        # 登録のないハッシュで、探し直してからマテリアルが変わっていなければ探さない
+        # (多数のマテリアルを続けて作成するときに毎回すべてを調べないようにする)
+        # 数だけでは削除と追加が同時に起きた場合を見分けられないため、
+        # ハンドラーが立てる _dirty と合わせて判定する
+        if (
+            name is None
+            and not self._dirty
+            and self._scanned_names is not None
+            and len(bpy.data.materials) == len(self._scanned_names)
+        ):
+            return None
+
+        # 名前が変わっていたり、別のファイルで作られていた場合は探し直す
+        self._scanned_names = set(bpy.data.materials.keys())
+        self._dirty = False
+        for mat in bpy.data.materials:
+            mat_key = mat.get(HASH_PROPERTY)
+            if mat_key:
+                self._names[mat_key] = mat.name
+        name = self._names.get(key)
+
+        return bpy.data.materials.get(name) if name else None
+
+    def get(self, name, spec):
+        """同じ内容のマテリアルがあれば返し、なければ作成する"""
+        key = material_hash(spec)
+        mat = self.find(key)
+        if mat:
+            self.hits += 1
+            return mat
+
+        self.misses += 1
+        mat = build_material(name, spec)
+        mat[HASH_PROPERTY] = key
+        self._names[key] = mat.name
+        if self._scanned_names is not None:
+            self._scanned_names.add(mat.name)
+
+        return mat
+
+    def reset_stats(self):
+        """ヒット数とミス数をリセット"""
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"MaterialRegistry(hits={self.hits}, misses={self.misses})"
+
+
+# 作成したすべてのレジストリ(ハンドラーから探し直しを指示する)
+_registries = weakref.WeakSet()
+
+
+@bpy.app.handlers.persistent
+def _mark_registries_dirty(*args):
+    """ファイルを読み込んだら、すべてのレジストリで探し直す"""
+    for registry in _registries:
+        registry._dirty = True
+
+
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(scene, depsgraph=None):
+    """マテリアルが追加・削除・変更されたら、すべてのレジストリで探し直す"""
+    if depsgraph is None or depsgraph.id_type_updated("MATERIAL"):
+        _mark_registries_dirty()
+
+
+def _register_handlers():
+    """ハンドラーを登録する(スクリプトを再実行したときは古いものと置き換える)"""
+    handlers = bpy.app.handlers
+    for handler_list, function in (
+        (handlers.load_post, _mark_registries_dirty),
+        (handlers.depsgraph_update_post, _on_depsgraph_update),
+    ):
+        for handler in list(handler_list):
+            if getattr(handler, "__module__", None) == __name__ and (
+                getattr(handler, "__name__", None) == function.__name__
+            ):
+                handler_list.remove(handler)
+        handler_list.append(function)
+
+
+_register_handlers()
+
+registry = MaterialRegistry()
+
+
+def get_material(name, spec):
+    """共有のレジストリからマテリアルを取得"""
+    return registry.get(name, spec)
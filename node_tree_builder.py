@@ -0,0 +1,225 @@
+"""
+宣言的なノードツリーの構築
+ノードの構成を辞書(spec)で表し、既存のノードツリーとの差分だけを更新する
+再実行やパラメーターの変更ではノードを作り直さず、変わった値とリンクだけを変更する
+
+spec の形式
+{
+    "nodes": {
+        # キーがノード名になる
+        "Subdivide Mesh": {
+            "type": "GeometryNodeSubdivideMesh",
+            "location": [300, 0],
+            "properties": {},                     # ノードの属性 (operation など)
+            "inputs": {"Level": 3},               # 入力ソケットの既定値
+            "keyframes": {                        # 入力ソケットのアニメーション
+                "Level": {"points": [[1, 1], [90, 6]], "cycles": True},
+            },
+            "color_ramp": [[0.45, [0, 0, 0, 1]], [0.5, [1, 1, 1, 1]]],
+        },
+    },
+    # [出力ノード, 出力ソケット, 入力ノード, 入力ソケット] (ソケットは名前か番号)
+    "links": [["Mesh Cube", "Mesh", "Subdivide Mesh", "Mesh"]],
+}
+"""
+
+import bpy
+import numpy as np
+
+
+def new_geometry_node_group(name):
+    """ジオメトリの入出力ソケットを持つジオメトリノードグループを作成"""
+    node_tree = bpy.data.node_groups.new(name, "GeometryNodeTree")
+
+    if bpy.app.version >= (4, 0, 0):
+        node_tree.interface.new_socket(
+            "Geometry", in_out="INPUT", socket_type="NodeSocketGeometry"
+        )
+        node_tree.interface.new_socket(
+            "Geometry", in_out="OUTPUT", socket_type="NodeSocketGeometry"
+        )
+    else:
+        node_tree.inputs.new("NodeSocketGeometry", "Geometry")
+        node_tree.outputs.new("NodeSocketGeometry", "Geometry")
+
+    return node_tree
+
+
+def add_group_input(node_tree, name, socket_type, default_value=None):
+    """
+    ノードグループに入力ソケットを追加し、その識別子を返す(すでにあれば追加しない)
+    モディファイアの入力値は modifier[識別子] で設定する
+    """
+    if bpy.app.version >= (4, 0, 0):
+        for item in node_tree.interface.items_tree:
+            if item.item_type == "SOCKET" and item.in_out == "INPUT":
+                if item.name == name:
+                    return item.identifier
+        socket = node_tree.interface.new_socket(
+            name, in_out="INPUT", socket_type=socket_type
+        )
+    else:
+        socket = node_tree.inputs.get(name) or node_tree.inputs.new(socket_type, name)
+
+    if default_value is not None:
+        socket.default_value = default_value
+
+    return socket.identifier
+
+
+def find_socket(sockets, key):
+    """
+    番号か名前でソケットを探す
+    同じ名前のソケットが複数ある場合(ランダム値ノードなど)は有効なものを優先する
+    """
+    if isinstance(key, int):
+        return sockets[key]
+    for socket in sockets:
+        if socket.name == key and socket.enabled:
+            return socket
+
+    return sockets[key]
+
+
+def _values_differ(current, value):
+    """ソケットや属性の現在の値と spec の値が異なるかを判定"""
+    if isinstance(value, (list, tuple)):
+        return not np.allclose(np.asarray(current[:]), np.asarray(value))
+    if isinstance(value, float):
+        return not np.isclose(current, value)
+
+    return current != value
+
+
+def _update_color_ramp(node, color_ramp, stats):
+    elements = node.color_ramp.elements
+    # 要素の数を spec に合わせる
+    while len(elements) > len(color_ramp):
+        elements.remove(elements[-1])
+    for i, (position, color) in enumerate(color_ramp):
+        if i >= len(elements):
+            elements.new(position)
+        element = elements[i]
+        if _values_differ(element.position, position) or _values_differ(
+            element.color, color
+        ):
+            element.position = position
+            element.color = color
+            stats["values"] += 1
+
+
+def _update_keyframes(node_tree, node, keyframes, desired_paths, stats):
+    """入力ソケットのキーフレームが変わった場合だけ F カーブを作り直す"""
+    for input_name, keyframe_spec in keyframes.items():
+        socket = find_socket(node.inputs, input_name)
+        data_path = socket.path_from_id("default_value")
+        desired_paths.add(data_path)
+
+        points = np.asarray(keyframe_spec["points"], dtype=np.float32)
+        animation_data = node_tree.animation_data or node_tree.animation_data_create()
+        if animation_data.action is None:
+            animation_data.action = bpy.data.actions.new(f"{node_tree.name}Action")
+        fcurves = animation_data.action.fcurves
+
+        fcurve = fcurves.find(data_path)
+        if fcurve:
+            current = np.empty(len(fcurve.keyframe_points) * 2, dtype=np.float32)
+            fcurve.keyframe_points.foreach_get("co", current)
+            has_cycles = any(mod.type == "CYCLES" for mod in fcurve.modifiers)
+            if (
+                current.size == points.size
+                and np.allclose(current, points.ravel())
+                and has_cycles == keyframe_spec.get("cycles", False)
+            ):
+                continue
+            fcurves.remove(fcurve)
+
+        fcurve = fcurves.new(data_path)
+        fcurve.keyframe_points.add(len(points))
+        fcurve.keyframe_points.foreach_set("co", points.ravel())
+        if keyframe_spec.get("cycles", False):
+            fcurve.modifiers.new(type="CYCLES")
+        fcurve.update()
+        stats["keyframes"] += 1
+
+
+def apply_node_spec(node_tree, spec):
+    """
+    spec とノードツリーの差分を取り、変わったノード・値・リンクだけを更新する
+    作成・削除・変更した数を返す
+    """
+    stats = {"created": 0, "removed": 0, "values": 0, "links": 0, "keyframes": 0}
+    nodes = node_tree.nodes
+    node_specs = spec.get("nodes", {})
+
+    # spec にない、またはタイプが変わったノードを削除
+    for node in list(nodes):
+        node_spec = node_specs.get(node.name)
+        if node_spec is None or node.bl_idname != node_spec["type"]:
+            nodes.remove(node)
+            stats["removed"] += 1
+
+    desired_paths = set()
+    for key, node_spec in node_specs.items():
+        node = nodes.get(key)
+        if node is None:
+            node = nodes.new(type=node_spec["type"])
+            node.name = key
+            stats["created"] += 1
+
+        if "location" in node_spec:
+            node.location = node_spec["location"]
+
+        for prop_name, value in node_spec.get("properties", {}).items():
+            if _values_differ(getattr(node, prop_name), value):
+                setattr(node, prop_name, value)
+                stats["values"] += 1
+
+        for input_name, value in node_spec.get("inputs", {}).items():
+            socket = find_socket(node.inputs, input_name)
+            if _values_differ(socket.default_value, value):
+                socket.default_value = value
+                stats["values"] += 1
+
+        if "color_ramp" in node_spec:
+            _update_color_ramp(node, node_spec["color_ramp"], stats)
+
+        _update_keyframes(
+            node_tree, node, node_spec.get("keyframes", {}), desired_paths, stats
+        )
+
+    # spec にないノードのアニメーションを削除
+    animation_data = node_tree.animation_data
+    if animation_data and animation_data.action:
+        fcurves = animation_data.action.fcurves
+        for fcurve in list(fcurves):
+            if fcurve.data_path.startswith("nodes[") and (
+                fcurve.data_path not in desired_paths
+            ):
+                fcurves.remove(fcurve)
+                stats["keyframes"] += 1
+
+    # リンクの差分を更新
+    desired_links = {}
+    for from_key, from_socket, to_key, to_socket in spec.get("links", []):
+        from_socket = find_socket(nodes[from_key].outputs, from_socket)
+        to_socket = find_socket(nodes[to_key].inputs, to_socket)
+        link_key = (from_key, from_socket.identifier, to_key, to_socket.identifier)
+        desired_links[link_key] = (from_socket, to_socket)
+
+    for link in list(node_tree.links):
+        link_key = (
+            link.from_node.name,
+            link.from_socket.identifier,
+            link.to_node.name,
+            link.to_socket.identifier,
+        )
+        if desired_links.pop(link_key, None) is None:
+            node_tree.links.remove(link)
+            stats["links"] += 1
+
+    for from_socket, to_socket in desired_links.values():
+        node_tree.links.new(from_socket, to_socket)
+        stats["links"] += 1
+
+    return stats
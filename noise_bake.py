@@ -0,0 +1,258 @@
+"""
+ノイズマスクのベイク
+create_simple_material.py の粗さのプロシージャルなノード
+(テクスチャ座標 → マッピング → ノイズテクスチャ → カラーランプ) を Cycles の CPU ベイクで画像にし、
+マテリアルをその画像を読むようにつなぎ替える
+ベイクした画像はノードのパラメーターのハッシュをファイル名にしてディスクに保存し、
+同じパラメーターのマテリアルは二度ベイクしない
+
+実行例:
+    blender -b --python noise_bake.py -- --resolution 1024 --frames 1-3 \\
+        --cache bake_cache --json bake_benchmark.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import create_simple_material
+from material_registry import material_hash
+from render_settings import (
+    parse_frames,
+    restore_render_settings,
+    save_render_settings,
+    setup_render_settings,
+)
+
+# ベイクするノード(粗さのプロシージャルなノード)
+BAKED_NODE_NAMES = ("Texture Coordinate", "Mapping", "Noise Texture", "Color Ramp")
+
+# ベイクした画像を読むノードの名前
+BAKED_IMAGE_NODE_NAME = "Baked Roughness"
+
+DEFAULT_CACHE_DIR = "bake_cache"
+
+
+def _socket_value(socket):
+    value = socket.default_value
+    return list(value) if hasattr(value, "__len__") else value
+
+
+def noise_mask_parameters(obj, material, resolution):
+    """ベイクの結果に影響するノードのパラメーター・メッシュ・解像度をまとめる"""
+    nodes = material.node_tree.nodes
+    parameters = {"resolution": resolution}
+
+    for name in BAKED_NODE_NAMES:
+        node = nodes[name]
+        node_parameters = {
+            "type": node.bl_idname,
+            "inputs": {
+                socket.identifier: _socket_value(socket)
+                for socket in node.inputs
+                if hasattr(socket, "default_value") and not socket.is_linked
+            },
+        }
+        if name == "Color Ramp":
+            node_parameters["color_ramp"] = [
+                [element.position, list(element.color)]
+                for element in node.color_ramp.elements
+            ]
+        parameters[name] = node_parameters
+
+    # 生成座標と UV はメッシュの形によって変わる
+    mesh = obj.data
+    parameters["mesh"] = {
+        "vertices": len(mesh.vertices),
+        "polygons": len(mesh.polygons),
+        "dimensions": [round(value, 6) for value in obj.dimensions],
+    }
+
+    return parameters
+
+
+def _bake_to_image(obj, material, image):
+    """粗さのノードを放射としてつなぎ、Cycles の CPU ベイクで画像に書き込む"""
+    scene = bpy.context.scene
+    saved_settings = save_render_settings(scene)
+
+    node_tree = material.node_tree
+    nodes = node_tree.nodes
+    output = nodes["Material Output"]
+    original_surface = output.inputs["Surface"].links[0].from_socket
+    emission = None
+    image_node = None
+
+    # ベイクに失敗しても、マテリアルのつなぎ方とレンダリングの設定は必ず元に戻す
+    try:
+        # 放射のベイクはノイズがないため1サンプルで十分
+        setup_render_settings(scene, threads=None, samples=1)
+
+        # 一時的にカラーランプを放射シェーダーにつないで出力する
+        emission = nodes.new("ShaderNodeEmission")
+        node_tree.links.new(
+            nodes["Color Ramp"].outputs["Color"], emission.inputs["Color"]
+        )
+        node_tree.links.new(emission.outputs["Emission"], output.inputs["Surface"])
+
+        image_node = nodes.new("ShaderNodeTexImage")
+        image_node.image = image
+        nodes.active = image_node
+
+        # ベイクは選択されたアクティブなオブジェクトに対して行われる
+        for selected in bpy.context.selected_objects:
+            selected.select_set(False)
+        obj.select_set(True)
+        bpy.context.view_layer.objects.active = obj
+
+        bpy.ops.object.bake(type="EMIT", margin=4)
+    finally:
+        if image_node is not None:
+            nodes.remove(image_node)
+        if emission is not None:
+            nodes.remove(emission)
+        node_tree.links.new(original_surface, output.inputs["Surface"])
+        restore_render_settings(scene, saved_settings)
+
+
+def bake_noise_mask(obj, material, resolution=1024, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    マテリアルの粗さのノードを画像にベイクし、その画像を返す
+    同じパラメーターの画像がキャッシュにあればベイクせずに読み込む
+    """
+    key = material_hash(noise_mask_parameters(obj, material, resolution))
+    path = os.path.abspath(os.path.join(cache_dir, f"noise_mask_{key}.png"))
+
+    if os.path.exists(path):
+        print(f"bake_noise_mask: cache hit {path}")
+        image = bpy.data.images.load(path, check_existing=True)
+    else:
+        start_time = time.perf_counter()
+        os.makedirs(cache_dir, exist_ok=True)
+        image = bpy.data.images.new(f"noise_mask_{key}", resolution, resolution)
+        # 粗さはデータなので、色空間の変換をせずにそのままの値で保存する
+        image.colorspace_settings.name = "Non-Color"
+        _bake_to_image(obj, material, image)
+
+        image.filepath_raw = path
+        image.file_format = "PNG"
+        image.save()
+        elapsed_time = time.perf_counter() - start_time
+        print(f"bake_noise_mask: baked {path} in {elapsed_time:.3f}s")
+
+    image.colorspace_settings.name = "Non-Color"
+
+    return image
+
+
+def use_baked_roughness(material, image):
+    """粗さをベイクした画像から読むようにつなぎ替える(元のノードは残す)"""
+    node_tree = material.node_tree
+    nodes = node_tree.nodes
+
+    image_node = nodes.get(BAKED_IMAGE_NODE_NAME)
+    if image_node is None:
+        image_node = nodes.new("ShaderNodeTexImage")
+        image_node.name = BAKED_IMAGE_NODE_NAME
+        image_node.location = (-300, -300)
+    image_node.image = image
+
+    node_tree.links.new(
+        image_node.outputs["Color"], nodes["Principled BSDF"].inputs["Roughness"]
+    )
+
+
+def use_procedural_roughness(material):
+    """粗さをプロシージャルなノードから読むように戻す"""
+    nodes = material.node_tree.nodes
+    material.node_tree.links.new(
+        nodes["Color Ramp"].outputs["Color"],
+        nodes["Principled BSDF"].inputs["Roughness"],
+    )
+
+
+def benchmark_render(frames):
+    """フレームごとのレンダリング時間(秒)を返す"""
+    scene = bpy.context.scene
+    times = []
+    for frame in frames:
+        scene.frame_set(frame)
+        start_time = time.perf_counter()
+        bpy.ops.render.render()
+        times.append(time.perf_counter() - start_time)
+
+    return times
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="ノイズマスクのベイクとレンダリングの比較"
+    )
+    parser.add_argument("--resolution", type=int, default=1024)
+    parser.add_argument("--frames", default="1-3", help="例: 1-3 / 1,5")
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--cache", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--json", default="bake_benchmark.json")
+
+    return parser.parse_args(argv)
+
+
+def main():
+    # Blender から起動された場合は「--」以降が引数
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    args = parse_args(argv)
+    frames = parse_frames(args.frames)
+
+    create_simple_material.partially_clean_the_scene()
+    obj = create_simple_material.add_mesh()
+    material = create_simple_material.create_material("My_Generated_Material")
+    obj.data.materials.append(material)
+
+    # カメラとライトを追加してレンダリングできるようにする
+    camera = bpy.data.objects.new("Camera", bpy.data.cameras.new("Camera"))
+    camera.location = (0, -5, 0)
+    camera.rotation_euler = (1.5708, 0, 0)
+    light = bpy.data.objects.new("Light", bpy.data.lights.new("Light", "SUN"))
+    light.rotation_euler = (0.8, 0.2, 0)
+    for new_object in (camera, light):
+        bpy.context.scene.collection.objects.link(new_object)
+    bpy.context.scene.camera = camera
+
+    scene = bpy.context.scene
+    setup_render_settings(scene, threads=None, samples=args.samples)
+
+    procedural_times = benchmark_render(frames)
+
+    start_time = time.perf_counter()
+    image = bake_noise_mask(obj, material, args.resolution, args.cache)
+    bake_seconds = time.perf_counter() - start_time
+    use_baked_roughness(material, image)
+
+    baked_times = benchmark_render(frames)
+
+    for frame, procedural, baked in zip(frames, procedural_times, baked_times):
+        print(f"frame {frame}: procedural {procedural:.3f}s, baked {baked:.3f}s")
+    print(f"bake (including cache lookup): {bake_seconds:.3f}s")
+
+    result = {
+        "blender_version": bpy.app.version_string,
+        "resolution": args.resolution,
+        "samples": args.samples,
+        "bake_seconds": bake_seconds,
+        "frames": [
+            {"frame": frame, "procedural_seconds": procedural, "baked_seconds": baked}
+            for frame, procedural, baked in zip(frames, procedural_times, baked_times)
+        ],
+    }
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""
+パレットファイルの読み込み
+パレットファイルを1行(1ブロック)ずつ読み込み、一定数ごとにまとめて色を変換する
+ファイル全体を読み込まないため、10万色のパレットでもメモリ使用量は一定
+
+対応する形式
+    .gpl         : GIMP パレット
+    .ase         : Adobe Swatch Exchange (RGB とグレーの色)
+    .css         : CSS カスタムプロパティ (--name: #RRGGBB; / rgb())
+    .json/.jsonl : 色の配列 (["#RRGGBB", ...] / [{"name": ..., "hex": ...}, ...])
+
+出力
+    import_palette_materials() : 重複を除いた色ごとのマテリアル
+    import_palette_image()     : パレット画像と、面の属性で色を選ぶ1つのマテリアル
+
+実行例:
+    blender -b --python palette_importer.py -- brand.gpl --mode image
+"""
+
+import argparse
+import codecs
+import json
+import os
+import re
+import struct
+import sys
+
+import bpy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hex_color_convert_rgba import hex_colors_to_uint8, uint8_to_linear_rgba
+from material_registry import get_material
+from node_tree_builder import apply_node_spec
+
+# まとめて変換する色の数
+DEFAULT_BATCH_SIZE = 4096
+
+# パレット画像の幅(GPU のテクスチャの最大サイズを超えないように複数行にする)
+PALETTE_IMAGE_WIDTH = 1024
+
+# パレットの番号を保存する面の属性名
+PALETTE_INDEX_ATTRIBUTE = "palette_index"
+
+
+# ====================
+# 色の表記
+# ====================
+
+
+def normalize_hex(text):
+    """16進数カラーコードの "#RGB" "#RGBA" を "#RRGGBB" "#RRGGBBAA" にそろえる"""
+    digits = text.strip().lstrip("#")
+    if len(digits) in (3, 4):
+        digits = "".join(digit * 2 for digit in digits)
+
+    return f"#{digits}"
+
+
+def float_rgb_to_hex(red, green, blue):
+    """0.0 から 1.0 の sRGB の値を16進数カラーコードにする"""
+    values = [min(max(round(value * 255), 0), 255) for value in (red, green, blue)]
+
+    return "#{:02X}{:02X}{:02X}".format(*values)
+
+
+def css_color_to_hex(text):
+    """CSS の色(16進数か rgb() / rgba())を16進数カラーコードにする"""
+    text = text.strip()
+    if text.startswith("#"):
+        return normalize_hex(text)
+
+    values = re.findall(r"[\d.]+%?", text)
+    channels = []
+    for i, value in enumerate(values[:4]):
+        if value.endswith("%"):
+            number = float(value[:-1]) / 100 * (255 if i < 3 else 1)
+        else:
+            number = float(value)
+        # アルファは 0.0 から 1.0 で書かれる
+        channels.append(number * 255 if i == 3 else number)
+
+    return "#" + "".join(f"{min(max(round(c), 0), 255):02X}" for c in channels)
+
+
+# ====================
+# 形式ごとの読み込み((名前, 16進数カラーコード)を1つずつ返す)
+# ====================
+
+GPL_COLOR_PATTERN = re.compile(r"^\s*(\d+)\s+(\d+)\s+(\d+)\s*(.*)$")
+CSS_COLOR_PATTERN = re.compile(r"--([\w-]+)\s*:\s*(#[0-9a-fA-F]{3,8}\b|rgba?\([^)]*\))")
+JSON_SEPARATOR_PATTERN = re.compile(r"[\s,]*")
+
+
+def read_gpl(f):
+    """GIMP パレット(1行に「R G B 名前」)を読み込む"""
+    for raw_line in f:
+        line = raw_line.decode("utf-8", "replace")
+        if line.lstrip().startswith("#"):
+            continue
+        match = GPL_COLOR_PATTERN.match(line)
+        if not match:
+            # 「GIMP Palette」「Name:」「Columns:」などのヘッダー
+            continue
+        red, green, blue = (int(value) for value in match.groups()[:3])
+        yield match.group(4).strip(), f"#{red:02X}{green:02X}{blue:02X}"
+
+
+def read_css(f):
+    """CSS カスタムプロパティの色を読み込む"""
+    for raw_line in f:
+        line = raw_line.decode("utf-8", "replace")
+        for match in CSS_COLOR_PATTERN.finditer(line):
+            yield match.group(1), css_color_to_hex(match.group(2))
+
+
+def read_ase(f):
+    """Adobe Swatch Exchange ファイルを1ブロックずつ読み込む(CMYK と Lab は読み飛ばす)"""
+    if f.read(4) != b"ASEF":
+        raise ValueError("not an ASE file")
+    _, _, block_count = struct.unpack(">HHI", f.read(8))
+
+    for _ in range(block_count):
+        block_type, length = struct.unpack(">HI", f.read(6))
+        data = f.read(length)
+        # 0x0001 が色、0xC001 と 0xC002 はグループの開始と終了
+        if block_type != 0x0001:
+            continue
+
+        (name_length,) = struct.unpack_from(">H", data, 0)
+        offset = 2 + name_length * 2
+        name = data[2:offset].decode("utf-16-be").rstrip("\0")
+        model = data[offset : offset + 4].decode("ascii").strip()
+        offset += 4
+
+        if model == "RGB":
+            red, green, blue = struct.unpack_from(">3f", data, offset)
+        elif model == "Gray":
+            (gray,) = struct.unpack_from(">f", data, offset)
+            red = green = blue = gray
+        else:
+            continue
+        yield name, float_rgb_to_hex(red, green, blue)
+
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    """最上位の JSON 配列の要素を、ファイル全体を読み込まずに1つずつ返す"""
+    decoder = json.JSONDecoder()
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        position = JSON_SEPARATOR_PATTERN.match(buffer, position).end()
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("JSON palette must be an array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # 要素の途中で区切られている場合は続きを読み込む
+                if eof:
+                    raise
+            else:
+                # 数値は途中で区切られている可能性があるため、続きがある場合だけ確定する
+                if end < len(buffer) or eof:
+                    yield value
+                    position = end
+                    continue
+
+        if eof:
+            raise ValueError("unexpected end of JSON palette")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        # 処理済みの部分を捨てて、読み込んだ分を追加する
+        buffer = buffer[position:] + decode(chunk, final=eof)
+        position = 0
+
+
+def _json_entry_to_color(entry):
+    """JSON の要素(文字列・オブジェクト・[R, G, B])を (名前, 16進数カラーコード) にする"""
+    if isinstance(entry, str):
+        return "", css_color_to_hex(entry)
+    if isinstance(entry, list):
+        return "", "#" + "".join(f"{int(value):02X}" for value in entry[:4])
+
+    for key in ("hex", "color", "value"):
+        if key in entry:
+            return str(entry.get("name", "")), css_color_to_hex(entry[key])
+    raise ValueError(f"no color in JSON palette entry: {entry}")
+
+
+def read_json(f):
+    """JSON 配列か JSON Lines(1行に1色)の色を読み込む"""
+    first = f.read(1)
+    while first.isspace():
+        first = f.read(1)
+    f.seek(-len(first), os.SEEK_CUR)
+
+    if first == b"[":
+        entries = _iter_json_array(f)
+    else:
+        entries = (json.loads(line) for line in f if line.strip())
+    for entry in entries:
+        yield _json_entry_to_color(entry)
+
+
+READERS = {
+    ".gpl": read_gpl,
+    ".ase": read_ase,
+    ".css": read_css,
+    ".json": read_json,
+    ".jsonl": read_json,
+}
+
+
+# ====================
+# まとめて変換
+# ====================
+
+
+def print_progress(count, position, size):
+    """読み込んだ色の数とファイルの進み具合を表示する"""
+    percent = position / size if size else 1.0
+    print(f"palette: {count} colors ({percent:.0%})")
+
+
+def iter_palette_batches(path, batch_size=DEFAULT_BATCH_SIZE, progress=print_progress):
+    """
+    パレットファイルを読み込み、batch_size 色ごとに
+    (名前のリスト, (色の数, 4) の uint8 の sRGB の配列) を返す
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"unsupported palette format: {extension}")
+    reader = READERS[extension]
+    size = os.path.getsize(path)
+
+    count = 0
+    with open(path, "rb") as f:
+        names = []
+        hex_colors = []
+        for name, hex_color in reader(f):
+            names.append(name)
+            hex_colors.append(hex_color)
+            if len(hex_colors) < batch_size:
+                continue
+
+            count += len(hex_colors)
+            yield names, hex_colors_to_uint8(hex_colors)
+            if progress:
+                progress(count, f.tell(), size)
+            names = []
+            hex_colors = []
+
+        if hex_colors:
+            count += len(hex_colors)
+            yield names, hex_colors_to_uint8(hex_colors)
+        if progress:
+            progress(count, size, size)
+
+
+def unique_palette_batches(batches):
+    """すでに出てきた色を取り除き、初めて出てきた色だけを返す"""
+    seen = set()
+    for names, colors in batches:
+        # RGBA の4バイトを1つの整数にして比較する
+        keys = np.ascontiguousarray(colors).view(np.uint32).ravel()
+        _, first_indices = np.unique(keys, return_index=True)
+        first_indices.sort()
+        new_indices = [i for i in first_indices.tolist() if keys[i] not in seen]
+        seen.update(keys[new_indices].tolist())
+
+        if new_indices:
+            yield [names[i] for i in new_indices], colors[new_indices]
+
+
+# ====================
+# 出力
+# ====================
+
+
+def palette_material_spec(linear_rgba):
+    """1色のマテリアルの内容"""
+    return {
+        "properties": {"diffuse_color": linear_rgba},
+        "nodes": {
+            "Material Output": {
+                "type": "ShaderNodeOutputMaterial",
+                "location": [300, 300],
+            },
+            "Principled BSDF": {
+                "type": "ShaderNodeBsdfPrincipled",
+                "location": [10, 300],
+                "inputs": {"Base Color": linear_rgba},
+            },
+        },
+        "links": [["Principled BSDF", "BSDF", "Material Output", "Surface"]],
+    }
+
+
+def import_palette_materials(
+    path, prefix=None, batch_size=DEFAULT_BATCH_SIZE, progress=print_progress
+):
+    """パレットの色ごとに、重複を除いたマテリアルを作成する"""
+    prefix = prefix or os.path.splitext(os.path.basename(path))[0]
+    batches = iter_palette_batches(path, batch_size, progress)
+
+    materials = []
+    for names, colors in unique_palette_batches(batches):
+        linear_colors = uint8_to_linear_rgba(colors)
+        hex_colors = [bytes(color[:3]).hex().upper() for color in colors]
+        for name, hex_color, rgba in zip(names, hex_colors, linear_colors.tolist()):
+            mat_name = f"{prefix}_{name or hex_color}"
+            materials.append(get_material(mat_name, palette_material_spec(rgba)))
+
+    return materials
+
+
+def create_palette_image(name, linear_colors, width=PALETTE_IMAGE_WIDTH):
+    """色を左下から順に並べたパレット画像を作成する"""
+    width = max(min(width, len(linear_colors)), 1)
+    height = max(-(-len(linear_colors) // width), 1)
+
+    pixels = np.zeros((width * height, 4), dtype=np.float32)
+    pixels[: len(linear_colors)] = linear_colors
+
+    if name in bpy.data.images:
+        bpy.data.images.remove(bpy.data.images[name])
+    image = bpy.data.images.new(name, width, height, alpha=True, float_buffer=True)
+    image.pixels.foreach_set(pixels.ravel())
+    # 生成した画像は保存時に失われるため、.blend ファイルに含める
+    image.pack()
+
+    return image
+
+
+def palette_image_material_spec(width, height, attribute_name):
+    """面の属性のパレット番号からパレット画像の色を読むマテリアルの内容"""
+    return {
+        "nodes": {
+            "Material Output": {
+                "type": "ShaderNodeOutputMaterial",
+                "location": [900, 300],
+            },
+            "Principled BSDF": {
+                "type": "ShaderNodeBsdfPrincipled",
+                "location": [600, 300],
+            },
+            "Image Texture": {
+                "type": "ShaderNodeTexImage",
+                "location": [300, 300],
+                # 隣の色と混ざらないように補間しない
+                "properties": {"interpolation": "Closest"},
+            },
+            "Attribute": {
+                "type": "ShaderNodeAttribute",
+                "location": [-900, 300],
+                "properties": {"attribute_name": attribute_name},
+            },
+            # 番号から画像の列と行を求め、ピクセルの中心の UV にする
+            "Column": {
+                "type": "ShaderNodeMath",
+                "location": [-600, 400],
+                "properties": {"operation": "MODULO"},
+                "inputs": {1: float(width)},
+            },
+            "Row": {
+                "type": "ShaderNodeMath",
+                "location": [-600, 200],
+                "properties": {"operation": "FLOOR"},
+            },
+            "Row Index": {
+                "type": "ShaderNodeMath",
+                "location": [-750, 200],
+                "properties": {"operation": "DIVIDE"},
+                "inputs": {1: float(width)},
+            },
+            "U": {
+                "type": "ShaderNodeMath",
+                "location": [-300, 400],
+                "properties": {"operation": "MULTIPLY_ADD"},
+                "inputs": {1: 1.0 / width, 2: 0.5 / width},
+            },
+            "V": {
+                "type": "ShaderNodeMath",
+                "location": [-300, 200],
+                "properties": {"operation": "MULTIPLY_ADD"},
+                "inputs": {1: 1.0 / height, 2: 0.5 / height},
+            },
+            "Combine XYZ": {
+                "type": "ShaderNodeCombineXYZ",
+                "location": [0, 300],
+            },
+        },
+        "links": [
+            ["Attribute", "Fac", "Column", 0],
+            ["Attribute", "Fac", "Row Index", 0],
+            ["Row Index", 0, "Row", 0],
+            ["Column", 0, "U", 0],
+            ["Row", 0, "V", 0],
+            ["U", 0, "Combine XYZ", "X"],
+            ["V", 0, "Combine XYZ", "Y"],
+            ["Combine XYZ", "Vector", "Image Texture", "Vector"],
+            ["Image Texture", "Color", "Principled BSDF", "Base Color"],
+            ["Principled BSDF", "BSDF", "Material Output", "Surface"],
+        ],
+    }
+
+
+def import_palette_image(
+    path,
+    name=None,
+    attribute_name=PALETTE_INDEX_ATTRIBUTE,
+    batch_size=DEFAULT_BATCH_SIZE,
+    progress=print_progress,
+):
+    """
+    重複を除いたパレットの色を画像にし、その画像を読む1つのマテリアルを作成する
+    面の色は attribute_name の面の属性(パレットの番号)で選ぶ
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    batches = iter_palette_batches(path, batch_size, progress)
+
+    # 画像を作るまでは1色4バイトの uint8 のまま保持する
+    color_batches = [colors for _, colors in unique_palette_batches(batches)]
+    colors = (
+        np.concatenate(color_batches)
+        if color_batches
+        else np.zeros((0, 4), dtype=np.uint8)
+    )
+    if len(colors) == 0:
+        raise ValueError(f"no colors in palette: {path}")
+    image = create_palette_image(f"{name}_palette", uint8_to_linear_rgba(colors))
+
+    width, height = image.size
+    mat = bpy.data.materials.new(f"{name}_palette")
+    mat.use_nodes = True
+    apply_node_spec(
+        mat.node_tree, palette_image_material_spec(width, height, attribute_name)
+    )
+    mat.node_tree.nodes["Image Texture"].image = image
+
+    return image, mat, len(colors)
+
+
+def write_palette_index_attribute(obj, indices, attribute_name=PALETTE_INDEX_ATTRIBUTE):
+    """面ごとのパレットの番号を面の属性に書き込む"""
+    mesh = obj.data
+    if attribute_name in mesh.attributes:
+        mesh.attributes.remove(mesh.attributes[attribute_name])
+    attribute = mesh.attributes.new(attribute_name, "INT", "FACE")
+    attribute.data.foreach_set("value", np.asarray(indices, dtype=np.int32))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="パレットファイルの読み込み")
+    parser.add_argument("path", help=".gpl / .ase / .css / .json / .jsonl")
+    parser.add_argument("--mode", choices=("materials", "image"), default="image")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    return parser.parse_args(argv)
+
+
+def main():
+    # Blender から起動された場合は「--」以降が引数
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    args = parse_args(argv)
+
+    if args.mode == "materials":
+        materials = import_palette_materials(args.path, batch_size=args.batch_size)
+        print(f"created {len(materials)} palette materials")
+    else:
+        image, mat, count = import_palette_image(args.path, batch_size=args.batch_size)
+        print(f"created {image.name} ({count} colors) and {mat.name}")
+
+
+if __name__ == "__main__":
+    main()
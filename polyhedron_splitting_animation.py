@@ -4,8 +4,13 @@
 
 import bpy
 import math
-import random
-from mathutils import Vector, Euler
+import numpy as np
+from mathutils import Matrix
+
+from material_registry import get_material
+from node_tree_builder import new_geometry_node_group
+from scene_reset import reset_scene
+from shard_cache import load_shard_cache
 
 # ====================
 # ユーティリティ関数
@@ -32,18 +37,8 @@ def move_to_collection(obj, collection_name):
 
 def scene_clear():
     """シーンのオブジェクトをデータを含め全削除"""
-    # 既存のオブジェクトを削除
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
-
-    # すべての孤立したデータの削除
-    bpy.ops.outliner.orphans_purge(
-        do_local_ids=True, do_linked_ids=True, do_recursive=True
-    )
-
-    # 既存の「Collection」があれば削除
-    if "Collection" in bpy.data.collections:
-        bpy.data.collections.remove(bpy.data.collections["Collection"])
+    # 既存のオブジェクト、孤立したデータ、「Collection」をまとめて削除
+    reset_scene()
 
 
 # ===================
@@ -53,87 +48,81 @@ def scene_clear():
 
 def create_emission_material():
     """放射マテリアルの作成"""
-    mat = bpy.data.materials.new("Emission")
-    # ノードベースのマテリアルにする
-    mat.use_nodes = True
-    nodes = mat.node_tree.nodes
-    links = mat.node_tree.links
-
-    # 既存のノードを削除
-    for node in nodes:
-        nodes.remove(node)
-
-    # ノードの作成
-    output_node = nodes.new(type="ShaderNodeOutputMaterial")
-    output_node.location = (200, 0)
-
-    emission_node = nodes.new(type="ShaderNodeEmission")
-    emission_node.location = (0, 0)
-    emission_node.inputs["Color"].default_value = (1, 1, 1, 1)
-    emission_node.inputs["Strength"].default_value = 10
-
-    # ノードを接続
-    links.new(emission_node.outputs["Emission"], output_node.inputs["Surface"])
-
-    return mat
+    spec = {
+        "nodes": {
+            "Material Output": {
+                "type": "ShaderNodeOutputMaterial",
+                "location": [200, 0],
+            },
+            "Emission": {
+                "type": "ShaderNodeEmission",
+                "location": [0, 0],
+                "inputs": {"Color": [1, 1, 1, 1], "Strength": 10},
+            },
+        },
+        "links": [["Emission", "Emission", "Material Output", "Surface"]],
+    }
+
+    return get_material("Emission", spec)
 
 
 def set_metallic_material():
     """虹色の反社を持つ金属風のマテリアルを設定"""
-    if "Metal" in bpy.data.materials:
-        return bpy.data.materials["Metal"]
-
-    mat = bpy.data.materials.new(name="Metal")
-    mat.use_nodes = True
-    nodes = mat.node_tree.nodes
-    links = mat.node_tree.links
-
     node_location_step = 200
-    node_location_x = -node_location_step
     node_location_y = 300
 
-    # HSVノードの作成
-    hsv_node = nodes.new(type="ShaderNodeHueSaturation")
-    hsv_node.location.x = node_location_x
-    node_location_x -= node_location_step
-    hsv_node.location.y = node_location_y
-    hsv_node.inputs["Saturation"].default_value = 0.3
-    hsv_node.inputs["Color"].default_value = (1, 0, 0, 1)
-
-    # ベクトル演算ノードの作成(加算)
-    vector_math_node = nodes.new(type="ShaderNodeVectorMath")
-    vector_math_node.location.x = node_location_x
-    node_location_x -= node_location_step
-    vector_math_node.location.y = node_location_y
-    vector_math_node.operation = "ADD"
-
-    # タンジェントノードの作成
-    tangent_node = nodes.new(type="ShaderNodeTangent")
-    tangent_node.location.x = node_location_x
-    node_location_x -= node_location_step
-    tangent_node.location.y = node_location_y
-    tangent_node.axis = "Z"
-
-    # ジオメトリノードの作成
-    geometry_node = nodes.new(type="ShaderNodeNewGeometry")
-    geometry_node.location.x = vector_math_node.location.x - node_location_step
-    geometry_node.location.y = node_location_y / 2
-
-    # プリンシプルBSDFノード
-    principled_node = mat.node_tree.nodes["Principled BSDF"]
-    principled_node.inputs["Metallic"].default_value = 1.0
-    principled_node.inputs["Specular"].default_value = 1.0
-    principled_node.inputs["Roughness"].default_value = 0.05
-    principled_node.inputs["Anisotropic"].default_value = 1.0
-    principled_node.inputs["Anisotropic Rotation"].default_value = 0.2
-
-    # ノード接続
-    links.new(geometry_node.outputs["Incoming"], vector_math_node.inputs[1])
-    links.new(tangent_node.outputs["Tangent"], vector_math_node.inputs[0])
-    links.new(vector_math_node.outputs["Vector"], hsv_node.inputs["Hue"])
-    links.new(hsv_node.outputs["Color"], principled_node.inputs["Base Color"])
-
-    return mat
+    spec = {
+        "nodes": {
+            "Material Output": {
+                "type": "ShaderNodeOutputMaterial",
+                "location": [300, 300],
+            },
+            # プリンシプルBSDFノード
+            "Principled BSDF": {
+                "type": "ShaderNodeBsdfPrincipled",
+                "location": [10, 300],
+                "inputs": {
+                    "Metallic": 1.0,
+                    "Specular": 1.0,
+                    "Roughness": 0.05,
+                    "Anisotropic": 1.0,
+                    "Anisotropic Rotation": 0.2,
+                },
+            },
+            # HSVノード
+            "Hue Saturation Value": {
+                "type": "ShaderNodeHueSaturation",
+                "location": [-node_location_step, node_location_y],
+                "inputs": {"Saturation": 0.3, "Color": [1, 0, 0, 1]},
+            },
+            # ベクトル演算ノード(加算)
+            "Vector Math": {
+                "type": "ShaderNodeVectorMath",
+                "location": [-node_location_step * 2, node_location_y],
+                "properties": {"operation": "ADD"},
+            },
+            # タンジェントノード
+            "Tangent": {
+                "type": "ShaderNodeTangent",
+                "location": [-node_location_step * 3, node_location_y],
+                "properties": {"axis": "Z"},
+            },
+            # ジオメトリノード
+            "Geometry": {
+                "type": "ShaderNodeNewGeometry",
+                "location": [-node_location_step * 3, node_location_y / 2],
+            },
+        },
+        "links": [
+            ["Geometry", "Incoming", "Vector Math", 1],
+            ["Tangent", "Tangent", "Vector Math", 0],
+            ["Vector Math", "Vector", "Hue Saturation Value", "Hue"],
+            ["Hue Saturation Value", "Color", "Principled BSDF", "Base Color"],
+            ["Principled BSDF", "BSDF", "Material Output", "Surface"],
+        ],
+    }
+
+    return get_material("Metal", spec)
 
 
 # ====================
@@ -193,17 +182,297 @@ def add_animation_polyhedron():
 
     move_to_collection(obj, "Animated_Polyhedra")
 
+    return obj
+
+
+def _concatenated_ranges(starts, lengths):
+    """各 start から length 個ずつの連番を連結した配列を返す"""
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+
+def _group_polygon_islands(loop_vertices, loop_starts, loop_totals, vertex_count):
+    """頂点を共有してつながっているポリゴンを島ごとにまとめ、
+    ポリゴンごとの島番号と島の数を返す"""
+    labels = np.arange(vertex_count)
+    while True:
+        # ポリゴン内の最小ラベルをそのポリゴンの全頂点へ伝播させる
+        polygon_min = np.minimum.reduceat(labels[loop_vertices], loop_starts)
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, loop_vertices, np.repeat(polygon_min, loop_totals))
+        # ラベルの参照先をたどって収束を早める
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+    _, island_of_polygon = np.unique(
+        labels[loop_vertices[loop_starts]], return_inverse=True
+    )
+    return island_of_polygon.ravel(), island_of_polygon.max() + 1
+
+
+def _area_weighted_centroids(island_of_polygon, island_count, areas, centers):
+    """島ごとに面積で重み付けした重心を求める"""
+    island_areas = np.bincount(island_of_polygon, weights=areas, minlength=island_count)
+    centroids = np.stack(
+        [
+            np.bincount(
+                island_of_polygon,
+                weights=areas * centers[:, axis],
+                minlength=island_count,
+            )
+            for axis in range(3)
+        ],
+        axis=1,
+    )
+    return centroids / np.maximum(island_areas, 1e-12)[:, np.newaxis]
+
+
+# 属性のデータ型 → (foreach のキー, 要素の数, dtype)
+ATTRIBUTE_VALUE_KEYS = {
+    "FLOAT": ("value", 1, np.float32),
+    "INT": ("value", 1, np.int32),
+    "INT8": ("value", 1, np.int32),
+    "BOOLEAN": ("value", 1, bool),
+    "FLOAT2": ("vector", 2, np.float32),
+    "INT32_2D": ("value", 2, np.int32),
+    "FLOAT_VECTOR": ("vector", 3, np.float32),
+    "FLOAT_COLOR": ("color", 4, np.float32),
+    "BYTE_COLOR": ("color", 4, np.float32),
+    "QUATERNION": ("value", 4, np.float32),
+}
+
+# build_shards() で個別に複製する属性
+SHARD_BUILTIN_ATTRIBUTES = {
+    "position",
+    "material_index",
+    "sharp_face",
+    "custom_normal",
+}
+
+
+def _read_shard_attributes(mesh, vertex_order, loop_order, polygon_order):
+    """
+    UV・カスタム法線・頂点/コーナー/面の属性を読み込み、破片の順に並べ替える
+    辺の属性は破片で辺を作り直すため複製しない
+    """
+    orders = {"POINT": vertex_order, "CORNER": loop_order, "FACE": polygon_order}
+
+    uv_layers = []
+    for layer in mesh.uv_layers:
+        uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        layer.data.foreach_get("uv", uv)
+        uv_layers.append(
+            (layer.name, layer.active_render, uv.reshape(-1, 2)[loop_order])
+        )
 
-def split_face():
+    attributes = []
+    skipped_names = SHARD_BUILTIN_ATTRIBUTES | {layer.name for layer in mesh.uv_layers}
+    for attribute in mesh.attributes:
+        if (
+            attribute.name in skipped_names
+            or attribute.name.startswith(".")
+            or getattr(attribute, "is_internal", False)
+            or attribute.domain not in orders
+            or attribute.data_type not in ATTRIBUTE_VALUE_KEYS
+        ):
+            continue
+        key, width, dtype = ATTRIBUTE_VALUE_KEYS[attribute.data_type]
+        values = np.empty(len(attribute.data) * width, dtype=dtype)
+        attribute.data.foreach_get(key, values)
+        values = values.reshape(-1, width)[orders[attribute.domain]]
+        attributes.append(
+            (attribute.name, attribute.data_type, attribute.domain, values)
+        )
+
+    custom_normals = None
+    if mesh.has_custom_normals:
+        custom_normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+        if bpy.app.version >= (4, 1, 0):
+            mesh.corner_normals.foreach_get("vector", custom_normals)
+        else:
+            mesh.calc_normals_split()
+            mesh.loops.foreach_get("normal", custom_normals)
+        custom_normals = custom_normals.reshape(-1, 3)[loop_order]
+
+    return {
+        "uv_layers": uv_layers,
+        "active_uv_index": mesh.uv_layers.active_index,
+        "attributes": attributes,
+        "custom_normals": custom_normals,
+    }
+
+
+def _write_shard_attributes(shard_mesh, shard_attributes, ranges):
+    """
+    並べ替えた属性から ranges (ドメイン → (開始, 終了)) の範囲を破片のメッシュに書き込む
+    カスタム法線は辺が必要なため、update(calc_edges=True) の後に呼ぶ
+    """
+    l_start, l_end = ranges["CORNER"]
+    for name, active_render, uv in shard_attributes["uv_layers"]:
+        layer = shard_mesh.uv_layers.new(name=name)
+        layer.data.foreach_set("uv", uv[l_start:l_end].ravel())
+        layer.active_render = active_render
+    if shard_mesh.uv_layers:
+        shard_mesh.uv_layers.active_index = shard_attributes["active_uv_index"]
+
+    for name, data_type, domain, values in shard_attributes["attributes"]:
+        start, end = ranges[domain]
+        key = ATTRIBUTE_VALUE_KEYS[data_type][0]
+        attribute = shard_mesh.attributes.new(name, data_type, domain)
+        attribute.data.foreach_set(key, values[start:end].ravel())
+
+    custom_normals = shard_attributes["custom_normals"]
+    if custom_normals is not None:
+        if bpy.app.version < (4, 1, 0):
+            shard_mesh.use_auto_smooth = True
+        shard_mesh.normals_split_custom_set(custom_normals[l_start:l_end])
+
+
+def build_shards(obj):
+    """
+    オペレーターを使わずにメッシュを島(破片)ごとのオブジェクトへ分離する
+    メッシュは foreach_get で一度だけ読み込み、島の分類は NumPy で行う
+    各破片の原点は面積で重み付けした重心(ORIGIN_CENTER_OF_MASS 相当)になる
+    マテリアル・スムーズシェード・UV・カスタム法線・頂点/コーナー/面の属性も複製する
+    """
+    mesh = obj.data
+    vertex_count = len(mesh.vertices)
+    loop_count = len(mesh.loops)
+    polygon_count = len(mesh.polygons)
+
+    # メッシュデータを一括で取得
+    co = np.empty(vertex_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co.shape = (vertex_count, 3)
+
+    loop_vertices = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+
+    loop_starts = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    material_indices = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", material_indices)
+    smooth = np.empty(polygon_count, dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", smooth)
+    areas = np.empty(polygon_count, dtype=np.float32)
+    mesh.polygons.foreach_get("area", areas)
+    centers = np.empty(polygon_count * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", centers)
+    centers.shape = (polygon_count, 3)
+
+    island_of_polygon, island_count = _group_polygon_islands(
+        loop_vertices, loop_starts, loop_totals, vertex_count
+    )
+
+    # 頂点を島ごとに並べ替え、島内でのインデックスを求める
+    island_of_vertex = np.full(vertex_count, -1)
+    island_of_vertex[loop_vertices] = np.repeat(island_of_polygon, loop_totals)
+    vertex_order = np.argsort(island_of_vertex, kind="stable")
+    # 面を持たない頂点は破片に含めない
+    vertex_order = vertex_order[island_of_vertex[vertex_order] >= 0]
+    vertex_counts = np.bincount(island_of_vertex[vertex_order], minlength=island_count)
+    vertex_offsets = np.concatenate(([0], np.cumsum(vertex_counts)))
+    local_vertex_index = np.empty(vertex_count, dtype=np.int32)
+    local_vertex_index[vertex_order] = np.arange(len(vertex_order)) - np.repeat(
+        vertex_offsets[:-1], vertex_counts
+    )
+
+    # ポリゴンとループを島ごとに並べ替える
+    polygon_order = np.argsort(island_of_polygon, kind="stable")
+    polygon_counts = np.bincount(island_of_polygon, minlength=island_count)
+    polygon_offsets = np.concatenate(([0], np.cumsum(polygon_counts)))
+    sorted_loop_totals = loop_totals[polygon_order]
+    loop_order = _concatenated_ranges(loop_starts[polygon_order], sorted_loop_totals)
+    sorted_loop_vertices = local_vertex_index[loop_vertices[loop_order]]
+    loop_counts = np.bincount(
+        island_of_polygon, weights=loop_totals, minlength=island_count
+    ).astype(np.int64)
+    loop_offsets = np.concatenate(([0], np.cumsum(loop_counts)))
+    sorted_loop_starts = (
+        np.cumsum(sorted_loop_totals)
+        - sorted_loop_totals
+        - np.repeat(loop_offsets[:-1], polygon_counts)
+    ).astype(np.int32)
+    sorted_material_indices = material_indices[polygon_order]
+    sorted_smooth = smooth[polygon_order]
+    shard_attributes = _read_shard_attributes(
+        mesh, vertex_order, loop_order, polygon_order
+    )
+
+    # 面積で重み付けした重心を各破片の原点にする
+    centroids = _area_weighted_centroids(
+        island_of_polygon, island_count, areas, centers
+    )
+    sorted_co = (co[vertex_order] - np.repeat(centroids, vertex_counts, axis=0)).astype(
+        np.float32
+    )
+
+    collections = list(obj.users_collection)
+    materials = list(mesh.materials)
+    shards = []
+    for i in range(island_count):
+        v_start, v_end = vertex_offsets[i], vertex_offsets[i + 1]
+        l_start, l_end = loop_offsets[i], loop_offsets[i + 1]
+        p_start, p_end = polygon_offsets[i], polygon_offsets[i + 1]
+
+        shard_mesh = bpy.data.meshes.new(f"{mesh.name}_shard")
+        shard_mesh.vertices.add(v_end - v_start)
+        shard_mesh.loops.add(l_end - l_start)
+        shard_mesh.polygons.add(p_end - p_start)
+        shard_mesh.vertices.foreach_set("co", sorted_co[v_start:v_end].ravel())
+        shard_mesh.loops.foreach_set(
+            "vertex_index", sorted_loop_vertices[l_start:l_end]
+        )
+        shard_mesh.polygons.foreach_set("loop_start", sorted_loop_starts[p_start:p_end])
+        if bpy.app.version < (4, 0, 0):
+            # Blender 4.0以降では loop_total は loop_start から自動で決まる
+            shard_mesh.polygons.foreach_set(
+                "loop_total", sorted_loop_totals[p_start:p_end]
+            )
+        shard_mesh.polygons.foreach_set(
+            "material_index", sorted_material_indices[p_start:p_end]
+        )
+        shard_mesh.polygons.foreach_set("use_smooth", sorted_smooth[p_start:p_end])
+        shard_mesh.update(calc_edges=True)
+        _write_shard_attributes(
+            shard_mesh,
+            shard_attributes,
+            {
+                "POINT": (v_start, v_end),
+                "CORNER": (l_start, l_end),
+                "FACE": (p_start, p_end),
+            },
+        )
+        for mat in materials:
+            shard_mesh.materials.append(mat)
+
+        # モディファイアなどの設定は元のオブジェクトから複製する
+        shard = obj.copy()
+        shard.data = shard_mesh
+        shard.matrix_world = obj.matrix_world @ Matrix.Translation(centroids[i])
+        for collection in collections:
+            collection.objects.link(shard)
+        shards.append(shard)
+
+    # 分離元のオブジェクトを削除し、メッシュはほかに使われていなければ削除する
+    bpy.data.objects.remove(obj)
+    if mesh.users == 0:
+        bpy.data.meshes.remove(mesh)
+
+    return shards
+
+
+def split_face(obj=None):
     """オブジェクトを面ごとに分離"""
-    bpy.ops.object.mode_set(mode="EDIT")
-    bpy.ops.mesh.select_all(action="SELECT")
-    bpy.ops.mesh.separate(type="LOOSE")
-    bpy.ops.object.mode_set(mode="OBJECT")
-    bpy.ops.object.origin_set(type="ORIGIN_CENTER_OF_MASS", center="MEDIAN")
+    if obj is None:
+        obj = bpy.context.active_object
 
     # すべての分割されたオブジェクトを取得
-    return [obj for obj in bpy.context.selected_objects]
+    return build_shards(obj)
 
 
 # ====================
@@ -220,46 +489,332 @@ def set_linear_interpolation(obj):
                 keyframe.interpolation = "LINEAR"
 
 
-def apply_animation(faces, frame_start=1, frame_mid=144, frame_end=288):
+# キーフレーム補間の列挙値(foreach_set 用)
+INTERPOLATION_VALUES = {"CONSTANT": 0, "LINEAR": 1, "BEZIER": 2}
+
+
+def draw_explosion_parameters(shard_count, seed=None):
+    """破片ごとの移動方向・移動距離・回転を一括で乱数生成"""
+    rng = np.random.default_rng(seed)
+
+    # ランダムな移動方向（法線方向にバラける）
+    move_directions = rng.uniform(-1, 1, (shard_count, 3))
+    move_directions /= np.linalg.norm(move_directions, axis=1, keepdims=True)
+    move_distances = rng.uniform(2.0, 3.0, shard_count)
+
+    # ランダムな回転（XYZ回転）
+    mid_rotations = rng.uniform(3.14, 6.28, (shard_count, 3))
+
+    return move_directions, move_distances, mid_rotations
+
+
+def generate_explosion_keys(
+    initial_locations,
+    initial_rotations,
+    frame_start=1,
+    frame_mid=144,
+    frame_end=288,
+    seed=None,
+):
+    """
+    ばらけるアニメーションのキーを一括で生成
+    位置・回転は (破片数, キー数, 3) の配列で返す
+    """
+    shard_count = len(initial_locations)
+    move_directions, move_distances, mid_rotations = draw_explosion_parameters(
+        shard_count, seed
+    )
+
+    frames = np.array([frame_start, frame_mid, frame_end], dtype=np.float32)
+    locations = np.stack(
+        [
+            initial_locations,
+            initial_locations + move_directions * move_distances[:, np.newaxis],
+            initial_locations,
+        ],
+        axis=1,
+    )
+    rotations = np.stack(
+        [initial_rotations, mid_rotations, np.zeros((shard_count, 3))], axis=1
+    )
+
+    return frames, locations, rotations
+
+
+def write_bulk_animation(objects, frames, locations, rotations, interpolation="BEZIER"):
+    """
+    位置と回転のキーフレームを F カーブへ直接書き込む
+    アクションと F カーブは一度だけ作成し、キーは foreach_set でまとめて設定する
+    """
+    key_count = len(frames)
+    interpolations = np.full(
+        key_count, INTERPOLATION_VALUES[interpolation], dtype=np.int32
+    )
+
+    # (破片数, データパス, 軸, キー数, [フレーム, 値]) の配列を作成
+    keyframe_co = np.empty((len(objects), 2, 3, key_count, 2), dtype=np.float32)
+    keyframe_co[..., 0] = frames
+    keyframe_co[:, 0, :, :, 1] = locations.transpose(0, 2, 1)
+    keyframe_co[:, 1, :, :, 1] = rotations.transpose(0, 2, 1)
+
+    for obj, shard_co in zip(objects, keyframe_co):
+        action = bpy.data.actions.new(f"{obj.name}Action")
+        obj.animation_data_create().action = action
+        for data_path, path_co in zip(("location", "rotation_euler"), shard_co):
+            for axis, axis_co in enumerate(path_co):
+                fcurve = action.fcurves.new(data_path, index=axis)
+                fcurve.keyframe_points.add(key_count)
+                fcurve.keyframe_points.foreach_set("co", axis_co.ravel())
+                fcurve.keyframe_points.foreach_set("interpolation", interpolations)
+                fcurve.update()
+
+
+def apply_animation(faces, frame_start=1, frame_mid=144, frame_end=288, seed=None):
     """オブジェクトのばらけるアニメーション"""
     for i, face in enumerate(faces, start=1):
         face.name = f"Polyhedron_{i}"
         # move_to_collection(face, "Animated_Polyhedra")
 
-        initial_location = face.location.copy()
-        # 初期位置と回転のキーフレームを設定
-        face.keyframe_insert(data_path="location", frame=frame_start)
-        face.keyframe_insert(data_path="rotation_euler", frame=frame_start)
+    initial_locations = np.array([face.location for face in faces], dtype=np.float32)
+    initial_rotations = np.array(
+        [face.rotation_euler for face in faces], dtype=np.float32
+    )
+    frames, locations, rotations = generate_explosion_keys(
+        initial_locations,
+        initial_rotations,
+        frame_start,
+        frame_mid,
+        frame_end,
+        seed,
+    )
+    write_bulk_animation(faces, frames, locations, rotations)
+
+    # for face in faces:
+    #     set_linear_interpolation(face)
+
+
+def write_shard_attributes(obj, seed=None):
+    """
+    破片(島)ごとの移動方向・移動距離・回転・中心を面ドメインの属性として書き込む
+    乱数は apply_animation() と同じ順序で生成するため、同じシードなら同じ動きになる
+    """
+    mesh = obj.data
+    vertex_count = len(mesh.vertices)
+    polygon_count = len(mesh.polygons)
+
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    loop_starts = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    areas = np.empty(polygon_count, dtype=np.float32)
+    mesh.polygons.foreach_get("area", areas)
+    centers = np.empty(polygon_count * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", centers)
+    centers.shape = (polygon_count, 3)
+
+    island_of_polygon, island_count = _group_polygon_islands(
+        loop_vertices, loop_starts, loop_totals, vertex_count
+    )
+    centroids = _area_weighted_centroids(
+        island_of_polygon, island_count, areas, centers
+    )
+    move_directions, move_distances, mid_rotations = draw_explosion_parameters(
+        island_count, seed
+    )
 
-        # ランダムな移動方向（法線方向にバラける）
-        move_direction = Vector(
-            (random.uniform(-1, 1), random.uniform(-1, 1), random.uniform(-1, 1))
-        )
-        move_direction.normalize()
-        move_distance = random.uniform(2.0, 3.0)
-        face.location = initial_location + move_direction * move_distance
-
-        # ランダムな回転（XYZ回転）
-        face.rotation_euler = Euler(
-            (
-                random.uniform(3.14, 6.28),
-                random.uniform(3.14, 6.28),
-                random.uniform(3.14, 6.28),
-            ),
-            "XYZ",
+    face_attributes = {
+        "shard_direction": ("FLOAT_VECTOR", "vector", move_directions),
+        "shard_distance": ("FLOAT", "value", move_distances),
+        "shard_rotation": ("FLOAT_VECTOR", "vector", mid_rotations),
+        "shard_center": ("FLOAT_VECTOR", "vector", centroids),
+    }
+    for name, (data_type, value_name, values) in face_attributes.items():
+        if name in mesh.attributes:
+            mesh.attributes.remove(mesh.attributes[name])
+        attribute = mesh.attributes.new(name, data_type, "FACE")
+        attribute.data.foreach_set(
+            value_name, values[island_of_polygon].astype(np.float32).ravel()
         )
 
-        # 中間のキーフレームの設定
-        face.keyframe_insert(data_path="location", frame=frame_mid)
-        face.keyframe_insert(data_path="rotation_euler", frame=frame_mid)
 
-        # 最終キーフレームの設定(元に戻す)
-        face.location = initial_location
-        face.rotation_euler = (0, 0, 0)
-        face.keyframe_insert(data_path="location", frame=frame_end)
-        face.keyframe_insert(data_path="rotation_euler", frame=frame_end)
+def create_named_attribute_node(node_tree, name, data_type, location):
+    """名前付き属性ノードを作成し、指定したタイプのアウトプットソケットを返す"""
+    node = node_tree.nodes.new(type="GeometryNodeInputNamedAttribute")
+    node.location = location
+    node.data_type = data_type
+    node.inputs["Name"].default_value = name
+
+    output_lookup = {
+        socket.type: socket for socket in node.outputs.values() if socket.enabled
+    }
+    return output_lookup["VECTOR" if data_type == "FLOAT_VECTOR" else "VALUE"]
+
+
+def create_shard_animation_node_tree(frame_start=1, frame_mid=144, frame_end=288):
+    """
+    シーンのフレームから破片のばらけるアニメーションを計算するジオメトリノードを作成
+    各区間をスムーズステップで補間し、apply_animation() のキーフレーム
+    (始点・中間・終点で静止するベジェ補間)と同じタイミングで動かす
+    """
+    node_tree = new_geometry_node_group("Shard Animation")
+    nodes = node_tree.nodes
+    links = node_tree.links
+
+    input_node = nodes.new(type="NodeGroupInput")
+    input_node.location = (-1200, 0)
+    output_node = nodes.new(type="NodeGroupOutput")
+    output_node.location = (400, 0)
+
+    # シーンのフレームからアニメーションの重み(0→1→0)を計算
+    scene_time_node = nodes.new(type="GeometryNodeInputSceneTime")
+    scene_time_node.location = (-1200, -300)
+
+    explode_node = nodes.new(type="ShaderNodeMapRange")
+    explode_node.location = (-1000, -200)
+    explode_node.interpolation_type = "SMOOTHSTEP"
+    explode_node.inputs["From Min"].default_value = frame_start
+    explode_node.inputs["From Max"].default_value = frame_mid
+    explode_node.inputs["To Min"].default_value = 0.0
+    explode_node.inputs["To Max"].default_value = 1.0
+
+    return_node = nodes.new(type="ShaderNodeMapRange")
+    return_node.location = (-1000, -450)
+    return_node.interpolation_type = "SMOOTHSTEP"
+    return_node.inputs["From Min"].default_value = frame_mid
+    return_node.inputs["From Max"].default_value = frame_end
+    return_node.inputs["To Min"].default_value = 1.0
+    return_node.inputs["To Max"].default_value = 0.0
+
+    weight_node = nodes.new(type="ShaderNodeMath")
+    weight_node.location = (-800, -300)
+    weight_node.operation = "MULTIPLY"
+
+    # 破片ごとの属性を取得
+    direction_socket = create_named_attribute_node(
+        node_tree, "shard_direction", "FLOAT_VECTOR", (-1000, 400)
+    )
+    distance_socket = create_named_attribute_node(
+        node_tree, "shard_distance", "FLOAT", (-1000, 250)
+    )
+    rotation_socket = create_named_attribute_node(
+        node_tree, "shard_rotation", "FLOAT_VECTOR", (-800, 100)
+    )
+    center_socket = create_named_attribute_node(
+        node_tree, "shard_center", "FLOAT_VECTOR", (-800, -50)
+    )
+    position_node = nodes.new(type="GeometryNodeInputPosition")
+    position_node.location = (-600, 250)
+
+    # 破片の中心を基準に回転
+    scale_rotation_node = nodes.new(type="ShaderNodeVectorMath")
+    scale_rotation_node.location = (-600, 0)
+    scale_rotation_node.operation = "SCALE"
+
+    vector_rotate_node = nodes.new(type="ShaderNodeVectorRotate")
+    vector_rotate_node.location = (-400, 150)
+    vector_rotate_node.rotation_type = "EULER_XYZ"
+
+    # 移動方向に移動距離分だけ移動
+    scale_distance_node = nodes.new(type="ShaderNodeMath")
+    scale_distance_node.location = (-600, 400)
+    scale_distance_node.operation = "MULTIPLY"
 
-        # set_linear_interpolation(face)
+    offset_node = nodes.new(type="ShaderNodeVectorMath")
+    offset_node.location = (-400, 400)
+    offset_node.operation = "SCALE"
+
+    add_offset_node = nodes.new(type="ShaderNodeVectorMath")
+    add_offset_node.location = (-200, 250)
+    add_offset_node.operation = "ADD"
+
+    set_position_node = nodes.new(type="GeometryNodeSetPosition")
+    set_position_node.location = (100, 0)
+
+    # ノード接続
+    links.new(scene_time_node.outputs["Frame"], explode_node.inputs["Value"])
+    links.new(scene_time_node.outputs["Frame"], return_node.inputs["Value"])
+    links.new(explode_node.outputs["Result"], weight_node.inputs[0])
+    links.new(return_node.outputs["Result"], weight_node.inputs[1])
+
+    links.new(rotation_socket, scale_rotation_node.inputs[0])
+    links.new(weight_node.outputs["Value"], scale_rotation_node.inputs["Scale"])
+    links.new(position_node.outputs["Position"], vector_rotate_node.inputs["Vector"])
+    links.new(center_socket, vector_rotate_node.inputs["Center"])
+    links.new(
+        scale_rotation_node.outputs["Vector"], vector_rotate_node.inputs["Rotation"]
+    )
+
+    links.new(distance_socket, scale_distance_node.inputs[0])
+    links.new(weight_node.outputs["Value"], scale_distance_node.inputs[1])
+    links.new(direction_socket, offset_node.inputs[0])
+    links.new(scale_distance_node.outputs["Value"], offset_node.inputs["Scale"])
+
+    links.new(vector_rotate_node.outputs["Vector"], add_offset_node.inputs[0])
+    links.new(offset_node.outputs["Vector"], add_offset_node.inputs[1])
+
+    links.new(input_node.outputs["Geometry"], set_position_node.inputs["Geometry"])
+    links.new(add_offset_node.outputs["Vector"], set_position_node.inputs["Position"])
+    links.new(set_position_node.outputs["Geometry"], output_node.inputs["Geometry"])
+
+    return node_tree
+
+
+def move_modifier_to_front(obj, modifier):
+    """
+    オペレーターを使わずにモディファイアを先頭に移動する
+    (アクティブなオブジェクトがないバックグラウンドやハンドラーでも使える)
+    """
+    modifiers = obj.modifiers
+    if hasattr(modifiers, "move"):
+        # Blender 3.5 以降
+        modifiers.move(modifiers.find(modifier.name), 0)
+        return
+
+    # それより前のバージョンでは、後ろに来るモディファイアを同じ設定で作り直す
+    settings = []
+    for other in list(modifiers):
+        if other == modifier:
+            continue
+        values = {}
+        for prop in other.bl_rna.properties:
+            if prop.is_readonly or prop.identifier in ("name", "type", "rna_type"):
+                continue
+            value = getattr(other, prop.identifier)
+            # 配列は削除後に参照できなくなるため複製しておく
+            values[prop.identifier] = (
+                tuple(value) if getattr(prop, "array_length", 0) else value
+            )
+        settings.append((other.name, other.type, values))
+        modifiers.remove(other)
+
+    for name, modifier_type, values in settings:
+        new_modifier = modifiers.new(name=name, type=modifier_type)
+        for identifier, value in values.items():
+            try:
+                setattr(new_modifier, identifier, value)
+            except (AttributeError, TypeError, ValueError):
+                # 読み込み専用になった設定や、ほかの設定で決まる値は無視する
+                pass
+
+
+def setup_single_object_animation(
+    obj, frame_start=1, frame_mid=144, frame_end=288, seed=None
+):
+    """
+    面を分離せず、1つのオブジェクトのままばらけるアニメーションを設定
+    面の数に関係なくオブジェクト数は1つのまま
+    """
+    obj.name = "Polyhedron"
+    write_shard_attributes(obj, seed)
+    node_tree = create_shard_animation_node_tree(frame_start, frame_mid, frame_end)
+
+    modifier = obj.modifiers.new(name="Shard Animation", type="NODES")
+    modifier.node_group = node_tree
+
+    # ソリッド化より先に破片を動かすため、モディファイアを先頭に移動
+    move_modifier_to_front(obj, modifier)
 
 
 # ====================
@@ -341,13 +896,37 @@ def setup_scene():
 # 実行処理
 # ====================
 
-scene_clear()
 
-add_sphere()
-add_wireframe_polyhedron()
-add_animation_polyhedron()
+def main(single_object_mode=False, seed=None, shard_cache_dir=None):
+    """
+    多面体がばらけて元に戻るアニメーションのシーンを作成する
+    single_object_mode が True なら面を分離せず、
+    1つのオブジェクトとジオメトリノードでアニメーションする
+    seed を指定すると毎回同じアニメーションになる
+    shard_cache_dir を指定すると、破片を作り直さずにキャッシュから読み込む
+    """
+    scene_clear()
+
+    add_sphere()
+    add_wireframe_polyhedron()
+
+    if shard_cache_dir:
+        polyhedron = load_shard_cache(
+            shard_cache_dir, "Polyhedron", materials=[set_metallic_material()]
+        )
+        polyhedron.modifiers.new(name="Solidify", type="SOLIDIFY").thickness = 0.02
+        move_to_collection(polyhedron, "Animated_Polyhedra")
+    else:
+        polyhedron = add_animation_polyhedron()
+
+        if single_object_mode:
+            setup_single_object_animation(polyhedron, seed=seed)
+        else:
+            faces = split_face(polyhedron)
+            apply_animation(faces, seed=seed)
+
+    setup_scene()
 
-faces = split_face()
 
-apply_animation(faces)
-setup_scene()
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,9 @@
-import bpy
+from icosphere import create_icosphere_object
+from scene_reset import reset_scene
 
 
 def clear_scene():
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
+    reset_scene()
 
 
 clear_scene()
@@ -82,8 +82,7 @@ class IcoSphereMesh:
         if mesh_object and mesh_object.type == "MESH":
             self.mesh_object = mesh_object
         else:
-            bpy.ops.mesh.primitive_ico_sphere_add()
-            self.mesh_object = bpy.context.object
+            self.mesh_object = create_icosphere_object()
         self.wireframe_name = None
 
     def double_scale(self):
@@ -1,12 +1,18 @@
 # PythonにBlenderの機能へのアクセスを許可する
 import bpy
 
-# Python に Blender のメッシュ編集機能へのアクセスを許可する
-import bmesh
+# 面ごとの値をまとめて生成・書き込みするための配列計算ライブラリ
+import numpy as np
 
 # 乱数を生成するための Python 機能の拡張
 import random
 
+# 同じ内容のマテリアルを再利用するためのレジストリ
+from material_registry import get_material
+
+# 画像から面の色のパレットを取り出す
+from image_palette import load_image_palette
+
 
 def get_random_color():
     """ランダムな色を生成する"""
@@ -20,13 +26,19 @@ def get_random_color():
     return color
 
 
-def generate_random_color_materials(obj, count):
-    """オブジェクトにマテリアルを作成して割当てる"""
+def generate_random_color_materials(obj, count, palette=None):
+    """オブジェクトにマテリアルを作成して割当てる
+    palette (リニアRGBAの配列) を渡した場合はランダムな色の代わりにパレットの色を順に使う"""
     # メッシュの各面を反復処理
     for i in range(count):
-        # 新しいマテリアルを作成する
-        mat = bpy.data.materials.new(name=f"material_{i}")
-        mat.diffuse_color = get_random_color()
+        if palette is None:
+            color = get_random_color()
+        else:
+            color = tuple(float(value) for value in palette[i % len(palette)])
+
+        # 新しいマテリアルを作成する(同じ色のマテリアルがあれば再利用する)
+        spec = {"properties": {"diffuse_color": color}}
+        mat = get_material(f"material_{i}", spec)
 
         # オブジェクトにマテリアルを追加する
         obj.data.materials.append(mat)
@@ -39,43 +51,248 @@ def add_ico_sphere():
     return bpy.context.active_object
 
 
-def assign_materials_to_faces(obj):
-    """オブジェクトのすべての面を反復処理し、
-    面にランダムなマテリアルを割当てる"""
+def assign_materials_to_faces(obj, seed=None):
+    """オブジェクトのすべての面にランダムなマテリアルを割当てる
+    オペレーターを使わず、すべての面のマテリアル番号を一度に書き込む"""
 
-    # 編集モードをオンにする
-    bpy.ops.object.editmode_toggle()
+    # 編集モードの場合はオブジェクトモードに戻す(編集中のデータで上書きされるため)
+    if obj.mode == "EDIT":
+        bpy.ops.object.mode_set(mode="OBJECT")
 
-    # すべての面の選択を解除
-    bpy.ops.mesh.select_all()
-
-    # メッシュオブジェクトからジオメトリデータを取得
-    bmesh_obj = bmesh.from_edit_mesh(obj.data)
+    mesh = obj.data
 
     # オブジェクトに割り当てられたマテリアルの数を取得
-    material_count = len(obj.data.materials)
+    material_count = len(mesh.materials)
+    if material_count == 0:
+        return
+
+    # すべての面のマテリアルを一度に選択する
+    # integers() の上限は含まれないため、存在するスロットだけが選ばれる
+    rng = np.random.default_rng(seed)
+    material_indices = rng.integers(
+        0, material_count, len(mesh.polygons), dtype=np.int32
+    )
+
+    mesh.polygons.foreach_set("material_index", material_indices)
+    mesh.update()
+
+
+def build_face_adjacency(mesh):
+    """辺を共有する面どうしの隣接関係を CSR 形式の配列(indptr, indices)で作成する
+    面 i の隣接面は indices[indptr[i]:indptr[i + 1]]"""
+    polygon_count = len(mesh.polygons)
+
+    # ループごとの辺と、そのループが属する面を取得
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+    loop_totals = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    loop_polygons = np.repeat(np.arange(polygon_count, dtype=np.int64), loop_totals)
+
+    # 辺の番号で並べ替え、同じ辺を持つ面の組を作る
+    order = np.argsort(loop_edges, kind="stable")
+    sorted_edges = loop_edges[order]
+    sorted_polygons = loop_polygons[order]
+
+    return face_adjacency_from_edges(sorted_edges, sorted_polygons, polygon_count)
+
+
+def face_adjacency_from_edges(sorted_edges, sorted_polygons, polygon_count):
+    """辺の番号で並べ替えた (辺, 面) の組から CSR 形式の隣接関係を作成する"""
+    sources = []
+    targets = []
+    # 3つ以上の面が共有する辺でもすべての組を作るため、間隔を広げながら比較する
+    offset = 1
+    while offset < len(sorted_edges):
+        same_edge = sorted_edges[offset:] == sorted_edges[:-offset]
+        if not same_edge.any():
+            break
+        sources.append(sorted_polygons[:-offset][same_edge])
+        targets.append(sorted_polygons[offset:][same_edge])
+        offset += 1
+
+    if sources:
+        source = np.concatenate(sources + targets)
+        target = np.concatenate(targets + sources)
+    else:
+        source = target = np.empty(0, dtype=np.int64)
+
+    # 自分自身との組を除き、(面, 隣接面) のキーを並べ替えて面の順にする
+    # np.unique はキーの数が多いと遅いため、並べ替えと隣との比較で重複を探す
+    distinct = source != target
+    pair_keys = np.sort(source[distinct] * polygon_count + target[distinct])
+    # 2つの面が複数の辺を共有する場合だけ重複した組ができる
+    duplicate = pair_keys[1:] == pair_keys[:-1]
+    if duplicate.any():
+        pair_keys = pair_keys[np.concatenate(([True], ~duplicate))]
+    source = pair_keys // polygon_count
+    indices = (pair_keys % polygon_count).astype(np.int32)
+    indptr = np.zeros(polygon_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(source, minlength=polygon_count), out=indptr[1:])
+
+    return indptr, indices
+
+
+def color_face_graph(indptr, indices, slot_count, seed=None):
+    """隣接する面が同じ番号にならないように、面に 0 から slot_count - 1 の番号を付ける
+    ランダムな優先度で隣接面より優先度の高い面をまとめて着色する貪欲法
+    (Jones-Plassmann 法)で、各面には隣接面で使われていない番号をランダムに選ぶ"""
+    polygon_count = len(indptr) - 1
+    degrees = np.diff(indptr)
+    if polygon_count and degrees.max() >= slot_count:
+        raise ValueError(
+            f"slot_count ({slot_count}) must be greater than "
+            f"the maximum face degree ({degrees.max()})"
+        )
+
+    rng = np.random.default_rng(seed)
+    # 重複のない優先度にして、隣接する面が同時に着色されないようにする
+    priorities = rng.permutation(polygon_count)
+    colors = np.full(polygon_count, -1, dtype=np.int32)
+    position = np.empty(polygon_count, dtype=np.int64)
 
-    # メッシュの各面を反復処理する
-    for face in bmesh_obj.faces:
-        # ランダムにマテリアルを選択する
-        obj.active_material_index = random.randint(0, material_count)
+    # 面ごとの作業用の配列は一度だけ確保し、使った要素だけを元に戻す
+    blocked = np.zeros(polygon_count, dtype=bool)
+    is_candidate = np.zeros(polygon_count, dtype=bool)
 
-        # 面を選択し、アクティブなマテリアルを割当てる
-        face.select = True
-        bpy.ops.object.material_slot_assign()
-        face.select = False
+    source = np.repeat(np.arange(polygon_count, dtype=np.int32), degrees)
+    target = indices
+    # 辺の先の面の優先度が高いか(優先度は変わらないため最初に一度だけ求める)
+    higher = priorities[target] > priorities[source]
+    uncolored = np.arange(polygon_count)
+    while len(uncolored):
+        # 未着色の隣接面より優先度が高い面を今回の着色候補にする
+        target_uncolored = colors[target] < 0
+        blocking = source[target_uncolored & higher]
+        blocked[blocking] = True
+        candidates = uncolored[~blocked[uncolored]]
+        blocked[blocking] = False
+        position[candidates] = np.arange(len(candidates))
 
-    # 編集モードをオフにする
-    bpy.ops.object.editmode_toggle()
+        # 着色済みの隣接面で使われている番号を除いてランダムに選ぶ
+        scores = rng.random((len(candidates), slot_count), dtype=np.float32)
+        is_candidate[candidates] = True
+        used = is_candidate[source] & ~target_uncolored
+        is_candidate[candidates] = False
+        scores[position[source[used]], colors[target[used]]] = 2.0
+        colors[candidates] = scores.argmin(axis=1)
+
+        # 着色した面とその辺は以降の判定に不要なので取り除く
+        remaining = colors[source] < 0
+        source = source[remaining]
+        target = target[remaining]
+        higher = higher[remaining]
+        uncolored = uncolored[colors[uncolored] < 0]
+
+    return colors
+
+
+def assign_materials_without_neighbors(obj, seed=None):
+    """隣接する面が同じマテリアルにならないように、すべての面にマテリアルを割当てる"""
+    if obj.mode == "EDIT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+
+    mesh = obj.data
+    indptr, indices = build_face_adjacency(mesh)
+    material_indices = color_face_graph(indptr, indices, len(mesh.materials), seed)
+
+    mesh.polygons.foreach_set("material_index", material_indices)
+    mesh.update()
+
+
+def write_random_face_colors(
+    obj, attribute_name="face_color", domain="FACE", seed=None, palette=None
+):
+    """すべての面のランダムな色を一度に生成し、カラー属性に書き込む
+    domain は "FACE"(面ごと)か "CORNER"(面の角ごと、EEVEE でも表示できる)
+    palette (リニアRGBAの配列) を渡した場合はパレットの色からランダムに選ぶ"""
+    mesh = obj.data
+    polygon_count = len(mesh.polygons)
+
+    rng = np.random.default_rng(seed)
+    if palette is None:
+        # 0.0 から 1.0 までの値を作成(アルファは 1.0)
+        colors = np.ones((polygon_count, 4), dtype=np.float32)
+        colors[:, :3] = rng.random((polygon_count, 3), dtype=np.float32)
+    else:
+        palette = np.asarray(palette, dtype=np.float32)
+        colors = palette[rng.integers(0, len(palette), polygon_count)]
+
+    if domain == "CORNER":
+        # 面の色をその面のすべての角にコピーする
+        loop_totals = np.empty(polygon_count, dtype=np.int32)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+        colors = np.repeat(colors, loop_totals, axis=0)
+
+    if attribute_name in mesh.attributes:
+        mesh.attributes.remove(mesh.attributes[attribute_name])
+    attribute = mesh.attributes.new(attribute_name, "FLOAT_COLOR", domain)
+    attribute.data.foreach_set("color", colors.ravel())
+
+
+def get_color_attribute_material(attribute_name="face_color"):
+    """カラー属性を読み込む共有のマテリアルを取得する"""
+    spec = {
+        "nodes": {
+            "Material Output": {
+                "type": "ShaderNodeOutputMaterial",
+                "location": [300, 300],
+            },
+            "Principled BSDF": {
+                "type": "ShaderNodeBsdfPrincipled",
+                "location": [10, 300],
+            },
+            # カラー属性ノード
+            "Attribute": {
+                "type": "ShaderNodeAttribute",
+                "location": [-200, 300],
+                "properties": {"attribute_name": attribute_name},
+            },
+        },
+        "links": [
+            ["Attribute", "Color", "Principled BSDF", "Base Color"],
+            ["Principled BSDF", "BSDF", "Material Output", "Surface"],
+        ],
+    }
+
+    return get_material(f"{attribute_name}_material", spec)
+
+
+def assign_random_face_colors(
+    obj, attribute_name="face_color", domain="FACE", palette=None
+):
+    """色ごとにマテリアルを作らず、カラー属性と1つのマテリアルで面に色を付ける
+    色の数に関係なくマテリアルは1つだけ"""
+    write_random_face_colors(obj, attribute_name, domain, palette=palette)
+
+    obj.data.materials.clear()
+    obj.data.materials.append(get_color_attribute_material(attribute_name))
 
 
 ico_object = add_ico_sphere()
 
+# 参照する画像のパスを指定すると、ランダムな色の代わりに画像から取り出した色を使う
+reference_image_path = None
+face_palette = (
+    load_image_palette(reference_image_path) if reference_image_path else None
+)
+
+# True にすると色ごとのマテリアルではなく、カラー属性で面に色を付ける
+use_color_attribute = False
+
+if use_color_attribute:
+    assign_random_face_colors(ico_object, palette=face_palette)
+else:
+    # 作成するマテリアルの数を保持する変数の作成
+    material_count = 30
 
-# 作成するマテリアルの数を保持する変数の作成
-material_count = 30
+    # オブジェクトにマテリアルを作成して割当てる
+    generate_random_color_materials(ico_object, material_count, face_palette)
 
-# オブジェクトにマテリアルを作成して割当てる
-generate_random_color_materials(ico_object, material_count)
+    # True にすると隣接する面が同じマテリアルにならないように割当てる
+    avoid_same_neighbor_material = False
 
-assign_materials_to_faces(ico_object)
+    if avoid_same_neighbor_material:
+        assign_materials_without_neighbors(ico_object)
+    else:
+        assign_materials_to_faces(ico_object)
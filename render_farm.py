@@ -0,0 +1,417 @@
+"""
+polyhedron_splitting_animation のアニメーションをバックグラウンドの Blender で
+フレームごとに分割してレンダリングする
+
+ドライバー(通常の Python で実行):
+    python render_farm.py --blender blender --output renders --workers 4 --threads 2
+
+ワーカー(ドライバーが `blender -b --python render_farm.py -- --worker ...` で起動):
+    シーンを作成(または --blend のファイルを読み込み)し、
+    割り当てられたフレームを CPU の Cycles でレンダリングする
+
+レンダリングが終わったフレームはマニフェスト(manifest_*.jsonl)に1行ずつ記録し、
+中断したジョブを再実行すると、まだ出力されていないフレームだけをレンダリングする
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from render_settings import format_frames, parse_frames, setup_render_settings
+
+# レンダリング結果のファイル名(拡張子は Blender が付ける)
+FRAME_FILE_PREFIX = "frame_"
+MANIFEST_PATTERN = "manifest_*.jsonl"
+REPORT_FILE_NAME = "render_report.json"
+HASH_FILE_NAME = "frame_hashes.json"
+
+
+# ====================
+# フレーム範囲のユーティリティ
+# ====================
+
+
+def split_into_chunks(frames, chunk_count):
+    """フレームのリストを連続したチャンクにほぼ均等に分割"""
+    chunk_count = max(1, min(chunk_count, len(frames)))
+    chunk_size, remainder = divmod(len(frames), chunk_count)
+    chunks = []
+    start = 0
+    for i in range(chunk_count):
+        end = start + chunk_size + (1 if i < remainder else 0)
+        chunks.append(frames[start:end])
+        start = end
+
+    return chunks
+
+
+# ====================
+# マニフェスト
+# ====================
+
+
+def read_manifest(output_dir):
+    """マニフェストを読み込み、出力ファイルが存在するフレームの記録を返す"""
+    records = {}
+    for path in glob.glob(os.path.join(output_dir, MANIFEST_PATTERN)):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断時に書きかけになった行は無視する
+                    continue
+                if os.path.exists(record["path"]):
+                    records[record["frame"]] = record
+
+    return records
+
+
+def missing_frames(output_dir, frames):
+    """まだレンダリングされていないフレームを返す"""
+    done = read_manifest(output_dir)
+    return [frame for frame in frames if frame not in done]
+
+
+# ====================
+# 重複フレーム
+# ====================
+
+
+def group_duplicate_frames(hashes):
+    """
+    同じハッシュのフレームをまとめる
+    {レンダリングするフレーム: [同じ状態の残りのフレーム, ...]} を返す
+    """
+    first_frames = {}
+    groups = {}
+    for frame in sorted(hashes):
+        first_frame = first_frames.setdefault(hashes[frame], frame)
+        groups.setdefault(first_frame, [])
+        if first_frame != frame:
+            groups[first_frame].append(frame)
+
+    return groups
+
+
+def link_frame(source_path, target_path):
+    """レンダリング済みの画像をハードリンクし、できなければコピーする"""
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+
+def save_frame_hashes(path, hashes, inputs=None):
+    """フレームごとのハッシュを、計算したときの設定 (inputs) と一緒に JSON で保存"""
+    data = {
+        "inputs": inputs,
+        "hashes": {str(frame): value for frame, value in hashes.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def load_frame_hashes(path):
+    """保存したハッシュを (設定, {フレーム: ハッシュ}) で読み込む"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    hashes = {int(frame): value for frame, value in data.get("hashes", {}).items()}
+    return data.get("inputs"), hashes
+
+
+def frame_output_path(output_dir, frame, extension):
+    """
+    フレームの出力先(「frame_0001.png」のように4桁以上にゼロ埋めする)
+    ワーカーの保存先と、重複フレームのリンク先の両方で使う
+    """
+    return os.path.join(output_dir, f"{FRAME_FILE_PREFIX}{frame:04d}{extension}")
+
+
+# ====================
+# ワーカー(Blender 内で実行)
+# ====================
+
+
+def build_scene(args):
+    """.blend を読み込んでいない場合はスクリプトからシーンを作成する"""
+    import bpy
+
+    if not bpy.data.filepath:
+        import polyhedron_splitting_animation
+
+        polyhedron_splitting_animation.main(seed=args.seed, shard_cache_dir=args.cache)
+
+    return bpy.context.scene
+
+
+def run_hash_pass(args):
+    """レンダリング前にフレームごとの状態のハッシュを計算して保存"""
+    scene = build_scene(args)
+
+    from duplicate_frames import compute_frame_hashes
+
+    hashes = compute_frame_hashes(scene, parse_frames(args.frames))
+    save_frame_hashes(os.path.join(args.output, HASH_FILE_NAME), hashes)
+
+
+def run_worker(args):
+    """割り当てられたフレームをレンダリングし、1フレームごとにマニフェストへ記録"""
+    import bpy
+
+    scene = build_scene(args)
+    setup_render_settings(scene, args.threads, args.samples)
+
+    frames = parse_frames(args.frames)
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = os.path.join(
+        args.output, MANIFEST_PATTERN.replace("*", f"{os.getpid()}")
+    )
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        for frame in frames:
+            start_time = time.perf_counter()
+
+            scene.frame_set(frame)
+            path = frame_output_path(args.output, frame, scene.render.file_extension)
+            bpy.ops.render.render()
+            bpy.data.images["Render Result"].save_render(path)
+
+            record = {
+                "frame": frame,
+                "path": path,
+                "seconds": time.perf_counter() - start_time,
+            }
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+
+
+# ====================
+# ドライバー
+# ====================
+
+
+def build_worker_command(args, frames, mode="--worker"):
+    """ワーカーの Blender を起動するコマンドを作成"""
+    command = [args.blender, "-b"]
+    if args.blend:
+        command.append(args.blend)
+    command += [
+        "--python",
+        os.path.abspath(__file__),
+        "--",
+        mode,
+        "--output",
+        os.path.abspath(args.output),
+        "--frames",
+        format_frames(frames),
+        "--threads",
+        str(args.threads),
+        "--samples",
+        str(args.samples),
+        "--seed",
+        str(args.seed),
+    ]
+    if args.cache:
+        command += ["--cache", os.path.abspath(args.cache)]
+
+    return command
+
+
+def hash_inputs(args, frames):
+    """ハッシュの結果に影響する設定(再実行時に保存したハッシュを使えるかの判定用)"""
+    blend = os.path.abspath(args.blend) if args.blend else None
+    cache = os.path.abspath(args.cache) if args.cache else None
+
+    return {
+        "frames": format_frames(frames),
+        "seed": args.seed,
+        "blend": blend,
+        "blend_mtime": os.path.getmtime(blend) if blend else None,
+        "cache": cache,
+        "cache_mtime": (
+            max(
+                (
+                    os.path.getmtime(path)
+                    for path in glob.glob(os.path.join(cache, "*"))
+                ),
+                default=None,
+            )
+            if cache
+            else None
+        ),
+    }
+
+
+def load_duplicate_groups(args, frames):
+    """
+    ハッシュを計算するワーカーを起動し、同じ状態のフレームをまとめる
+    ハッシュはファイルに保存し、再実行時は設定とフレームが同じなら計算し直さない
+    """
+    hash_path = os.path.join(args.output, HASH_FILE_NAME)
+    inputs = hash_inputs(args, frames)
+
+    hashes = None
+    if os.path.exists(hash_path):
+        saved_inputs, hashes = load_frame_hashes(hash_path)
+        if saved_inputs != inputs or set(hashes) != set(frames):
+            print(f"{HASH_FILE_NAME} was computed with other settings, recomputing")
+            hashes = None
+
+    if hashes is None:
+        command = build_worker_command(args, frames, mode="--hash-frames")
+        subprocess.run(command, check=True)
+        _, hashes = load_frame_hashes(hash_path)
+        save_frame_hashes(hash_path, hashes, inputs)
+
+    return group_duplicate_frames(hashes)
+
+
+def link_duplicate_frames(args, groups):
+    """レンダリング済みのフレームを同じ状態の残りのフレームへリンクする"""
+    done = read_manifest(args.output)
+    manifest_path = os.path.join(args.output, MANIFEST_PATTERN.replace("*", "links"))
+    linked = 0
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        for frame, duplicates in groups.items():
+            if frame not in done:
+                continue
+            source_path = done[frame]["path"]
+            for duplicate in duplicates:
+                if duplicate in done:
+                    continue
+                # ワーカーと同じ関数で出力先を決める
+                target_path = frame_output_path(
+                    os.path.abspath(args.output),
+                    duplicate,
+                    os.path.splitext(source_path)[1],
+                )
+                link_frame(source_path, target_path)
+                record = {"frame": duplicate, "path": target_path, "source": frame}
+                manifest.write(json.dumps(record) + "\n")
+                linked += 1
+
+    return linked
+
+
+def run_driver(args):
+    """未レンダリングのフレームをチャンクに分け、ワーカーを並列に起動する"""
+    os.makedirs(args.output, exist_ok=True)
+    frames = missing_frames(args.output, parse_frames(args.frames))
+    if not frames:
+        print("all frames are already rendered")
+        return []
+
+    groups = None
+    if args.dedupe:
+        # 同じ状態のフレームは最初のフレームだけをレンダリングする
+        groups = load_duplicate_groups(args, parse_frames(args.frames))
+        done = read_manifest(args.output)
+        frames = [frame for frame in groups if frame not in done]
+        print(
+            f"{sum(len(duplicates) for duplicates in groups.values())} "
+            "duplicate frames will be linked instead of rendered"
+        )
+
+    chunks = split_into_chunks(frames, args.workers) if frames else []
+    print(f"rendering {len(frames)} frames with {len(chunks)} workers")
+
+    running = []
+    for index, chunk in enumerate(chunks):
+        log = open(os.path.join(args.output, f"worker_{index}.log"), "w")
+        process = subprocess.Popen(
+            build_worker_command(args, chunk), stdout=log, stderr=subprocess.STDOUT
+        )
+        running.append((index, chunk, process, log, time.perf_counter()))
+
+    # チャンクごとの実行時間を計測
+    results = []
+    while running:
+        for item in list(running):
+            index, chunk, process, log, start_time = item
+            if process.poll() is None:
+                continue
+            log.close()
+            running.remove(item)
+
+            wall_time = time.perf_counter() - start_time
+            rendered = len(chunk) - len(missing_frames(args.output, chunk))
+            result = {
+                "chunk": index,
+                "frames": format_frames(chunk),
+                "rendered": rendered,
+                "return_code": process.returncode,
+                "wall_time": wall_time,
+                "frames_per_minute": rendered / wall_time * 60 if wall_time else 0.0,
+            }
+            results.append(result)
+            print(
+                f"chunk {index} [{result['frames']}]: {rendered}/{len(chunk)} frames "
+                f"in {wall_time:.1f}s ({result['frames_per_minute']:.2f} frames/min)"
+            )
+        time.sleep(0.5)
+
+    if groups:
+        print(f"linked {link_duplicate_frames(args, groups)} duplicate frames")
+
+    report = {
+        "workers": args.workers,
+        "threads": args.threads,
+        "chunks": sorted(results, key=lambda result: result["chunk"]),
+        "remaining": format_frames(
+            missing_frames(args.output, parse_frames(args.frames))
+        ),
+    }
+    with open(os.path.join(args.output, REPORT_FILE_NAME), "w") as f:
+        json.dump(report, f, indent=2)
+
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--blender", default="blender", help="Blender の実行ファイル")
+    parser.add_argument("--blend", help="読み込む .blend (省略時はスクリプトで作成)")
+    parser.add_argument("--output", default="renders", help="出力フォルダ")
+    parser.add_argument("--frames", default="1-288", help="例: 1-288 / 1-10,20")
+    parser.add_argument("--workers", type=int, default=2, help="ワーカー数")
+    parser.add_argument(
+        "--threads", type=int, default=0, help="ワーカーごとのスレッド数(0 は自動)"
+    )
+    parser.add_argument("--samples", type=int, default=0, help="0 はシーンの設定")
+    parser.add_argument("--seed", type=int, default=0, help="アニメーションのシード")
+    parser.add_argument("--cache", help="shard_cache.py で書き出したキャッシュ")
+    parser.add_argument(
+        "--dedupe", action="store_true", help="同じ状態のフレームは1回だけレンダリング"
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--hash-frames", action="store_true", help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+
+def main():
+    # Blender から起動された場合は「--」以降が引数
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+
+    if args.hash_frames:
+        run_hash_pass(args)
+    elif args.worker:
+        run_worker(args)
+    else:
+        run_driver(args)
+
+
+if __name__ == "__main__":
+    main()
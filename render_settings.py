@@ -0,0 +1,76 @@
+"""
+レンダリングの設定とフレーム範囲のユーティリティ
+render_farm.py・noise_bake.py・geometry_nodes_benchmark.py で共有する
+bpy を import しないため、通常の Python (render_farm.py のドライバー) でも使える
+"""
+
+# setup_render_settings() が変更する設定(scene からのパス)
+RENDER_SETTING_PATHS = (
+    "render.engine",
+    "render.threads_mode",
+    "render.threads",
+    "cycles.device",
+    "cycles.samples",
+)
+
+
+def parse_frames(text):
+    """「1-10,15,20-30」形式の文字列をフレーム番号のリストに変換"""
+    frames = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            frames.extend(range(int(start), int(end) + 1))
+        else:
+            frames.append(int(part))
+
+    return frames
+
+
+def format_frames(frames):
+    """フレーム番号のリストを「1-10,15,20-30」形式の文字列に変換"""
+    parts = []
+    frames = sorted(frames)
+    i = 0
+    while i < len(frames):
+        j = i
+        while j + 1 < len(frames) and frames[j + 1] == frames[j] + 1:
+            j += 1
+        parts.append(str(frames[i]) if i == j else f"{frames[i]}-{frames[j]}")
+        i = j + 1
+
+    return ",".join(parts)
+
+
+def setup_render_settings(scene, threads, samples):
+    """CPU の Cycles でレンダリングするように設定"""
+    scene.render.engine = "CYCLES"
+    scene.cycles.device = "CPU"
+    if samples:
+        scene.cycles.samples = samples
+    if threads:
+        scene.render.threads_mode = "FIXED"
+        scene.render.threads = threads
+    else:
+        scene.render.threads_mode = "AUTO"
+
+
+def save_render_settings(scene):
+    """setup_render_settings() が変更する設定の現在の値を返す"""
+    saved = {}
+    for path in RENDER_SETTING_PATHS:
+        owner_name, name = path.split(".")
+        saved[path] = getattr(getattr(scene, owner_name), name)
+
+    return saved
+
+
+def restore_render_settings(scene, saved):
+    """save_render_settings() で保存した値に戻す"""
+    # エンジンを先に戻すと Cycles の設定が変更できない場合があるため、最後に戻す
+    for path in reversed(RENDER_SETTING_PATHS):
+        owner_name, name = path.split(".")
+        setattr(getattr(scene, owner_name), name, saved[path])
@@ -0,0 +1,255 @@
+"""
+木などを並べる位置の生成
+すべてのパターンを NumPy の配列計算で作成し、
+(位置の配列 (点の数, 3), 種類の番号の配列 (点の数,)) を返す
+tree_checkered_pattern.build_scattered_forest() にそのまま渡せる
+
+パターン
+    checker_pattern()      : 市松模様の格子 (番号は (行 + 列) % 2)
+    jittered_grid()        : 格子の位置をランダムにずらす
+    poisson_disk()         : 互いに radius 以上離れたランダムな点 (Bridson 法)
+    density_map_pattern()  : 密度マップに比例した数のランダムな点
+"""
+
+import numpy as np
+
+# Bridson 法で1つの点の周りに試す候補の数(続けてこの数だけ失敗したら打ち切る)
+# 時間を抑えるため、論文の 30 より少なくしている
+# 30 に比べて点の密度は 5% ほど下がるが、時間は半分ほどになる
+# (100 万点で約 15 秒と約 27 秒)。隙間の少なさが必要な場合は candidate_count=30 を渡す
+POISSON_CANDIDATES = 12
+
+# Bridson 法で1回の繰り返しで活性な点ごとに作る候補の数
+POISSON_BATCH = 6
+
+
+def _spawn_seeds(seed):
+    """位置と種類の番号に、互いに独立した乱数の系列を使うためのシードを作る"""
+    return np.random.SeedSequence(seed).spawn(2)
+
+
+def _to_positions(x, y):
+    """x, y 座標の配列を (点の数, 3) の位置の配列にする(z は 0)"""
+    positions = np.zeros((len(x), 3), dtype=np.float32)
+    positions[:, 0] = x
+    positions[:, 1] = y
+
+    return positions
+
+
+def random_prototype_ids(count, prototype_count=2, weights=None, seed=None):
+    """種類の番号をランダムに選ぶ(weights で種類ごとの割合を指定できる)"""
+    rng = np.random.default_rng(seed)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        weights = weights / weights.sum()
+
+    return rng.choice(prototype_count, count, p=weights).astype(np.int32)
+
+
+def checker_pattern(rows, columns, spacing=2.0):
+    """格子状に並べ、(行 + 列) % 2 を種類の番号にする"""
+    i, j = np.divmod(np.arange(rows * columns), columns)
+
+    return _to_positions(i * spacing, j * spacing), ((i + j) % 2).astype(np.int32)
+
+
+def jittered_grid(rows, columns, spacing=2.0, jitter=0.5, prototype_count=2, seed=None):
+    """格子の位置を spacing * jitter の範囲でランダムにずらす"""
+    position_seed, id_seed = _spawn_seeds(seed)
+    rng = np.random.default_rng(position_seed)
+    i, j = np.divmod(np.arange(rows * columns), columns)
+    offsets = rng.uniform(-0.5, 0.5, (rows * columns, 2)) * spacing * jitter
+    positions = _to_positions(i * spacing + offsets[:, 0], j * spacing + offsets[:, 1])
+
+    return positions, random_prototype_ids(
+        len(positions), prototype_count, seed=id_seed
+    )
+
+
+class _PoissonGrid:
+    """
+    Bridson 法の高速化のための格子
+    セルの大きさを radius / √2 にすると、1つのセルには点が1つしか入らない
+    格子の周りに2セル分の余白を付け、隣のセルを調べるときの範囲の判定を省く
+    """
+
+    PADDING = 2
+
+    def __init__(self, width, height, radius):
+        self.radius = radius
+        self.cell_size = radius / np.sqrt(2)
+        self.shape = (
+            int(np.ceil(width / self.cell_size)),
+            int(np.ceil(height / self.cell_size)),
+        )
+        self.stride = self.shape[1] + 2 * self.PADDING
+        padded_size = (self.shape[0] + 2 * self.PADDING) * self.stride
+
+        # セルごとの点の番号(-1 は空)と、候補どうしを比べるための作業用の格子
+        self.cells = np.full(padded_size, -1, dtype=np.int32)
+        self.scratch = np.full(padded_size, -1, dtype=np.int32)
+        # 1つのセルに点は1つなので、点の数はセルの数を超えない
+        self.points = np.empty((self.shape[0] * self.shape[1], 2))
+        self.count = 0
+
+        # radius 以内の点は前後2つまでのセルにある(四隅のセルは必ず radius 以上離れる)
+        # 近いセルから調べ、先に衝突が見つかった候補は以降の判定から外す
+        offsets = [
+            (dx, dy)
+            for dx in range(-2, 3)
+            for dy in range(-2, 3)
+            if abs(dx) + abs(dy) < 4
+        ]
+        offsets.sort(key=lambda offset: offset[0] ** 2 + offset[1] ** 2)
+        self.offsets = [dx * self.stride + dy for dx, dy in offsets]
+
+    def cell_indices(self, points):
+        """点が入るセルの(余白を含む格子での)番号"""
+        cells = (points // self.cell_size).astype(np.int32)
+        x = np.minimum(cells[:, 0], self.shape[0] - 1) + self.PADDING
+        y = np.minimum(cells[:, 1], self.shape[1] - 1) + self.PADDING
+
+        return x * self.stride + y
+
+    def conflicts(self, points, cells, grid, grid_points, ranks=None):
+        """
+        周りのセルに radius より近い点がある候補を True にする
+        ranks を渡した場合は、自分より順位の高い(値の小さい)点だけと比べる
+        """
+        result = np.zeros(len(points), dtype=bool)
+        remaining = np.arange(len(points))
+
+        for i, offset in enumerate(self.offsets):
+            neighbors = grid[cells[remaining] + offset]
+            found = neighbors >= 0
+            if ranks is not None:
+                found &= neighbors < ranks[remaining]
+            indices = remaining[found]
+            difference = grid_points[neighbors[found]] - points[indices]
+            close = np.einsum("ij,ij->i", difference, difference) < self.radius**2
+            result[indices[close]] = True
+
+            # 同じセル・上下左右・隣接する9セルを調べた後で、衝突が見つかった候補を外す
+            if i in (0, 4, 8):
+                remaining = remaining[~result[remaining]]
+
+        return result
+
+    def free(self, points):
+        """既存の点と radius 以上離れている点を True にする"""
+        cells = self.cell_indices(points)
+        return ~self.conflicts(points, cells, self.cells, self.points[: self.count])
+
+    def accept(self, candidates):
+        """
+        既存の点と radius 以上離れた候補(free() で確認済み)のうち、
+        候補どうしも radius 以上離れるものを追加し、追加した点を返す
+        候補どうしが近い場合は、配列の先にある候補を残す
+        """
+        cells = self.cell_indices(candidates)
+
+        # 同じセルに入る候補は1つだけ残す
+        _, first = np.unique(cells, return_index=True)
+        first.sort()
+        candidates = candidates[first]
+        cells = cells[first]
+
+        # 残した候補を作業用の格子に入れ、順位の高い候補に近いものを取り除く
+        ranks = np.arange(len(candidates))
+        self.scratch[cells] = ranks
+        keep = ~self.conflicts(candidates, cells, self.scratch, candidates, ranks)
+        self.scratch[cells] = -1
+        candidates = candidates[keep]
+        cells = cells[keep]
+
+        new_count = self.count + len(candidates)
+        self.cells[cells] = np.arange(self.count, new_count)
+        self.points[self.count : new_count] = candidates
+        self.count = new_count
+
+        return candidates
+
+
+def poisson_disk(
+    width,
+    height,
+    radius,
+    candidate_count=POISSON_CANDIDATES,
+    prototype_count=2,
+    seed=None,
+):
+    """
+    width x height の範囲に、互いに radius 以上離れた点を敷き詰める
+    Bridson 法を配列計算でまとめて行う: 活性な点すべての周りに同時に候補を作り、
+    格子で既存の点と候補どうしの距離を調べて、条件を満たす候補だけを追加する
+    """
+    position_seed, id_seed = _spawn_seeds(seed)
+    rng = np.random.default_rng(position_seed)
+    grid = _PoissonGrid(width, height, radius)
+    size = np.array([width, height])
+
+    # 最初の点を広い範囲にばらまき、繰り返しの回数を減らす
+    seed_count = max(int(width * height / (radius * radius * 64)), 1)
+    active = grid.accept(rng.random((seed_count, 2)) * size)
+
+    # 活性な点ごとの、続けて失敗した候補の数
+    failures = np.zeros(len(active), dtype=np.int64)
+
+    while len(active):
+        # 活性な点の周りの radius から 2 * radius の円環に候補を作る
+        shape = (len(active), POISSON_BATCH)
+        angles = rng.uniform(0, 2 * np.pi, shape)
+        distances = radius * np.sqrt(rng.uniform(1, 4, shape))
+        candidates = active[:, None, :] + np.stack(
+            [np.cos(angles) * distances, np.sin(angles) * distances], axis=-1
+        )
+        candidates = candidates.reshape(-1, 2)
+        origins = np.repeat(np.arange(len(active)), POISSON_BATCH)
+
+        inside = np.all((candidates >= 0) & (candidates < size), axis=1)
+        candidates = candidates[inside]
+        origins = origins[inside]
+
+        # 既存の点に近い候補は除く
+        # 続けて candidate_count 個の候補が失敗した点は活性でなくなる
+        free = grid.free(candidates)
+        succeeded = np.zeros(len(active), dtype=bool)
+        succeeded[origins[free]] = True
+        failures = np.where(succeeded, 0, failures + POISSON_BATCH)
+        still_active = failures < candidate_count
+
+        order = rng.permutation(np.count_nonzero(free))
+        accepted = grid.accept(candidates[free][order])
+        active = np.concatenate([active[still_active], accepted])
+        failures = np.concatenate(
+            [failures[still_active], np.zeros(len(accepted), dtype=np.int64)]
+        )
+
+    points = grid.points[: grid.count]
+    positions = _to_positions(points[:, 0], points[:, 1])
+
+    return positions, random_prototype_ids(
+        len(positions), prototype_count, seed=id_seed
+    )
+
+
+def density_map_pattern(density, width, height, count, prototype_count=2, seed=None):
+    """
+    密度マップ ((行, 列) の配列、値が大きいほど多く置く) に比例して count 個の点を置く
+    マップの行が y、列が x に対応し、セルの中の位置はランダム
+    """
+    position_seed, id_seed = _spawn_seeds(seed)
+    rng = np.random.default_rng(position_seed)
+    density = np.asarray(density, dtype=np.float64)
+    map_rows, map_columns = density.shape
+
+    weights = np.maximum(density.ravel(), 0)
+    cells = rng.choice(weights.size, count, p=weights / weights.sum())
+    row, column = np.divmod(cells, map_columns)
+
+    x = (column + rng.random(count)) * (width / map_columns)
+    y = (row + rng.random(count)) * (height / map_rows)
+    positions = _to_positions(x, y)
+
+    return positions, random_prototype_ids(count, prototype_count, seed=id_seed)
@@ -0,0 +1,54 @@
+"""
+シーンのリセット
+オペレーター(select_all / delete / orphans_purge)を使わずに、
+データブロックを種類ごとに集めて bpy.data.batch_remove で一度に削除する
+"""
+
+import time
+
+import bpy
+
+# 削除するデータブロックの種類(bpy.data の属性名)
+RESET_DATA_TYPES = (
+    "objects",
+    "meshes",
+    "curves",
+    "cameras",
+    "lights",
+    "materials",
+    "actions",
+    "node_groups",
+    "collections",
+    "worlds",
+)
+
+
+def reset_scene(data_types=RESET_DATA_TYPES, new_world=True, verbose=True):
+    """
+    シーン以外のデータブロックをまとめて削除する
+    アクティブなシーンは残し、new_world が True なら新しいワールドを割り当てる
+    削除したデータブロックの数とかかった時間(秒)を返す
+    """
+    start_time = time.perf_counter()
+
+    # アクティブなオブジェクトが編集モードになっていないことを確認する
+    active_object = bpy.context.active_object
+    if active_object and active_object.mode != "OBJECT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+
+    # 削除対象を種類ごとに集めて一度に削除
+    targets = set()
+    for data_type in data_types:
+        targets.update(getattr(bpy.data, data_type))
+    bpy.data.batch_remove(targets)
+
+    if new_world and "worlds" in data_types:
+        world = bpy.data.worlds.new("World")
+        world.use_nodes = True
+        bpy.context.scene.world = world
+
+    elapsed_time = time.perf_counter() - start_time
+    if verbose:
+        print(f"reset_scene: {len(targets)} datablocks freed in {elapsed_time:.3f}s")
+
+    return len(targets), elapsed_time
@@ -0,0 +1,251 @@
+"""
+破片アニメーションのキャッシュ
+フレームごとの評価済みの破片の変換行列を (フレーム数, 破片数, 4, 4) の配列として
+.npy に書き出し、メモリマップで読み込んで1つのオブジェクトを動かす
+レンダリング用のマシンでは split_face() や apply_animation() を実行し直さずに済む
+
+キャッシュフォルダの中身
+    matrices.npy  : (フレーム数, 破片数, 4, 4) の変換行列(float32)
+    geometry.npz  : 破片のローカル座標のメッシュ(全破片を連結)
+    cache.json    : フレーム範囲と破片の名前
+    shards.abc    : (任意) Alembic ファイル
+"""
+
+import json
+import os
+
+import bpy
+import numpy as np
+
+MATRICES_FILE_NAME = "matrices.npy"
+GEOMETRY_FILE_NAME = "geometry.npz"
+META_FILE_NAME = "cache.json"
+ALEMBIC_FILE_NAME = "shards.abc"
+
+
+# ====================
+# 書き出し
+# ====================
+
+
+def read_shard_geometry(objects):
+    """破片のメッシュをローカル座標のまま連結した配列として読み込む"""
+    co_list = []
+    loop_vertices_list = []
+    loop_totals_list = []
+    material_indices_list = []
+    vertex_shards_list = []
+    vertex_offset = 0
+
+    for shard_index, obj in enumerate(objects):
+        mesh = obj.data
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        loop_totals = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+        material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("material_index", material_indices)
+
+        co_list.append(co.reshape(-1, 3))
+        loop_vertices_list.append(loop_vertices + vertex_offset)
+        loop_totals_list.append(loop_totals)
+        material_indices_list.append(material_indices)
+        vertex_shards_list.append(np.full(len(mesh.vertices), shard_index, np.int32))
+        vertex_offset += len(mesh.vertices)
+
+    return {
+        "co": np.concatenate(co_list),
+        "loop_vertices": np.concatenate(loop_vertices_list),
+        "loop_totals": np.concatenate(loop_totals_list),
+        "material_indices": np.concatenate(material_indices_list),
+        "vertex_shards": np.concatenate(vertex_shards_list),
+    }
+
+
+def bake_shard_cache(
+    objects, cache_dir, frame_start=None, frame_end=None, export_alembic=False
+):
+    """
+    フレームごとの破片の変換行列をメモリマップした .npy に書き出す
+    1フレームずつ書き込むため、フレーム数が多くてもメモリ使用量は一定
+    """
+    scene = bpy.context.scene
+    frame_start = scene.frame_start if frame_start is None else frame_start
+    frame_end = scene.frame_end if frame_end is None else frame_end
+    frame_count = frame_end - frame_start + 1
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # bpy.data.objects から1回の foreach_get で行列を取得するためのインデックス
+    object_indices = {obj.name: i for i, obj in enumerate(bpy.data.objects)}
+    shard_indices = np.array([object_indices[obj.name] for obj in objects])
+    all_matrices = np.empty((len(bpy.data.objects), 16), dtype=np.float32)
+
+    matrices = np.lib.format.open_memmap(
+        os.path.join(cache_dir, MATRICES_FILE_NAME),
+        mode="w+",
+        dtype=np.float32,
+        shape=(frame_count, len(objects), 4, 4),
+    )
+
+    original_frame = scene.frame_current
+    for i, frame in enumerate(range(frame_start, frame_end + 1)):
+        scene.frame_set(frame)
+        bpy.data.objects.foreach_get("matrix_world", all_matrices.ravel())
+        # Blender の行列は列優先で並んでいるため転置する
+        matrices[i] = all_matrices[shard_indices].reshape(-1, 4, 4).transpose(0, 2, 1)
+    scene.frame_set(original_frame)
+    matrices.flush()
+    del matrices
+
+    np.savez(
+        os.path.join(cache_dir, GEOMETRY_FILE_NAME), **read_shard_geometry(objects)
+    )
+
+    meta = {
+        "frame_start": frame_start,
+        "frame_end": frame_end,
+        "shards": [obj.name for obj in objects],
+    }
+    with open(os.path.join(cache_dir, META_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    if export_alembic:
+        export_shard_alembic(objects, cache_dir, frame_start, frame_end)
+
+
+def export_shard_alembic(objects, cache_dir, frame_start, frame_end):
+    """破片を Alembic ファイルとして書き出す"""
+    bpy.ops.object.select_all(action="DESELECT")
+    for obj in objects:
+        obj.select_set(True)
+
+    bpy.ops.wm.alembic_export(
+        filepath=os.path.join(cache_dir, ALEMBIC_FILE_NAME),
+        start=frame_start,
+        end=frame_end,
+        selected=True,
+    )
+
+
+# ====================
+# 読み込み
+# ====================
+
+
+class ShardCache:
+    """メモリマップしたキャッシュから破片の頂点位置を計算する"""
+
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, META_FILE_NAME), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.frame_start = meta["frame_start"]
+        self.frame_end = meta["frame_end"]
+
+        # 変換行列はメモリマップで読み込み、必要なフレームだけを参照する
+        self.matrices = np.load(
+            os.path.join(cache_dir, MATRICES_FILE_NAME), mmap_mode="r"
+        )
+        geometry = np.load(os.path.join(cache_dir, GEOMETRY_FILE_NAME))
+        self.geometry = {key: geometry[key] for key in geometry.files}
+
+    def frame_matrices(self, frame):
+        """指定したフレームの破片の変換行列 (破片数, 4, 4) を返す"""
+        frame = min(max(frame, self.frame_start), self.frame_end)
+        return self.matrices[frame - self.frame_start]
+
+    def positions(self, frame):
+        """指定したフレームのすべての頂点位置を返す"""
+        vertex_matrices = self.frame_matrices(frame)[self.geometry["vertex_shards"]]
+        rest_co = self.geometry["co"]
+
+        return (
+            np.einsum("vij,vj->vi", vertex_matrices[:, :3, :3], rest_co)
+            + vertex_matrices[:, :3, 3]
+        )
+
+    def create_mesh(self, name):
+        """すべての破片を1つにまとめたメッシュを作成"""
+        geometry = self.geometry
+        loop_totals = geometry["loop_totals"]
+
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(len(geometry["co"]))
+        mesh.loops.add(len(geometry["loop_vertices"]))
+        mesh.polygons.add(len(loop_totals))
+        mesh.vertices.foreach_set("co", self.positions(self.frame_start).ravel())
+        mesh.loops.foreach_set("vertex_index", geometry["loop_vertices"])
+        mesh.polygons.foreach_set(
+            "loop_start", (np.cumsum(loop_totals) - loop_totals).astype(np.int32)
+        )
+        if bpy.app.version < (4, 0, 0):
+            mesh.polygons.foreach_set("loop_total", loop_totals)
+        mesh.polygons.foreach_set("material_index", geometry["material_indices"])
+        mesh.update(calc_edges=True)
+
+        return mesh
+
+
+# 読み込んだキャッシュ(オブジェクト名 → ShardCache)
+_loaded_caches = {}
+
+
+def cached_frame_matrices(name, frame):
+    """
+    キャッシュから動かしているオブジェクトなら、そのフレームの破片の変換行列を返す
+    (キャッシュのオブジェクトでなければ None)
+    頂点位置はハンドラーが書き換えるため、オブジェクトの行列やアニメーションからは
+    フレームの違いがわからない
+    """
+    cache = _loaded_caches.get(name)
+    return None if cache is None else cache.frame_matrices(frame)
+
+
+def update_cached_objects(scene, depsgraph=None):
+    """フレーム変更時にキャッシュから頂点位置を更新する"""
+    for name, cache in _loaded_caches.items():
+        obj = bpy.data.objects.get(name)
+        if not obj:
+            continue
+        obj.data.vertices.foreach_set(
+            "co", cache.positions(scene.frame_current).astype(np.float32).ravel()
+        )
+        obj.data.update()
+
+
+def load_shard_cache(cache_dir, name="Shard Cache", materials=()):
+    """
+    キャッシュを読み込み、すべての破片を1つのオブジェクトとして作成する
+    フレーム変更ハンドラーでキャッシュから頂点位置を更新する
+    """
+    cache = ShardCache(cache_dir)
+    mesh = cache.create_mesh(name)
+    for mat in materials:
+        mesh.materials.append(mat)
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    _loaded_caches[obj.name] = cache
+
+    if update_cached_objects not in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.append(update_cached_objects)
+    update_cached_objects(bpy.context.scene)
+
+    return obj
+
+
+def main():
+    """「Animated_Polyhedra」コレクションの破片をキャッシュに書き出す"""
+    objects = [
+        obj
+        for obj in bpy.data.collections["Animated_Polyhedra"].objects
+        if obj.animation_data
+    ]
+    cache_dir = os.path.join(bpy.path.abspath("//") or os.getcwd(), "shard_cache")
+    bake_shard_cache(objects, cache_dir)
+    print(f"baked {len(objects)} shards to {cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
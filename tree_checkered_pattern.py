@@ -1,56 +1,379 @@
+import time
+
+import bmesh
 import bpy
+import numpy as np
+from mathutils import Matrix
+
+from material_registry import get_material
+from node_tree_builder import add_group_input, apply_node_spec, new_geometry_node_group
+from scene_reset import reset_scene
+
+# インスタンスにする木の種類の番号を保存する頂点の属性名
+PROTOTYPE_ID_ATTRIBUTE = "prototype_id"
+
+# 木の種類ごとのマテリアル(マテリアル番号 0 が幹、1 が葉)
+TREE_MATERIALS = {
+    "Tree": [("Trunk", (0.16, 0.075, 0.025, 1)), ("Tree_Crown", (0, 1, 0, 1))],
+    "Pine": [
+        ("Pine_Trunk", (0.36, 0.22, 0.05, 1)),
+        ("Pine_Crown", (0.53, 0.59, 0.44, 1)),
+    ],
+}
 
 
 def scene_clear():
     """シーンをクリアする"""
-    bpy.ops.object.select_all(action="SELECT")
-    bpy.ops.object.delete()
+    reset_scene()
 
 
-scene_clear()
+def _add_part(bm, create, material_index, z, **kwargs):
+    """bmesh.ops の create_* で部品を追加し、その面にマテリアル番号を設定する"""
+    verts = create(bm, matrix=Matrix.Translation((0, 0, z)), **kwargs)["verts"]
+    for face in {face for vert in verts for face in vert.link_faces}:
+        face.material_index = material_index
 
 
-def create_tree(x, y, is_pine=False):
-    """通常の木または松の木を作成し、市松模様に並べる"""
+def create_tree_mesh(name, is_pine=False, segments=32, subdivisions=2):
+    """通常の木または松の木の幹と葉を1つにまとめたメッシュを作成する
+    segments は円錐・円柱の分割数、subdivisions は ICO 球の細分化のレベル"""
+    bm = bmesh.new()
 
     if is_pine:
         # 松の木の幹
-        pine_trunk_material = bpy.data.materials.new(name="Pine_Trunk")
-        pine_trunk_material.diffuse_color = (0.36, 0.22, 0.05, 1)
-        bpy.ops.mesh.primitive_cone_add(radius1=0.2, depth=1)
-        pine_trunk = bpy.context.active_object
-        pine_trunk.location = (x, y, 0.5)
-        pine_trunk.data.materials.append(pine_trunk_material)
-
+        _add_part(
+            bm,
+            bmesh.ops.create_cone,
+            0,
+            z=0.5,
+            cap_ends=True,
+            segments=segments,
+            radius1=0.2,
+            radius2=0,
+            depth=1,
+        )
         # 松の木の葉（3段）
-        pine_crown_material = bpy.data.materials.new(name="Pine_Crown")
-        pine_crown_material.diffuse_color = (0.53, 0.59, 0.44, 1)
-
         for i in range(3):
-            bpy.ops.mesh.primitive_cone_add(radius1=0.5, depth=1)
-            pine_crown = bpy.context.active_object
-            pine_crown.location = (x, y, 0.8 + i * 0.5)
-            pine_crown.data.materials.append(pine_crown_material)
-
+            _add_part(
+                bm,
+                bmesh.ops.create_cone,
+                1,
+                z=0.8 + i * 0.5,
+                cap_ends=True,
+                segments=segments,
+                radius1=0.5,
+                radius2=0,
+                depth=1,
+            )
     else:
         # 通常の木の幹
-        trunk_material = bpy.data.materials.new(name="Trunk")
-        trunk_material.diffuse_color = (0.16, 0.075, 0.025, 1)
-        bpy.ops.mesh.primitive_cylinder_add(radius=0.2, depth=1)
-        trunk = bpy.context.active_object
-        trunk.location = (x, y, 0.5)
-        trunk.data.materials.append(trunk_material)
-
+        _add_part(
+            bm,
+            bmesh.ops.create_cone,
+            0,
+            z=0.5,
+            cap_ends=True,
+            segments=segments,
+            radius1=0.2,
+            radius2=0.2,
+            depth=1,
+        )
         # 通常の木の葉
-        tree_crown_material = bpy.data.materials.new(name="Tree_Crown")
-        tree_crown_material.diffuse_color = (0, 1, 0, 1)
-        bpy.ops.mesh.primitive_ico_sphere_add(radius=0.8)
-        tree_crown = bpy.context.active_object
-        tree_crown.location = (x, y, 1)
-        tree_crown.data.materials.append(tree_crown_material)
-
-
-# 木を市松模様に並べる
-for i in range(6):
-    for j in range(6):
-        create_tree(i * 2, j * 2, is_pine=(i + j) % 2 == 1)
+        _add_part(
+            bm,
+            bmesh.ops.create_icosphere,
+            1,
+            z=1,
+            subdivisions=subdivisions,
+            radius=0.8,
+        )
+
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    append_tree_materials(mesh, is_pine)
+
+    return mesh
+
+
+def append_tree_materials(mesh, is_pine=False):
+    """幹と葉の共有のマテリアルをメッシュに追加する"""
+    for material_name, color in TREE_MATERIALS["Pine" if is_pine else "Tree"]:
+        spec = {"properties": {"diffuse_color": color}}
+        mesh.materials.append(get_material(material_name, spec))
+
+
+def get_tree_mesh(is_pine=False):
+    """木の種類ごとのメッシュを1回だけ作成し、以降は同じメッシュを返す"""
+    name = "Pine_Prototype" if is_pine else "Tree_Prototype"
+    mesh = bpy.data.meshes.get(name)
+    if mesh is None:
+        mesh = create_tree_mesh(name, is_pine)
+
+    return mesh
+
+
+def create_tree(x, y, is_pine=False, collection=None):
+    """通常の木または松の木を作成し、市松模様に並べる
+    メッシュとマテリアルはすべての木で共有し、オブジェクトだけを作成する"""
+    mesh = get_tree_mesh(is_pine)
+    tree = bpy.data.objects.new("Pine" if is_pine else "Tree", mesh)
+    tree.location = (x, y, 0)
+
+    collection = collection or bpy.context.scene.collection
+    collection.objects.link(tree)
+
+    return tree
+
+
+def build_forest(rows=6, columns=6, spacing=2):
+    """木を市松模様に並べた「Forest」コレクションを作成する"""
+    start_time = time.perf_counter()
+
+    collection = bpy.data.collections.new("Forest")
+    bpy.context.scene.collection.children.link(collection)
+
+    # 木を市松模様に並べる
+    for i in range(rows):
+        for j in range(columns):
+            create_tree(i * spacing, j * spacing, (i + j) % 2 == 1, collection)
+
+    elapsed_time = time.perf_counter() - start_time
+    print(f"build_forest: {rows * columns} trees in {elapsed_time:.3f}s")
+
+    return collection
+
+
+# ====================
+# ジオメトリノードのインスタンスで木を並べる
+# ====================
+
+
+def create_prototype_collection(name="Tree_Prototypes"):
+    """
+    インスタンスの元になる木のオブジェクトをまとめたコレクションを作成する
+    コレクション情報ノードは名前の順に並べるため、番号 0 が通常の木、1 が松の木になる
+    """
+    collection = bpy.data.collections.get(name)
+    if collection is None:
+        collection = bpy.data.collections.new(name)
+        bpy.context.scene.collection.children.link(collection)
+        create_tree(0, 0, False, collection).name = "Prototype_0_Tree"
+        create_tree(0, 0, True, collection).name = "Prototype_1_Pine"
+
+    # 元のオブジェクトは表示・レンダリングしない
+    layer_collection = bpy.context.view_layer.layer_collection.children.get(name)
+    if layer_collection:
+        layer_collection.exclude = True
+
+    return collection
+
+
+def forest_node_tree_spec():
+    """
+    点の番号から行と列を求めて格子状に並べ、(行 + 列) % 2 で木の種類を選ぶ spec
+    行数・列数・間隔はノードグループの入力なので、Python のループは使わない
+    """
+    nodes = {
+        "Group Input": {"type": "NodeGroupInput", "location": [-1200, 0]},
+        "Group Output": {"type": "NodeGroupOutput", "location": [600, 0]},
+        "Index": {"type": "GeometryNodeInputIndex", "location": [-1200, -300]},
+        "Count": {
+            "type": "ShaderNodeMath",
+            "location": [-900, 200],
+            "properties": {"operation": "MULTIPLY"},
+        },
+        # 行 = floor(番号 / 列数)、列 = 番号 % 列数
+        "Row Index": {
+            "type": "ShaderNodeMath",
+            "location": [-900, -200],
+            "properties": {"operation": "DIVIDE"},
+        },
+        "Row": {
+            "type": "ShaderNodeMath",
+            "location": [-700, -200],
+            "properties": {"operation": "FLOOR"},
+        },
+        "Column": {
+            "type": "ShaderNodeMath",
+            "location": [-700, -400],
+            "properties": {"operation": "MODULO"},
+        },
+        "Grid Position": {"type": "ShaderNodeCombineXYZ", "location": [-500, -200]},
+        "Spacing": {
+            "type": "ShaderNodeVectorMath",
+            "location": [-300, -200],
+            "properties": {"operation": "SCALE"},
+        },
+        # 市松模様: (行 + 列) % 2 が 1 なら松の木
+        "Row Plus Column": {
+            "type": "ShaderNodeMath",
+            "location": [-500, -500],
+            "properties": {"operation": "ADD"},
+        },
+        "Checker": {
+            "type": "ShaderNodeMath",
+            "location": [-300, -500],
+            "properties": {"operation": "MODULO"},
+            "inputs": {1: 2.0},
+        },
+        "Points": {"type": "GeometryNodePoints", "location": [-100, 100]},
+        "Collection Info": {
+            "type": "GeometryNodeCollectionInfo",
+            "location": [-100, -200],
+            "inputs": {"Separate Children": True, "Reset Children": True},
+        },
+        "Instance on Points": {
+            "type": "GeometryNodeInstanceOnPoints",
+            "location": [300, 0],
+            "inputs": {"Pick Instance": True},
+        },
+    }
+    links = [
+        ["Group Input", "Rows", "Count", 0],
+        ["Group Input", "Columns", "Count", 1],
+        ["Count", 0, "Points", "Count"],
+        ["Index", "Index", "Row Index", 0],
+        ["Group Input", "Columns", "Row Index", 1],
+        ["Row Index", 0, "Row", 0],
+        ["Index", "Index", "Column", 0],
+        ["Group Input", "Columns", "Column", 1],
+        ["Row", 0, "Grid Position", "X"],
+        ["Column", 0, "Grid Position", "Y"],
+        ["Grid Position", "Vector", "Spacing", 0],
+        ["Group Input", "Spacing", "Spacing", "Scale"],
+        ["Spacing", "Vector", "Points", "Position"],
+        ["Row", 0, "Row Plus Column", 0],
+        ["Column", 0, "Row Plus Column", 1],
+        ["Row Plus Column", 0, "Checker", 0],
+        ["Points", "Points", "Instance on Points", "Points"],
+        ["Collection Info", "Instances", "Instance on Points", "Instance"],
+        ["Checker", 0, "Instance on Points", "Instance Index"],
+        ["Instance on Points", "Instances", "Group Output", "Geometry"],
+    ]
+
+    return {"nodes": nodes, "links": links}
+
+
+def build_instanced_forest(rows=1000, columns=1000, spacing=2):
+    """
+    木を1つのオブジェクトのジオメトリノードのインスタンスとして並べる
+    木の数に関係なく、作成するのはオブジェクト1つとノードグループ1つだけ
+    """
+    start_time = time.perf_counter()
+    prototypes = create_prototype_collection()
+
+    node_tree = bpy.data.node_groups.get("Forest")
+    if node_tree is None:
+        node_tree = new_geometry_node_group("Forest")
+    identifiers = {
+        "Rows": add_group_input(node_tree, "Rows", "NodeSocketInt", 6),
+        "Columns": add_group_input(node_tree, "Columns", "NodeSocketInt", 6),
+        "Spacing": add_group_input(node_tree, "Spacing", "NodeSocketFloat", 2.0),
+    }
+    apply_node_spec(node_tree, forest_node_tree_spec())
+    node_tree.nodes["Collection Info"].inputs["Collection"].default_value = prototypes
+
+    obj = bpy.data.objects.new("Forest", bpy.data.meshes.new("Forest"))
+    bpy.context.scene.collection.objects.link(obj)
+    modifier = obj.modifiers.new(name="Forest", type="NODES")
+    modifier.node_group = node_tree
+    modifier[identifiers["Rows"]] = rows
+    modifier[identifiers["Columns"]] = columns
+    modifier[identifiers["Spacing"]] = float(spacing)
+
+    elapsed_time = time.perf_counter() - start_time
+    print(f"build_instanced_forest: {rows * columns} trees in {elapsed_time:.3f}s")
+
+    return obj
+
+
+def scattered_forest_node_tree_spec():
+    """入力のメッシュの頂点に、prototype_id 属性の番号の木をインスタンスとして置く spec"""
+    return {
+        "nodes": {
+            "Group Input": {"type": "NodeGroupInput", "location": [-600, 0]},
+            "Group Output": {"type": "NodeGroupOutput", "location": [300, 0]},
+            "Prototype ID": {
+                "type": "GeometryNodeInputNamedAttribute",
+                "location": [-300, -300],
+                "properties": {"data_type": "INT"},
+                "inputs": {"Name": PROTOTYPE_ID_ATTRIBUTE},
+            },
+            "Collection Info": {
+                "type": "GeometryNodeCollectionInfo",
+                "location": [-300, -100],
+                "inputs": {"Separate Children": True, "Reset Children": True},
+            },
+            "Instance on Points": {
+                "type": "GeometryNodeInstanceOnPoints",
+                "location": [0, 0],
+                "inputs": {"Pick Instance": True},
+            },
+        },
+        "links": [
+            ["Group Input", "Geometry", "Instance on Points", "Points"],
+            ["Collection Info", "Instances", "Instance on Points", "Instance"],
+            ["Prototype ID", "Attribute", "Instance on Points", "Instance Index"],
+            ["Instance on Points", "Instances", "Group Output", "Geometry"],
+        ],
+    }
+
+
+def create_point_mesh(name, positions, prototype_ids):
+    """位置の配列を頂点にし、種類の番号を prototype_id 属性に書き込んだメッシュを作成する"""
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(positions))
+    mesh.vertices.foreach_set("co", np.asarray(positions, dtype=np.float32).ravel())
+
+    attribute = mesh.attributes.new(PROTOTYPE_ID_ATTRIBUTE, "INT", "POINT")
+    attribute.data.foreach_set("value", np.asarray(prototype_ids, dtype=np.int32))
+    mesh.update()
+
+    return mesh
+
+
+def build_scattered_forest(positions, prototype_ids, use_instancing=True):
+    """
+    scatter.py で作成した位置と種類の番号(0 が通常の木、1 が松の木)で木を並べる
+    use_instancing が True なら1つのオブジェクトのインスタンス、False なら木ごとのオブジェクト
+    """
+    start_time = time.perf_counter()
+
+    if use_instancing:
+        prototypes = create_prototype_collection()
+        node_tree = bpy.data.node_groups.get("Scattered Forest")
+        if node_tree is None:
+            node_tree = new_geometry_node_group("Scattered Forest")
+        apply_node_spec(node_tree, scattered_forest_node_tree_spec())
+        collection_input = node_tree.nodes["Collection Info"].inputs["Collection"]
+        collection_input.default_value = prototypes
+
+        mesh = create_point_mesh("Scattered Forest", positions, prototype_ids)
+        result = bpy.data.objects.new("Scattered Forest", mesh)
+        bpy.context.scene.collection.objects.link(result)
+        modifier = result.modifiers.new(name="Scattered Forest", type="NODES")
+        modifier.node_group = node_tree
+    else:
+        result = bpy.data.collections.new("Forest")
+        bpy.context.scene.collection.children.link(result)
+        for (x, y, _), prototype_id in zip(positions.tolist(), prototype_ids.tolist()):
+            create_tree(x, y, prototype_id == 1, result)
+
+    elapsed_time = time.perf_counter() - start_time
+    print(f"build_scattered_forest: {len(positions)} trees in {elapsed_time:.3f}s")
+
+    return result
+
+
+def main(use_instancing=False):
+    scene_clear()
+    if use_instancing:
+        # 1つのオブジェクトのインスタンスとして並べる(数十万本以上の木向け)
+        build_instanced_forest(6, 6)
+    else:
+        build_forest(6, 6)
+
+
+if __name__ == "__main__":
+    main()